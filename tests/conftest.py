@@ -1,13 +1,20 @@
+import os
 from pathlib import Path
 
 import pytest
+from selenium.common.exceptions import NoSuchDriverException
 
-from zeit_on_tolino import web
+from tests.standin import StandIn
+from zeit_on_tolino import tolino, web, zeit
+from zeit_on_tolino.env_vars import EnvVars, OptionalEnvVars
 
 
 @pytest.fixture
 def webdriver(tmp_path):
-    webdriver = web.get_webdriver(download_path=tmp_path)
+    try:
+        webdriver = web.get_webdriver(download_path=tmp_path)
+    except NoSuchDriverException as e:
+        pytest.skip(f"Chrome is not available: {e.msg}")
     yield webdriver
     webdriver.quit()
 
@@ -21,3 +28,25 @@ def test_epub_path():
 @pytest.fixture
 def test_epub_title():
     yield "Around the World in 28 Languages"
+
+
+@pytest.fixture
+def standin(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, test_epub_path: Path):
+    """The stand-in ZEIT and tolino sites, which the sync is pointed to instead of the real ones."""
+    # sessions, ledger and caches of the stand-in must not end up in the state of the real sites
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, str(tmp_path / "state"))
+    # neither should downloads and screenshots, which are written relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    site = StandIn(test_epub_path, latency=float(os.environ.get("STANDIN_LATENCY", "0"))).start()
+    monkeypatch.setattr(zeit, "ZEIT_LOGIN_URL", site.zeit_url)
+    monkeypatch.setattr(tolino, "TOLINO_CLOUD_LOGIN_URL", site.tolino_url)
+    for name, value in [
+        (EnvVars.ZEIT_PREMIUM_USER, "zeit@example.com"),
+        (EnvVars.ZEIT_PREMIUM_PASSWORD, "secret"),
+        (EnvVars.TOLINO_USER, "tolino@example.com"),
+        (EnvVars.TOLINO_PASSWORD, "secret"),
+        (EnvVars.TOLINO_PARTNER_SHOP, "thalia"),
+    ]:
+        monkeypatch.setenv(name, value)
+    yield site
+    site.stop()
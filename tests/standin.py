@@ -0,0 +1,259 @@
+"""Local stand-ins for the ZEIT e-paper and the tolino webreader, to run the sync without credentials or network.
+
+The pages only consist of the elements the sync relies on, with the same ids, test ids, classes and texts as the real
+sites. Every response is delayed by `latency` seconds to mimic a remote server.
+"""
+
+import html
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from dataclasses import dataclass, field
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from zeit_on_tolino import epub, zeit
+
+ZEIT_SESSION_COOKIE = "zeit_session"
+TOLINO_SESSION_COOKIE = "tolino_session"
+PARTNER_SHOPS = ("thalia", "hugendubel", "buecher_de")
+
+_PAGE = '<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title></head><body>{body}</body></html>'
+
+_ZEIT_LOGIN_FORM = """
+<form method="post" action="/zeit/login">
+  <input id="login_email" name="email" type="text">
+  <input id="login_pass" name="password" type="password">
+  <button class="submit-button log" type="submit">Anmelden</button>
+</form>
+"""
+
+_TOLINO_LOGGED_OUT = """
+<div data-test-id="countrySelector">Bitte wähle Dein Land aus</div>
+<div id="countries"></div>
+<div id="shops"></div>
+<script>
+  const shops = {shops};
+  const state = '{state}';
+  document.querySelector('[data-test-id="countrySelector"]').addEventListener('click', () => {{
+    const country = document.createElement('div');
+    country.textContent = 'Deutschland';
+    country.addEventListener('click', () => {{
+      for (const shop of shops) {{
+        const option = document.createElement('div');
+        option.setAttribute('data-test-id', `partnerShop-${{shop}}`);
+        option.textContent = shop;
+        option.addEventListener('click', () => {{ location.href = `/shop/login?shop=${{shop}}&state=${{state}}`; }});
+        document.getElementById('shops').appendChild(option);
+      }}
+    }});
+    document.getElementById('countries').appendChild(country);
+  }});
+</script>
+"""
+
+# like an OAuth authorization request, the login may carry a `state` which is only valid for a single login
+_TOLINO_SHOP_LOGIN = """
+<form method="post" action="/shop/login">
+  <input name="state" type="hidden" value="{state}">
+  <input data-test-id="email" name="email" type="text">
+  <input data-test-id="password" name="password" type="password">
+  <button data-test-id="submit" type="submit">Anmelden</button>
+</form>
+"""
+
+_TOLINO_LIBRARY = """
+<span data-test-id="library-drawer-labelLoggedIn">Angemeldet</span>
+<span data-test-id="library-drawer-MyBooks">Meine Bücher</span>
+<div data-test-id="library-headerBar-overflowMenu-button">&#8942;</div>
+<div id="menu"></div>
+<div id="books">{books}</div>
+<script>
+  document.querySelector('[data-test-id="library-headerBar-overflowMenu-button"]').addEventListener('click', () => {{
+    const item = document.createElement('div');
+    item.setAttribute('data-test-id', 'library-headerBar-menu-item-upload');
+    item.textContent = 'Hochladen';
+    const input = document.createElement('input');
+    input.type = 'file';
+    input.addEventListener('change', async () => {{
+      const bar = document.createElement('div');
+      bar.className = '_sep8tp';
+      bar.textContent = 'Wird hochgeladen...';
+      document.body.appendChild(bar);
+      await fetch('/webreader/upload', {{method: 'POST', body: input.files[0]}});
+      bar.remove();
+    }});
+    item.appendChild(input);
+    document.getElementById('menu').appendChild(item);
+  }});
+</script>
+"""
+
+_TOLINO_BOOK = (
+    '<div data-test-id="library-myBooks-titles-list-{index}">'
+    '<span data-test-id="library-myBooks-titles-list-{index}-title">{title}</span></div>'
+)
+
+
+@dataclass
+class StandIn:
+    """Serves the stand-in sites on a free local port, see `start`."""
+
+    epub_path: Path
+    latency: float = 0.0  # seconds each response is delayed by
+    upload_duration: float = 0.0  # seconds an upload to the tolino stand-in takes
+    edition_date: date = date(2024, 5, 16)
+    epub_ready: bool = True
+    library: List[str] = field(default_factory=list)  # titles in the tolino library
+    requests: List[str] = field(default_factory=list)  # method and path of every request served
+    login_states: Set[str] = field(default_factory=set)  # issued, not yet used `state`s of the tolino login
+    _server: Optional[ThreadingHTTPServer] = field(default=None, init=False, repr=False)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def zeit_url(self) -> str:
+        return f"{self.url}/abo/diezeit"
+
+    @property
+    def tolino_url(self) -> str:
+        return f"{self.url}/webreader/"
+
+    def start(self) -> "StandIn":
+        standin = self
+
+        class Handler(_Handler):
+            site = standin
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_upload(self, data: bytes) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "upload.epub"
+            path.write_bytes(data)
+            self.library.insert(0, epub.get_epub_info(path).title)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    site: StandIn
+
+    def _cookies(self) -> Dict[str, str]:
+        cookies = {}
+        for pair in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = pair.strip().partition("=")
+            cookies[name] = value
+        return cookies
+
+    def _form(self) -> Dict[str, str]:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        return {key: values[0] for key, values in urllib.parse.parse_qs(body).items()}
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_page(self, title: str, body: str) -> None:
+        page = _PAGE.format(title=title, body=body).encode()
+        self._send(200, page, {"Content-Type": "text/html; charset=utf-8", "Cache-Control": "no-store"})
+
+    def _redirect(self, location: str, cookie: Optional[str] = None) -> None:
+        headers = {"Location": location}
+        if cookie:
+            headers["Set-Cookie"] = f"{cookie}=1; Path=/"
+        self._send(303, headers=headers)
+
+    def _edition_path(self) -> str:
+        return f"/abo/diezeit/{self.site.edition_date.strftime(zeit.ZEIT_DATE_FORMAT)}"
+
+    def do_GET(self) -> None:
+        self.site.requests.append(f"GET {self.path}")
+        time.sleep(self.site.latency)
+        path = urllib.parse.urlsplit(self.path).path
+        zeit_logged_in = ZEIT_SESSION_COOKIE in self._cookies()
+        tolino_logged_in = TOLINO_SESSION_COOKIE in self._cookies()
+
+        if path == "/abo/diezeit":
+            if not zeit_logged_in:
+                self._send_page("Anmelden", _ZEIT_LOGIN_FORM)
+                return
+            edition = self._edition_path()
+            self._send_page(
+                "DIE ZEIT E-Paper",
+                f'<h2 class="page-section-header">Ihre Ausgaben</h2>'
+                f'<a href="{edition}">{zeit.BUTTON_TEXT_TO_RECENT_EDITION}</a>'
+                f'<a href="{edition}">DIE ZEIT {self.site.edition_date.strftime(zeit.ZEIT_DATE_FORMAT)}</a>',
+            )
+        elif path == self._edition_path() and zeit_logged_in:
+            if self.site.epub_ready:
+                link = f'<a href="/zeit/download/die_zeit.epub">{zeit.BUTTON_TEXT_DOWNLOAD_EPUB}</a>'
+            else:
+                link = f"<span>{zeit.BUTTON_TEXT_EPUB_DOWNLOAD_IS_PENDING}</span>"
+            self._send_page("DIE ZEIT", link)
+        elif path == "/zeit/download/die_zeit.epub" and zeit_logged_in:
+            data = self.site.epub_path.read_bytes()
+            headers = {
+                "Content-Type": "application/epub+zip",
+                "Content-Disposition": 'attachment; filename="die_zeit.epub"',
+            }
+            self._send(200, data, headers)
+        elif path == "/webreader/":
+            if not tolino_logged_in:
+                state = uuid.uuid4().hex
+                self.site.login_states.add(state)
+                self._send_page("tolino webreader", _TOLINO_LOGGED_OUT.format(shops=list(PARTNER_SHOPS), state=state))
+                return
+            books = "".join(
+                _TOLINO_BOOK.format(index=index, title=html.escape(title))
+                for index, title in enumerate(self.site.library)
+            )
+            self._send_page("tolino webreader", _TOLINO_LIBRARY.format(books=books))
+        elif path == "/shop/login":
+            state = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get("state", [""])[0]
+            self._send_page("Anmelden", _TOLINO_SHOP_LOGIN.format(state=html.escape(state)))
+        else:
+            self._send(404)
+
+    def do_POST(self) -> None:
+        self.site.requests.append(f"POST {self.path}")
+        time.sleep(self.site.latency)
+        if self.path == "/zeit/login":
+            form = self._form()
+            if form.get("email") and form.get("password"):
+                self._redirect("/abo/diezeit", ZEIT_SESSION_COOKIE)
+            else:
+                self._redirect("/abo/diezeit/anmelden")
+        elif self.path == "/shop/login":
+            form = self._form()
+            state = form.get("state")
+            state_valid = not state or state in self.site.login_states
+            self.site.login_states.discard(state)
+            if form.get("email") and form.get("password") and state_valid:
+                self._redirect("/webreader/", TOLINO_SESSION_COOKIE)
+            else:
+                self._redirect("/shop/login")
+        elif self.path == "/webreader/upload" and TOLINO_SESSION_COOKIE in self._cookies():
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(self.site.upload_duration)
+            self.site.add_upload(data)
+            self._send(204)
+        else:
+            self._send(404)
+
+    def log_message(self, *args) -> None:
+        pass
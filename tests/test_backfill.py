@@ -0,0 +1,129 @@
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from zeit_on_tolino import backfill, ledger, zeit
+
+
+def test_parse_archive() -> None:
+    origin = "https://epaper.zeit.de"
+    links = [
+        {"href": f"{origin}/abo/diezeit/16.05.2024", "text": "DIE ZEIT 22/2024 16.05.2024"},
+        {"href": f"{origin}/abo/diezeit/08.05.2024", "text": "Ausgabe vom 08.05.2024"},
+        {"href": f"{origin}/abo/diezeit/08.05.2024/seite-1", "text": "08.05.2024"},
+        {"href": "https://www.zeit.de/impressum", "text": "Stand 01.01.2024"},
+        {"href": f"{origin}/abo/diezeit", "text": "ZUR AKTUELLEN AUSGABE"},
+        {"href": f"{origin}/abo/diezeit/31.02.2024", "text": "31.02.2024"},
+    ]
+    assert backfill.parse_archive(links, origin) == [
+        backfill.ArchiveEdition(date(2024, 5, 16), f"{origin}/abo/diezeit/16.05.2024"),
+        backfill.ArchiveEdition(date(2024, 5, 8), f"{origin}/abo/diezeit/08.05.2024"),
+    ]
+
+
+def test_find_epub_url() -> None:
+    html = '<a href="/pdf">PDF laden</a><a class="btn" href="/download/123/epub">\n  EPUB für E-Reader laden </a>'
+    assert backfill.find_epub_url(html, "https://epaper.zeit.de/abo/diezeit/1") == (
+        "https://epaper.zeit.de/download/123/epub"
+    )
+    with pytest.raises(backfill.EpubNotAvailable, match="not available yet"):
+        backfill.find_epub_url("<span>EPUB folgt in Kürze</span>", "https://epaper.zeit.de/abo/diezeit/1")
+    with pytest.raises(backfill.EpubNotAvailable):
+        backfill.find_epub_url("<p>nothing here</p>", "https://epaper.zeit.de/abo/diezeit/1")
+
+
+class _ArchiveHandler(BaseHTTPRequestHandler):
+    epub = b""
+    requests = []
+
+    def do_GET(self) -> None:
+        self.requests.append((self.path, self.headers.get("Cookie")))
+        if self.path.startswith("/edition/"):
+            edition = self.path.rsplit("/", 1)[1]
+            link = f'<a href="/epub/{edition}">EPUB FÜR E-READER LADEN</a>'
+            body = "EPUB folgt in Kürze".encode() if edition == "pending" else link.encode()
+            content_type = "text/html; charset=utf-8"
+        elif self.path.startswith("/epub/"):
+            body, content_type = self.epub, "application/epub+zip"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def archive_url(test_epub_path):
+    _ArchiveHandler.epub = test_epub_path.read_bytes()
+    _ArchiveHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ArchiveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+class FakeWebDriver:
+    def __init__(self, links: list, download_dir: Path) -> None:
+        self.links = links
+        self.download_dir_path = str(download_dir)
+        self.current_url = ""
+
+    def get(self, url: str) -> None:
+        self.current_url = url
+
+    def execute_script(self, script: str):
+        return "test-agent" if "userAgent" in script else self.links
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        return {"cookies": [{"name": "zeit_session", "value": "abc", "domain": "127.0.0.1", "path": "/"}]}
+
+
+def test_backfill(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, archive_url: str) -> None:
+    ledger_path = tmp_path / "ledger.sqlite3"
+    synced = ledger.Edition(identifier="urn:zeit:1", title="DIE ZEIT 19/2024", date=date(2024, 5, 1), sha256="abc")
+    ledger.record_upload(synced, "foo@example.com", ledger_path)
+    links = [
+        {"href": f"{archive_url}/edition/{name}", "text": text}
+        for name, text in (
+            ("16", "16.05.2024"),
+            ("pending", "23.05.2024"),
+            ("08", "08.05.2024"),
+            ("02", "02.05.2024"),
+            ("old", "04.04.2024"),
+        )
+    ]
+    webdriver = FakeWebDriver(links, tmp_path / "downloads")
+    monkeypatch.setattr(zeit, "_login", lambda webdriver: None)
+    uploads = []
+
+    results = backfill.backfill(
+        webdriver,
+        ["foo@example.com"],
+        lambda path, edition: uploads.append((path.parent.name, edition.title)),
+        since=date(2024, 5, 1),
+        ledger_path=ledger_path,
+        archive_url=archive_url,
+    )
+
+    assert [(r.date, r.status) for r in results] == [
+        (date(2024, 5, 8), backfill.STATUS_SYNCED),
+        (date(2024, 5, 16), backfill.STATUS_SYNCED),
+        (date(2024, 5, 23), backfill.STATUS_PENDING),
+    ]
+    assert sorted(uploads) == [
+        ("2024-05-08", "Around the World in 28 Languages"),
+        ("2024-05-16", "Around the World in 28 Languages"),
+    ]
+    # the already synced edition of 02.05. and the one older than `since` were never requested
+    requested = {path for path, _ in _ArchiveHandler.requests}
+    assert requested == {"/edition/16", "/edition/pending", "/edition/08", "/epub/16", "/epub/08"}
+    assert {cookie for _, cookie in _ArchiveHandler.requests} == {"zeit_session=abc"}
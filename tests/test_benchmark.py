@@ -0,0 +1,115 @@
+"""End-to-end latency benchmarks of the sync against the stand-in sites of `tests/standin.py`.
+
+Every stage is measured in wall time and WebDriver round trips, i.e. commands sent to the chromedriver, and fails if it
+exceeds its budget. Set `STANDIN_LATENCY` to simulate slower sites, which extends the time budgets by the latency of
+every request to the stand-in, and `BENCHMARK_REPORT` to a path to write the results to as JSON.
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pytest
+
+from tests.standin import StandIn
+from zeit_on_tolino import instrumentation, tolino, zeit
+
+pytestmark = pytest.mark.benchmark
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Budget:
+    seconds: float  # without latency
+    round_trips: int
+
+
+# upper bounds with some headroom
+BUDGETS = {
+    "zeit.download_e_paper": Budget(seconds=15, round_trips=50),
+    "tolino.login": Budget(seconds=15, round_trips=60),
+    "tolino.upload": Budget(seconds=20, round_trips=70),
+}
+
+
+@dataclass
+class StageResult:
+    stage: str
+    seconds: float
+    round_trips: int
+    requests: int  # to the stand-in sites
+
+
+@contextmanager
+def measure(
+    stage: str, stats: instrumentation.CommandStats, standin: StandIn, results: List[StageResult]
+) -> Iterator[None]:
+    """Measure the traced function called `stage`, which must be called within the block."""
+    start, round_trips, requests = time.perf_counter(), stats.round_trips(stage), len(standin.requests)
+    yield
+    results.append(
+        StageResult(
+            stage,
+            time.perf_counter() - start,
+            stats.round_trips(stage) - round_trips,
+            len(standin.requests) - requests,
+        )
+    )
+
+
+def report(results: List[StageResult], latency: float) -> None:
+    log.info(f"benchmark with a latency of {latency:.3f}s per request:")
+    for result in results:
+        log.info(
+            f"{result.stage:25} {result.seconds:7.2f}s {result.round_trips:5} round trips {result.requests:4} requests"
+        )
+    report_path = os.environ.get("BENCHMARK_REPORT")
+    if report_path:
+        report = {"latency": latency, "stages": [asdict(result) for result in results]}
+        Path(report_path).write_text(json.dumps(report, indent=2))
+
+
+def exceeded_budgets(results: List[StageResult], budgets: Dict[str, Budget], latency: float = 0.0) -> List[str]:
+    exceeded = []
+    for result in results:
+        budget = budgets[result.stage]
+        seconds = budget.seconds + latency * result.requests
+        if result.seconds > seconds:
+            exceeded.append(f"{result.stage} took {result.seconds:.2f}s, budget is {seconds:.2f}s")
+        if result.round_trips > budget.round_trips:
+            exceeded.append(f"{result.stage} took {result.round_trips} round trips, budget is {budget.round_trips}")
+    return exceeded
+
+
+def test_benchmark_sync(webdriver, standin: StandIn, test_epub_title: str) -> None:
+    stats = instrumentation.instrument(webdriver)
+    results = []
+
+    with measure("zeit.download_e_paper", stats, standin, results):
+        e_paper_path = zeit.download_e_paper(webdriver)
+    with measure("tolino.login", stats, standin, results):
+        tolino._login(webdriver)
+    with measure("tolino.upload", stats, standin, results):
+        tolino._upload(webdriver, e_paper_path, test_epub_title)
+
+    report(results, standin.latency)
+    stats.log_summary()
+    assert standin.library == [test_epub_title]
+    assert not exceeded_budgets(results, BUDGETS, standin.latency)
+
+
+def test_exceeded_budgets() -> None:
+    budgets = {"zeit.login": Budget(seconds=1, round_trips=10)}
+    assert exceeded_budgets([StageResult("zeit.login", 0.5, 10, requests=2)], budgets) == []
+    assert exceeded_budgets([StageResult("zeit.login", 1.5, 11, requests=2)], budgets) == [
+        "zeit.login took 1.50s, budget is 1.00s",
+        "zeit.login took 11 round trips, budget is 10",
+    ]
+    # the time budget grows with the latency of the requests
+    assert exceeded_budgets([StageResult("zeit.login", 1.5, 10, requests=2)], budgets, latency=0.25) == []
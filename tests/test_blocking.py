@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from zeit_on_tolino import blocking
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+
+class _FakeWebDriver:
+    def __init__(self) -> None:
+        self.cdp_commands = []
+        self.events = []
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        self.cdp_commands.append((cmd, params))
+        return {}
+
+    def get_log(self, log_type: str) -> list:
+        entries = [{"message": json.dumps({"message": event})} for event in self.events]
+        self.events = []
+        return entries
+
+
+def test_get_block_list(tmp_path) -> None:
+    assert blocking.get_block_list(blocking.LEVEL_OFF) == {}
+    assert "zeit.de" not in blocking.get_block_list(blocking.LEVEL_TRACKERS)
+    assert blocking.get_block_list(blocking.LEVEL_DEFAULT)["doubleclick.net"] == (blocking.BLOCK_ALL,)
+
+    block_list_path = tmp_path / "block_list.json"
+    block_list_path.write_text(json.dumps({"zeit.de": ["*.svg", "*.png"], "example.com": ["*"]}))
+    block_list = blocking.get_block_list(blocking.LEVEL_DEFAULT, block_list_path)
+    assert block_list["zeit.de"] == blocking.SITES["zeit.de"] + ("*.svg",)
+    assert block_list["example.com"] == ("*",)
+    assert blocking.get_block_list(blocking.LEVEL_OFF, block_list_path) == {
+        "zeit.de": ("*.svg", "*.png"),
+        "example.com": ("*",),
+    }
+
+
+def test_url_patterns() -> None:
+    assert blocking.url_patterns({"doubleclick.net": ("*",), "zeit.de": ("*.png",)}) == [
+        "*doubleclick.net/*",
+        "*zeit.de/*.png",
+        "*zeit.de/*.png?*",
+    ]
+
+
+def test_enable_blocking(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_BLOCKING, "off")
+    assert blocking.enable_blocking(_FakeWebDriver()) is None
+
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_BLOCKING, "default")
+    webdriver = _FakeWebDriver()
+    stats = blocking.enable_blocking(webdriver)
+    assert stats is webdriver.blocking_stats
+    assert [cmd for cmd, _ in webdriver.cdp_commands] == ["Network.enable", "Network.setBlockedURLs"]
+    assert "*zeit.de/*.woff2" in webdriver.cdp_commands[1][1]["urls"]
+
+    def request(request_id: str, url: str) -> dict:
+        return {"method": "Network.requestWillBeSent", "params": {"requestId": request_id, "request": {"url": url}}}
+
+    webdriver.events = [
+        request("1", "https://securepubads.g.doubleclick.net/tag.js"),
+        {"method": "Network.loadingFailed", "params": {"requestId": "1", "blockedReason": "inspector"}},
+        request("2", "https://img.zeit.de/cover.jpg"),
+        {"method": "Network.loadingFailed", "params": {"requestId": "2", "blockedReason": "inspector"}},
+        request("3", "https://img.zeit.de/teaser.jpg"),
+        {"method": "Network.loadingFailed", "params": {"requestId": "3", "blockedReason": "inspector"}},
+        request("4", "https://epaper.zeit.de/abo/diezeit"),
+        {"method": "Network.loadingFinished", "params": {"requestId": "4", "encodedDataLength": 1000}},
+        request("5", "https://epaper.zeit.de/timeout"),
+        {"method": "Network.loadingFailed", "params": {"requestId": "5", "errorText": "net::ERR_TIMED_OUT"}},
+    ]
+    with caplog.at_level("INFO"):
+        blocking.log_summary(webdriver)
+    assert stats.blocked == {"zeit.de": 2, "doubleclick.net": 1}
+    assert (stats.loaded_requests, stats.loaded_bytes) == (1, 1000)
+    assert "blocked 3 requests (zeit.de: 2, doubleclick.net: 1), loaded 1 requests with 1000 bytes." in caplog.text
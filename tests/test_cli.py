@@ -0,0 +1,83 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from zeit_on_tolino import cli, ledger
+from zeit_on_tolino.env_vars import EnvVars, OptionalEnvVars
+
+# cumulative import time of the zeit_on_tolino modules a cheap command may take, generous for slow CI machines
+IMPORT_BUDGET_US = 150_000
+HEAVY_MODULES = ("selenium.webdriver.remote", "undetected_chromedriver", "lxml")
+
+ENV = {
+    EnvVars.TOLINO_USER: "foo",
+    EnvVars.TOLINO_PASSWORD: "baa",
+    EnvVars.TOLINO_PARTNER_SHOP: "thalia",
+    EnvVars.ZEIT_PREMIUM_USER: "baz",
+    EnvVars.ZEIT_PREMIUM_PASSWORD: "zap",
+}
+
+
+def _import_times(args: List[str], state_dir: Path) -> Dict[str, int]:
+    """The cumulative import time in microseconds per module imported while running the CLI with `args`."""
+    env = {"PATH": "", **ENV, OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR: str(state_dir)}
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "zeit_on_tolino", *args],
+        cwd=Path(__file__).parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        _, cumulative, module = line.split("|") if line.startswith("import time:") else ("", "", "")
+        if cumulative.strip().isdigit():
+            # nested imports are indented, only top level imports count towards the total
+            times[module.strip()] = int(cumulative) if not module.startswith("  ") else 0
+    return times
+
+
+@pytest.mark.parametrize("command", ["check-env", "status"])
+def test_cheap_commands_do_not_import_the_browser_stack(command: str, tmp_path: Path) -> None:
+    times = _import_times([command], tmp_path)
+    assert not [module for module in times if module.startswith(HEAVY_MODULES)]
+    package_time = sum(t for module, t in times.items() if module.startswith("zeit_on_tolino"))
+    assert 0 < package_time < IMPORT_BUDGET_US
+
+
+def test_check_env(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture) -> None:
+    for name, value in ENV.items():
+        monkeypatch.setenv(name, value)
+    assert cli.main(["check-env"]) == 0
+    assert "1 account(s): foo (thalia)" in capsys.readouterr().out
+
+    monkeypatch.setenv(EnvVars.TOLINO_PARTNER_SHOP, "unknown")
+    assert cli.main(["check-env"]) == 1
+    assert "'unknown' is not supported" in capsys.readouterr().err
+
+
+def test_status(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, tmp_path: Path) -> None:
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, str(tmp_path))
+    edition = ledger.Edition(identifier="urn:zeit:1", title="DIE ZEIT 20/2024", date=None, sha256="abc")
+    ledger.record_upload(edition, "foo")
+
+    assert cli.main(["status"]) == 0
+    status = json.loads(capsys.readouterr().out)
+    assert status["daemon"] is None
+    assert [(upload["title"], upload["account"]) for upload in status["uploads"]] == [("DIE ZEIT 20/2024", "foo")]
+
+
+def test_inspect_epub(capsys: pytest.CaptureFixture, tmp_path: Path, test_epub_path: Path, test_epub_title: str) -> None:
+    assert cli.main(["inspect-epub", str(test_epub_path)]) == 0
+    details = json.loads(capsys.readouterr().out)
+    assert details["title"] == test_epub_title
+    assert details["valid"] is True
+
+    broken_path = tmp_path / "broken.epub"
+    broken_path.write_bytes(b"not a zip")
+    assert cli.main(["inspect-epub", str(broken_path)]) == 1
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from zeit_on_tolino import daemon
+
+
+class FakeWebDriver:
+    def __init__(self) -> None:
+        self.crashed = False
+        self.quit_called = False
+
+    def execute_script(self, script: str):
+        if self.crashed:
+            raise ConnectionError("browser crashed")
+        return 1
+
+    def quit(self) -> None:
+        self.quit_called = True
+
+
+@pytest.fixture
+def browser_daemon(tmp_path):
+    drivers = []
+
+    def create_webdriver() -> FakeWebDriver:
+        drivers.append(FakeWebDriver())
+        return drivers[-1]
+
+    def run_job(webdriver, job: dict) -> dict:
+        if job.get("fail"):
+            raise RuntimeError("download failed")
+        return {"synced": ["DIE ZEIT 20/2024"], "browser": drivers.index(webdriver)}
+
+    browser_daemon = daemon.BrowserDaemon(
+        create_webdriver, run_job, socket_path=tmp_path / "daemon.sock", health_check_interval=0.1
+    )
+    browser_daemon.drivers = drivers
+    thread = threading.Thread(target=browser_daemon.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(50):
+        if browser_daemon.socket_path.exists():
+            break
+        time.sleep(0.05)
+    yield browser_daemon
+    browser_daemon.shutdown()
+    thread.join(timeout=5)
+
+
+def test_daemon(browser_daemon) -> None:
+    socket_path = browser_daemon.socket_path
+    assert daemon.send_command(daemon.COMMAND_HEALTH, socket_path) == {"ok": True, "busy": False, "browser_alive": True}
+
+    # jobs reuse the warm browser
+    for _ in range(2):
+        response = daemon.send_command(daemon.COMMAND_SYNC, socket_path, backfill=False)
+        assert response == {"ok": True, "result": {"synced": ["DIE ZEIT 20/2024"], "browser": 0}}
+    response = daemon.send_command(daemon.COMMAND_SYNC, socket_path, fail=True)
+    assert response == {"ok": False, "error": "download failed"}
+
+    status = daemon.send_command(daemon.COMMAND_STATUS, socket_path)
+    assert status["jobs_completed"] == 2 and status["jobs_failed"] == 1
+    assert status["browser_restarts"] == 0 and not status["busy"]
+    assert status["last_job"]["error"] == "download failed"
+
+    assert daemon.send_command("foo", socket_path)["ok"] is False
+
+
+def test_daemon__restarts_crashed_browser(browser_daemon) -> None:
+    browser_daemon.drivers[0].crashed = True
+    for _ in range(50):
+        if len(browser_daemon.drivers) > 1:
+            break
+        time.sleep(0.05)
+    assert browser_daemon.drivers[0].quit_called
+    status = daemon.send_command(daemon.COMMAND_STATUS, browser_daemon.socket_path)
+    assert status["browser_restarts"] == 1
+    response = daemon.send_command(daemon.COMMAND_SYNC, browser_daemon.socket_path)
+    assert response["result"]["browser"] == 1
+
+
+def test_daemon__shutdown(browser_daemon) -> None:
+    assert daemon.send_command(daemon.COMMAND_SHUTDOWN, browser_daemon.socket_path) == {"ok": True}
+    for _ in range(50):
+        if not browser_daemon.socket_path.exists():
+            break
+        time.sleep(0.05)
+    assert browser_daemon.drivers[0].quit_called
+    with pytest.raises(daemon.DaemonNotRunning):
+        daemon.send_command(daemon.COMMAND_STATUS, browser_daemon.socket_path)
+
+
+def test_daemon__refuses_second_instance(browser_daemon) -> None:
+    second = daemon.BrowserDaemon(FakeWebDriver, lambda webdriver, job: {}, socket_path=browser_daemon.socket_path)
+    with pytest.raises(RuntimeError, match="already listening"):
+        second.serve_forever()
@@ -0,0 +1,52 @@
+import gzip
+import json
+import logging
+
+import pytest
+
+from zeit_on_tolino import diagnostics
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+
+class _FakeWebDriver:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        self.calls += 1
+        return {"cookies": [{"name": "OAUTH-JSESSIONID", "value": "secret", "domain": ".thalia.de"}]}
+
+    def execute_async_script(self, script: str, *args) -> dict:
+        self.calls += 1
+        if script == diagnostics._SUMMARY_SCRIPT:
+            return {"url": "https://foo", "local_storage": 2, "session_storage": 0, "databases": ["tolino-user"]}
+        return {"url": "https://foo", "local_storage": {"token": "abc"}, "indexed_db": {"tolino-user": {}}}
+
+
+def test_off_by_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv(OptionalEnvVars.ZEIT_ON_TOLINO_DIAGNOSTICS, raising=False)
+    webdriver = _FakeWebDriver()
+    diagnostics.capture(webdriver, "AFTER LOGIN")
+    assert webdriver.calls == 0
+
+
+def test_summary(monkeypatch: pytest.MonkeyPatch, caplog) -> None:
+    caplog.set_level(logging.INFO)
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_DIAGNOSTICS, "summary")
+    diagnostics.capture(_FakeWebDriver(), "AFTER LOGIN")
+    assert "diagnostics at 'AFTER LOGIN': url=https://foo, 1 cookies (OAUTH-JSESSIONID)" in caplog.text
+    assert "secret" not in caplog.text
+
+
+def test_full(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_DIAGNOSTICS, "full")
+    monkeypatch.setattr(diagnostics, "DIAGNOSTICS_DIR", tmp_path)
+    diagnostics.capture(_FakeWebDriver(), "AFTER LOGIN")
+    diagnostics.flush()
+
+    (snapshot_path,) = tmp_path.glob("*_after_login.json.gz")
+    with gzip.open(snapshot_path, "rt") as f:
+        snapshot = json.load(f)
+    assert snapshot["location"] == "AFTER LOGIN"
+    assert snapshot["cookies"][0]["value"] == "secret"
+    assert snapshot["local_storage"] == {"token": "abc"}
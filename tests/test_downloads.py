@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+
+import pytest
+
+from zeit_on_tolino import downloads
+
+
+class _FakeWebDriver:
+    def __init__(self, events: list) -> None:
+        self.events = events
+
+    def get_log(self, log_type: str) -> list:
+        assert log_type == "performance"
+        entries = [{"message": json.dumps({"message": event})} for event in self.events]
+        self.events = []
+        return entries
+
+
+def _event(method: str, **params) -> dict:
+    return {"method": method, "params": params}
+
+
+def test_download_tracker(tmp_path) -> None:
+    webdriver = _FakeWebDriver([_event("Browser.downloadWillBegin", guid="old", suggestedFilename="old.epub")])
+    tracker = downloads.DownloadTracker(webdriver, tmp_path)
+    tracker.mark()
+
+    (tmp_path / "abc-123").write_bytes(b"epub")
+    webdriver.events = [
+        _event("Browser.downloadWillBegin", guid="abc-123", suggestedFilename="die_zeit.epub", url="https://foo"),
+        _event("Browser.downloadProgress", guid="abc-123", state="inProgress", receivedBytes=2, totalBytes=4),
+        _event("Browser.downloadProgress", guid="abc-123", state="completed", receivedBytes=4, totalBytes=4),
+    ]
+    path = tracker.wait_for_download(start_timeout=1, timeout=1)
+    assert path == tmp_path / "die_zeit.epub"
+    assert path.read_bytes() == b"epub"
+
+
+def test_download_tracker__without_events(tmp_path) -> None:
+    tracker = downloads.DownloadTracker(_FakeWebDriver([]), tmp_path)
+    tracker.mark()
+    assert tracker.wait_for_download(start_timeout=0.2, timeout=1) is None
+
+
+def test_download_tracker__canceled(tmp_path) -> None:
+    tracker = downloads.DownloadTracker(_FakeWebDriver([]), tmp_path)
+    tracker.mark()
+    tracker.webdriver.events = [_event("Page.downloadProgress", guid="abc", state="canceled")]
+    with pytest.raises(RuntimeError, match="was canceled"):
+        tracker.wait_for_download(start_timeout=1, timeout=1)
+
+
+def test_directory_watcher(tmp_path) -> None:
+    (tmp_path / "older.epub").write_bytes(b"old")
+    watcher = downloads.DirectoryWatcher(tmp_path)
+
+    def _download() -> None:
+        time.sleep(0.2)
+        (tmp_path / "die_zeit.epub.crdownload").write_bytes(b"epub")
+        time.sleep(0.2)
+        (tmp_path / "die_zeit.epub.crdownload").rename(tmp_path / "die_zeit.epub")
+
+    threading.Thread(target=_download).start()
+    assert watcher.wait_for_file(timeout=5) == tmp_path / "die_zeit.epub"
+
+
+def test_directory_watcher__timeout(tmp_path) -> None:
+    watcher = downloads.DirectoryWatcher(tmp_path)
+    with pytest.raises(TimeoutError, match="Did not manage to download file within 0.3 seconds."):
+        watcher.wait_for_file(timeout=0.3)
@@ -1,6 +1,60 @@
+import os
+import zipfile
+
+import pytest
+
 from zeit_on_tolino import epub
 
+CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+OPF = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier>urn:zeit:1</dc:identifier>
+    <dc:title>DIE ZEIT 20/2024</dc:title>
+    <dc:language>de</dc:language>
+  </metadata>
+  <manifest>this is not valid <xml</manifest>
+</package>"""
+
 
 def test_get_epub_info(test_epub_path, test_epub_title) -> None:
     info = epub.get_epub_info(test_epub_path)
-    assert info["title"] == test_epub_title
+    assert info.title == test_epub_title
+
+
+def test_get_epub_info__missing_fields(tmp_path) -> None:
+    epub_path = tmp_path / "zeit.epub"
+    with zipfile.ZipFile(epub_path, "w") as zip_file:
+        zip_file.writestr("mimetype", "application/epub+zip")
+        zip_file.writestr(epub.CONTAINER_PATH, CONTAINER)
+        zip_file.writestr("OEBPS/content.opf", OPF)
+
+    # only the metadata block is parsed, so the broken manifest does not matter
+    info = epub.get_epub_info(epub_path)
+    assert info == epub.EpubInfo(title="DIE ZEIT 20/2024", language="de", identifier="urn:zeit:1")
+    assert info.creator is None and info.date is None
+
+
+def test_get_epub_info__cached_until_modified(tmp_path, test_epub_path) -> None:
+    epub_path = tmp_path / "zeit.epub"
+    epub_path.write_bytes(test_epub_path.read_bytes())
+    info = epub.get_epub_info(epub_path)
+    assert epub.get_epub_info(epub_path) is info
+
+    with zipfile.ZipFile(epub_path, "w") as zip_file:
+        zip_file.writestr(epub.CONTAINER_PATH, CONTAINER)
+        zip_file.writestr("OEBPS/content.opf", OPF)
+    stat = epub_path.stat()
+    os.utime(epub_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert epub.get_epub_info(epub_path).title == "DIE ZEIT 20/2024"
+
+
+def test_get_epub_info__invalid(tmp_path) -> None:
+    epub_path = tmp_path / "zeit.epub"
+    epub_path.write_bytes(b"no zip")
+    with pytest.raises(epub.EpubError):
+        epub.get_epub_info(epub_path)
@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from zeit_on_tolino import fanout, ledger, tolino
+from zeit_on_tolino.accounts import TolinoAccount, get_accounts, get_credentials
+from zeit_on_tolino.env_vars import EnvVars, MissingEnvironmentVariable, OptionalEnvVars
+
+EDITION = ledger.Edition(identifier="urn:zeit:1", title="DIE ZEIT 20/2024", date=date(2024, 5, 8), sha256="abc")
+
+
+class FakeWebDriver:
+    def __init__(self, profile_dir: Path) -> None:
+        self.profile_dir = profile_dir
+        self.quit_called = False
+
+    def quit(self) -> None:
+        self.quit_called = True
+
+
+def test_get_accounts(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    accounts_json = '[{"user": "foo", "password": "baa", "partner_shop": "Thalia"}, {"user": "baz", "password": "zap", "partner_shop": "hugendubel"}]'  # noqa: E501
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_ACCOUNTS, accounts_json)
+    accounts = get_accounts()
+    assert accounts == [TolinoAccount("foo", "baa", "thalia"), TolinoAccount("baz", "zap", "hugendubel")]
+    assert "baa" not in repr(accounts)
+
+    accounts_file = tmp_path / "accounts.json"
+    accounts_file.write_text(accounts_json)
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_ACCOUNTS, str(accounts_file))
+    assert get_accounts() == accounts
+
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_ACCOUNTS, '[{"user": "foo"}]')
+    with pytest.raises(ValueError, match="partner_shop"):
+        get_accounts()
+
+
+def test_get_credentials(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(EnvVars.TOLINO_USER, "foo")
+    monkeypatch.setenv(EnvVars.TOLINO_PASSWORD, "baa")
+    monkeypatch.setenv(EnvVars.TOLINO_PARTNER_SHOP, "Thalia")
+    assert get_credentials() == ("foo", "baa", "thalia")
+
+    monkeypatch.delenv(EnvVars.TOLINO_PASSWORD)
+    with pytest.raises(MissingEnvironmentVariable):
+        get_credentials()
+
+
+def test_get_session_site() -> None:
+    assert tolino.get_session_site("foo@example.com") == tolino.get_session_site(" Foo@example.com")
+    assert tolino.get_session_site("foo@example.com").name != tolino.get_session_site("baa@example.com").name
+    assert "foo" not in tolino.get_session_site("foo@example.com").name
+
+
+def test_upload_to_accounts(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    ledger_path = tmp_path / "ledger.sqlite3"
+    ledger.record_upload(EDITION, "done@example.com", ledger_path)
+    accounts = [
+        TolinoAccount(user, "secret", "thalia")
+        for user in ("a@example.com", "b@example.com", "broken@example.com", "done@example.com")
+    ]
+    drivers = []
+    running, max_running = set(), []
+    lock = threading.Lock()
+
+    def create_webdriver(profile_dir: Path, download_dir: Path) -> FakeWebDriver:
+        driver = FakeWebDriver(profile_dir)
+        drivers.append(driver)
+        return driver
+
+    def login_and_upload(webdriver, file_path, e_paper_title, account) -> None:
+        with lock:
+            running.add(account.user)
+            max_running.append(len(running))
+        time.sleep(0.3)
+        with lock:
+            running.remove(account.user)
+        if account.user.startswith("broken"):
+            raise RuntimeError("login failed")
+
+    monkeypatch.setattr(tolino, "login_and_upload", login_and_upload)
+
+    start = time.monotonic()
+    results = fanout.upload_to_accounts(
+        create_webdriver, tmp_path / "zeit.epub", EDITION, accounts, max_browsers=3, ledger_path=ledger_path
+    )
+    # the accounts are synced in parallel, so the run takes about as long as a single account
+    assert time.monotonic() - start < 0.6
+    assert max(max_running) == 3
+
+    assert [(r.account, r.status) for r in results] == [
+        ("a@example.com", fanout.STATUS_UPLOADED),
+        ("b@example.com", fanout.STATUS_UPLOADED),
+        ("broken@example.com", fanout.STATUS_FAILED),
+        ("done@example.com", fanout.STATUS_SKIPPED),
+    ]
+    assert results[2].error == "login failed"
+    assert len(drivers) == 3 and all(d.quit_called for d in drivers)
+    assert len({d.profile_dir for d in drivers}) == 3
+    assert ledger.is_release_synced(date(2024, 5, 8), ["a@example.com", "b@example.com"], ledger_path)
+    assert not ledger.is_uploaded(EDITION, "broken@example.com", ledger_path)
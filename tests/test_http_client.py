@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from zeit_on_tolino import http_client
+
+CONTENT = bytes(range(256)) * 4096  # 1 MiB
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    served_ranges = []
+    etag = '"v1"'
+
+    def do_GET(self) -> None:
+        range_header = self.headers.get("Range")
+        self.served_ranges.append(range_header)
+        if self.headers.get("If-Range") not in (None, self.etag):
+            range_header = None
+        start = int(range_header.split("=")[1].rstrip("-")) if range_header else 0
+        if start >= len(CONTENT):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(CONTENT)}")
+            self.end_headers()
+            return
+        self.send_response(206 if range_header else 200)
+        self.send_header("Content-Length", str(len(CONTENT) - start))
+        self.send_header("Content-Disposition", 'attachment; filename="die_zeit.epub"')
+        self.send_header("ETag", self.etag)
+        if range_header:
+            self.send_header("Content-Range", f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        self.end_headers()
+        self.wfile.write(CONTENT[start:])
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url():
+    _RangeHandler.served_ranges = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/download/epub"
+    server.shutdown()
+
+
+def test_stream_download(server_url, tmp_path) -> None:
+    result = http_client.stream_download(server_url, tmp_path)
+    assert result.path == tmp_path / "die_zeit.epub"
+    assert result.path.read_bytes() == CONTENT
+    assert result.size == len(CONTENT)
+    assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+    assert result.resumed_from == 0
+    assert not list(tmp_path.glob("*.part"))
+
+
+def _write_part(server_url: str, download_dir: Path, content: bytes, if_range: Optional[str] = None) -> Path:
+    part_path = download_dir / f".{hashlib.sha1(server_url.encode()).hexdigest()[:16]}.part"
+    part_path.write_bytes(content)
+    if if_range:
+        part_path.with_suffix(".validator").write_text(json.dumps({"if_range": if_range}))
+    return part_path
+
+
+def test_stream_download__resume(server_url, tmp_path) -> None:
+    _write_part(server_url, tmp_path, CONTENT[:1000], if_range='"v1"')
+
+    result = http_client.stream_download(server_url, tmp_path)
+    assert _RangeHandler.served_ranges == ["bytes=1000-"]
+    assert result.resumed_from == 1000
+    assert result.path.read_bytes() == CONTENT
+    assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+    assert list(tmp_path.iterdir()) == [result.path]
+
+
+def test_stream_download__resume_changed_file(server_url, tmp_path) -> None:
+    # the part file belongs to an older edition, the server answers the range request with the whole new file
+    _write_part(server_url, tmp_path, b"x" * 1000, if_range='"v0"')
+
+    result = http_client.stream_download(server_url, tmp_path)
+    assert _RangeHandler.served_ranges == ["bytes=1000-"]
+    assert result.resumed_from == 0
+    assert result.path.read_bytes() == CONTENT
+
+
+def test_stream_download__resume_without_validator(server_url, tmp_path) -> None:
+    _write_part(server_url, tmp_path, b"x" * 1000)
+
+    result = http_client.stream_download(server_url, tmp_path)
+    assert _RangeHandler.served_ranges == [None]
+    assert result.resumed_from == 0
+    assert result.path.read_bytes() == CONTENT
+
+
+def test_stream_download__resume_complete(server_url, tmp_path) -> None:
+    _write_part(server_url, tmp_path, CONTENT, if_range='"v1"')
+
+    result = http_client.stream_download(server_url, tmp_path, file_name="die_zeit.epub")
+    assert _RangeHandler.served_ranges == [f"bytes={len(CONTENT)}-"]
+    assert result.resumed_from == len(CONTENT)
+    assert result.path.read_bytes() == CONTENT
+    assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+    assert list(tmp_path.iterdir()) == [result.path]
+
+
+def test_stream_download__checksum_mismatch(server_url, tmp_path) -> None:
+    with pytest.raises(http_client.DownloadError, match="does not match the expected sha256 checksum"):
+        http_client.stream_download(server_url, tmp_path, expected_sha256="0" * 64)
+    assert not list(tmp_path.iterdir())
+
+
+class _Response:
+    def __init__(self, headers: dict) -> None:
+        self.headers = headers
+
+
+def test_server_checksum() -> None:
+    sha256 = hashlib.sha256(b"epub")
+    digest = f"sha-256={base64.b64encode(sha256.digest()).decode()}"
+    assert http_client._server_checksum(_Response({"Digest": digest})) == ("sha256", sha256.hexdigest())
+    # malformed headers are ignored instead of failing the download
+    assert http_client._server_checksum(_Response({"Digest": "sha-256=abc"})) is None
+    md5 = hashlib.md5(b"epub")
+    content_md5 = base64.b64encode(md5.digest()).decode()
+    headers = {"Digest": "sha-256=abc", "Content-MD5": content_md5}
+    assert http_client._server_checksum(_Response(headers)) == ("md5", md5.hexdigest())
+    assert http_client._server_checksum(_Response({"Content-MD5": "not base64!"})) is None
+
+
+def test_cookie_header() -> None:
+    cookies = [
+        {"name": "a", "value": "1", "domain": ".zeit.de", "path": "/"},
+        {"name": "b", "value": "2", "domain": "epaper.zeit.de", "path": "/abo"},
+        {"name": "c", "value": "3", "domain": "mytolino.com", "path": "/"},
+        {"name": "d", "value": "4", "domain": "epaper.zeit.de", "path": "/", "secure": True},
+    ]
+    assert http_client.cookie_header(cookies, "https://epaper.zeit.de/abo/diezeit") == "a=1; b=2; d=4"
+    assert http_client.cookie_header(cookies, "http://epaper.zeit.de/download") == "a=1"
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from zeit_on_tolino import instrumentation, tracing
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+PAGE_SOURCE = "<html>" + "x" * 1_000_000 + "</html>"
+
+
+class _FakeExecutor:
+    def execute(self, command: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"value": PAGE_SOURCE if command == "getPageSource" else None}
+
+
+class _FakeWebDriver:
+    def __init__(self) -> None:
+        self.command_executor = _FakeExecutor()
+
+    def execute(self, command: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        return self.command_executor.execute(command, params or {})
+
+
+def test_instrument() -> None:
+    tracing.reset()
+    webdriver = _FakeWebDriver()
+    stats = instrumentation.instrument(webdriver)
+    assert instrumentation.instrument(webdriver) is stats
+
+    webdriver.execute("get", {"url": "https://webreader.mytolino.com/"})
+    with tracing.span("tolino.login"):
+        webdriver.execute("findElement", {"using": "css selector", "value": "div"})
+        with tracing.span("wait: tolino login state known"):
+            webdriver.execute("executeScript", {"script": "return 1", "args": []})
+            webdriver.execute("executeScript", {"script": "return 1", "args": []})
+    with tracing.span("zeit.login"):
+        webdriver.execute("getPageSource", {})
+
+    assert stats.round_trips() == 5
+    # commands of nested spans count for the outer ones as well
+    assert stats.round_trips("tolino.login") == 3
+    assert stats.round_trips("tolino.login", command="executeScript") == 2
+    assert stats.round_trips(instrumentation.UNTRACED) == 1
+    assert stats.received_bytes("zeit.login", command="getPageSource") > 1_000_000
+
+    summary = stats.summary()
+    assert summary["wait: tolino login state known"]["round_trips"] == 2
+    assert summary["tolino.login"]["commands"] == {"findElement": 1}
+    assert stats.exceeded_budgets({"tolino.login": 3, "zeit.login": 0}) == ["zeit.login took 1 round trips, budget is 0"]
+
+
+def test_export_report(tmp_path: Path) -> None:
+    webdriver = _FakeWebDriver()
+    assert instrumentation.export_report(webdriver, tmp_path) is None
+
+    instrumentation.instrument(webdriver)
+    with tracing.span("zeit.login"):
+        webdriver.execute("getPageSource", {})
+    report = json.loads(instrumentation.export_report(webdriver, tmp_path).read_text())
+    assert report["summary"]["zeit.login"]["round_trips"] == 1
+    assert report["commands"][0]["command"] == "getPageSource"
+    assert report["commands"][0]["path"][-1] == "zeit.login"
+
+
+def test_enable_instrumentation(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv(OptionalEnvVars.ZEIT_ON_TOLINO_INSTRUMENTATION, raising=False)
+    assert instrumentation.enable_instrumentation(_FakeWebDriver()) is None
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_INSTRUMENTATION, "true")
+    assert instrumentation.enable_instrumentation(_FakeWebDriver()) is not None
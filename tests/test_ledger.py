@@ -0,0 +1,42 @@
+from datetime import date
+
+from zeit_on_tolino import ledger
+
+
+def test_parse_edition_date() -> None:
+    assert ledger.parse_edition_date("2024-05-08") == date(2024, 5, 8)
+    assert ledger.parse_edition_date("2024-05-08T00:00:00+00:00") == date(2024, 5, 8)
+    assert ledger.parse_edition_date("08.05.2024") == date(2024, 5, 8)
+    assert ledger.parse_edition_date("foo") is None
+    assert ledger.parse_edition_date(None) is None
+
+
+def test_current_release_window() -> None:
+    # wednesday, release day
+    assert ledger.current_release_window(date(2024, 5, 8)) == (date(2024, 5, 8), date(2024, 5, 9))
+    # tuesday, still the edition of the previous week
+    assert ledger.current_release_window(date(2024, 5, 14)) == (date(2024, 5, 8), date(2024, 5, 9))
+
+
+def test_record_and_check_upload(tmp_path) -> None:
+    ledger_path = tmp_path / "ledger.sqlite3"
+    edition = ledger.Edition(identifier="urn:zeit:1", title="DIE ZEIT 20/2024", date=date(2024, 5, 8), sha256="abc")
+    assert not ledger.is_uploaded(edition, "foo@example.com", ledger_path)
+    assert not ledger.is_release_synced(date(2024, 5, 8), ["foo@example.com"], ledger_path)
+
+    ledger.record_upload(edition, "Foo@example.com", ledger_path)
+    assert ledger.is_uploaded(edition, "foo@example.com", ledger_path)
+    assert not ledger.is_uploaded(edition, "baa@example.com", ledger_path)
+    assert ledger.is_release_synced(date(2024, 5, 8), ["foo@example.com"], ledger_path)
+    assert not ledger.is_release_synced(date(2024, 5, 8), ["foo@example.com", "baa@example.com"], ledger_path)
+    assert not ledger.is_release_synced(date(2024, 5, 15), ["foo@example.com"], ledger_path)
+
+    # the same content is detected even if the identifier changed
+    renamed = ledger.Edition(identifier="urn:zeit:2", title="DIE ZEIT 20/2024", date=date(2024, 5, 8), sha256="abc")
+    assert ledger.is_uploaded(renamed, "foo@example.com", ledger_path)
+
+
+def test_edition_from_epub(test_epub_path, test_epub_title) -> None:
+    edition = ledger.edition_from_epub(test_epub_path)
+    assert edition.title == test_epub_title
+    assert len(edition.sha256) == 64
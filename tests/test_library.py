@@ -0,0 +1,58 @@
+import pytest
+
+from zeit_on_tolino import library, tolino_cloud
+
+
+class _FakeWebDriver:
+    def __init__(self, entries: list) -> None:
+        self.entries = entries
+        self.script_calls = 0
+
+    def execute_script(self, script: str, *args) -> list:
+        self.script_calls += 1
+        return self.entries
+
+
+def test_get_inventory_from_dom() -> None:
+    webdriver = _FakeWebDriver(
+        [
+            {"index": 0, "title": "DIE ZEIT 20/2024", "id": "42", "upload_date": "08.05.2024"},
+            {"index": 1, "title": "Other Book", "id": None, "upload_date": None},
+        ]
+    )
+    inventory = library.get_inventory(webdriver)
+    assert inventory[0] == library.LibraryItem(
+        title="DIE ZEIT 20/2024", id="42", upload_date="08.05.2024", index=0, source=library.SOURCE_DOM
+    )
+    assert library.contains_title(webdriver, "Other Book")
+    assert not library.contains_title(webdriver, "DIE ZEIT")
+
+
+def test_inventory_is_cached_per_session() -> None:
+    webdriver = _FakeWebDriver([])
+    assert not library.contains_title(webdriver, "New Book")
+    webdriver.entries = [{"index": 0, "title": "New Book", "id": None, "upload_date": None}]
+    assert not library.contains_title(webdriver, "New Book")
+    assert webdriver.script_calls == 1
+
+    assert library.contains_title(webdriver, "New Book", refresh=True)
+    library.invalidate(webdriver)
+    assert library.contains_title(webdriver, "New Book")
+    assert webdriver.script_calls == 3
+
+
+def test_get_inventory_from_cloud(monkeypatch: pytest.MonkeyPatch) -> None:
+    credentials = tolino_cloud.CloudCredentials("token", "hardware", "reseller")
+    books = [tolino_cloud.CloudBook(id="42", title="DIE ZEIT 20/2024")]
+    monkeypatch.setattr(tolino_cloud, "list_books", lambda credentials: books)
+    webdriver = _FakeWebDriver([])
+    assert library.contains_title(webdriver, "DIE ZEIT 20/2024", credentials)
+
+    def list_books(credentials):
+        raise tolino_cloud.TolinoCloudError("503 Service Unavailable")
+
+    # the webreader may not show the books uploaded via the API yet, so it is no substitute for the cloud
+    monkeypatch.setattr(tolino_cloud, "list_books", list_books)
+    with pytest.raises(tolino_cloud.TolinoCloudError):
+        library.contains_title(webdriver, "DIE ZEIT 20/2024", credentials, refresh=True)
+    assert webdriver.script_calls == 0
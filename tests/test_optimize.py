@@ -0,0 +1,116 @@
+import io
+import zipfile
+
+import pytest
+
+from zeit_on_tolino import epub, optimize, validate
+
+Image = pytest.importorskip("PIL.Image", reason="requires the 'optimize' extra")
+
+CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+OPF = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>DIE ZEIT 20/2024</dc:title></metadata>
+  <manifest>
+    <item id="text" href="text/article.xhtml" media-type="application/xhtml+xml"/>
+    <item id="css" href="styles/zeit.css" media-type="text/css"/>
+    <item id="photo" href="images/photo.jpg" media-type="image/jpeg"/>
+    <item id="logo" href="images/logo.png" media-type="image/png"/>
+    <item id="font-used" href="fonts/TabletGothic.otf" media-type="font/otf"/>
+    <item id="font-unused" href="fonts/Unused%20Serif.otf" media-type="font/otf"/>
+    <item id="font-orphan" href="fonts/Orphan.ttf" media-type="font/ttf"/>
+  </manifest>
+</package>"""
+
+CSS = """@font-face { font-family: "Tablet Gothic"; src: url(../fonts/TabletGothic.otf); }
+@font-face { font-family: "Unused Serif"; src: url("../fonts/Unused%20Serif.otf"); }
+h1 { font: bold 2em/1.2 "Tablet Gothic"; }
+"""
+
+
+def _image_bytes(image_format: str, size: tuple) -> bytes:
+    image = Image.effect_noise(size, 64).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, image_format, quality=100) if image_format == "JPEG" else image.save(output, image_format)
+    return output.getvalue()
+
+
+@pytest.fixture
+def epub_path(tmp_path):
+    path = tmp_path / "zeit.epub"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zip_file.writestr(epub.CONTAINER_PATH, CONTAINER)
+        zip_file.writestr("OEBPS/content.opf", OPF)
+        zip_file.writestr("OEBPS/text/article.xhtml", '<html><link href="../styles/zeit.css"/><h1>Hi</h1></html>')
+        zip_file.writestr("OEBPS/styles/zeit.css", CSS)
+        zip_file.writestr("OEBPS/images/photo.jpg", _image_bytes("JPEG", (2400, 3200)))
+        zip_file.writestr("OEBPS/images/logo.png", _image_bytes("PNG", (64, 64)))
+        for font in ("TabletGothic.otf", "Unused Serif.otf", "Orphan.ttf"):
+            zip_file.writestr(f"OEBPS/fonts/{font}", b"font" * 1000)
+    yield path
+
+
+def test_optimize_epub(epub_path) -> None:
+    original_size = epub_path.stat().st_size
+    result = optimize.optimize_epub(epub_path, max_workers=2)
+
+    assert result.original_size == original_size
+    assert result.optimized_size == epub_path.stat().st_size < original_size
+    assert result.saved > 0
+    assert result.images_recompressed >= 1
+    assert result.fonts_dropped == 2
+
+    with zipfile.ZipFile(epub_path) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.infolist()[0].filename == "mimetype"
+        assert zip_file.infolist()[0].compress_type == zipfile.ZIP_STORED
+        names = set(zip_file.namelist())
+        assert "OEBPS/fonts/TabletGothic.otf" in names
+        assert "OEBPS/fonts/Unused Serif.otf" not in names and "OEBPS/fonts/Orphan.ttf" not in names
+        opf = zip_file.read("OEBPS/content.opf").decode()
+        assert "font-used" in opf and "font-unused" not in opf and "font-orphan" not in opf
+        css = zip_file.read("OEBPS/styles/zeit.css").decode()
+        assert "Tablet Gothic" in css and "Unused Serif" not in css
+        with Image.open(io.BytesIO(zip_file.read("OEBPS/images/photo.jpg"))) as photo:
+            assert photo.size == (1260, 1680)
+    assert epub.get_epub_info(epub_path).title == "DIE ZEIT 20/2024"
+
+
+def test_optimize_epub__keeps_optimal_file(epub_path) -> None:
+    optimize.optimize_epub(epub_path, max_workers=1)
+    optimized = epub_path.read_bytes()
+    result = optimize.optimize_epub(epub_path, max_workers=1)
+    assert result.saved == 0
+    assert epub_path.read_bytes() == optimized
+    assert not list(epub_path.parent.glob(".*.optimizing"))
+
+
+def test_optimize_epub__keeps_broken_image(epub_path, tmp_path) -> None:
+    path = tmp_path / "broken.epub"
+    broken_image = b"\xff\xd8\xff\xe0 not really a jpeg" * 100
+    with zipfile.ZipFile(epub_path) as original, zipfile.ZipFile(path, "w") as zip_file:
+        for info in original.infolist():
+            data = broken_image if info.filename == "OEBPS/images/photo.jpg" else original.read(info)
+            zip_file.writestr(info, data)
+
+    result = optimize.optimize_epub(path, max_workers=1)
+    assert result.saved > 0
+    assert result.fonts_dropped == 2
+    with zipfile.ZipFile(path) as zip_file:
+        assert zip_file.read("OEBPS/images/photo.jpg") == broken_image
+
+
+def test_optimize_epub__keeps_original_if_broken(epub_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    original = epub_path.read_bytes()
+    monkeypatch.setattr(
+        validate, "validate_epub", lambda path: validate.ValidationResult(path, errors=["member 'x' is corrupt"])
+    )
+    result = optimize.optimize_epub(epub_path, max_workers=1)
+    assert result.saved == 0
+    assert epub_path.read_bytes() == original
+    assert not list(epub_path.parent.glob(".*.optimizing"))
@@ -0,0 +1,151 @@
+import json
+import shutil
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from zeit_on_tolino import ledger, library, pipeline, runner, tolino, tolino_cloud, zeit
+from zeit_on_tolino.accounts import TolinoAccount
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+
+class Flaky:
+    """A stage which fails the given number of times before it succeeds."""
+
+    def __init__(self, name: str, calls: List[str], failures: int = 0, error: type = RuntimeError) -> None:
+        self.name = name
+        self.calls = calls
+        self.failures = failures
+        self.error = error
+
+    def __call__(self, context: Dict) -> Dict:
+        self.calls.append(self.name)
+        if self.failures > 0:
+            self.failures -= 1
+            raise self.error(f"{self.name} failed")
+        return {self.name: True}
+
+
+def test_run_pipeline__retry(tmp_path: Path) -> None:
+    calls, sleeps = [], []
+    stages = [
+        pipeline.Stage("a", Flaky("a", calls)),
+        pipeline.Stage("b", Flaky("b", calls)),
+        pipeline.Stage("c", Flaky("c", calls, failures=2), pipeline.RetryPolicy(attempts=3, delay=1, retry_from="b")),
+    ]
+    context = pipeline.run_pipeline("job", stages, tmp_path / "state.json", sleep=sleeps.append)
+    assert context == {"a": True, "b": True, "c": True}
+    assert calls == ["a", "b", "c", "b", "c", "b", "c"]
+    assert sleeps == [1, 1]
+    # the state of a finished job is removed
+    assert not (tmp_path / "state.json").exists()
+
+
+def test_run_pipeline__resume(tmp_path: Path) -> None:
+    state_path = tmp_path / "state.json"
+    calls = []
+    stages = [
+        pipeline.Stage("a", Flaky("a", calls)),
+        pipeline.Stage("login", Flaky("login", calls), can_resume=lambda context: False),
+        pipeline.Stage("b", Flaky("b", calls)),
+        pipeline.Stage("c", Flaky("c", calls, failures=1, error=KeyError), pipeline.RetryPolicy(retry_on=(OSError,))),
+    ]
+    with pytest.raises(KeyError):
+        pipeline.run_pipeline("job", stages, state_path, sleep=lambda s: None)
+    assert calls == ["a", "login", "b", "c"]
+    state = json.loads(state_path.read_text())
+    assert state["stages"]["c"]["status"] == pipeline.STATUS_FAILED
+
+    # the next run continues with the failed stage, after the stage which cannot be resumed
+    calls.clear()
+    assert pipeline.run_pipeline("job", stages, state_path) == {"a": True, "login": True, "b": True, "c": True}
+    assert calls == ["login", "c"]
+
+
+def test_run_pipeline__other_job(tmp_path: Path) -> None:
+    state_path = tmp_path / "state.json"
+    calls = []
+    stages = [pipeline.Stage("a", Flaky("a", calls)), pipeline.Stage("b", Flaky("b", calls, failures=1))]
+    with pytest.raises(RuntimeError):
+        pipeline.run_pipeline("job", stages, state_path)
+    pipeline.run_pipeline("other job", stages, state_path)
+    assert calls == ["a", "b", "a", "b"]
+
+
+def test_sync_edition__resumes_upload(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, test_epub_path: Path, test_epub_title: str
+) -> None:
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, str(tmp_path))
+    account = TolinoAccount("foo", "baa", "thalia")
+    calls, library_titles, upload_errors = [], [], 3
+
+    def download_e_paper(webdriver) -> Path:
+        calls.append("download")
+        return Path(shutil.copy(test_epub_path, tmp_path / "e-paper.epub"))
+
+    def upload(webdriver, path: Path, title: str) -> None:
+        nonlocal upload_errors
+        calls.append("upload")
+        if upload_errors > 0:
+            upload_errors -= 1
+            raise tolino_cloud.TolinoCloudError("503 Service Unavailable")
+        library_titles.append(title)
+
+    monkeypatch.setattr(zeit, "download_e_paper", download_e_paper)
+    monkeypatch.setattr(tolino, "_login", lambda webdriver, account: calls.append("login"))
+    monkeypatch.setattr(tolino, "_upload", upload)
+    monkeypatch.setattr(tolino_cloud, "get_credentials", lambda webdriver, indexed_db: None)
+    monkeypatch.setattr(library, "contains_title", lambda webdriver, title, *args, **kwargs: title in library_titles)
+    monkeypatch.setattr(runner, "RETRY_DELAY", 0)
+
+    with pytest.raises(tolino_cloud.TolinoCloudError):
+        runner.sync_edition(None, [account])
+    assert calls == ["download", "login", "upload", "login", "upload", "login", "upload"]
+
+    # the next run neither downloads nor validates the e-paper again
+    calls.clear()
+    edition = runner.sync_edition(None, [account])
+    assert calls == ["login", "upload"]
+    assert edition.title == test_epub_title
+    assert ledger.is_uploaded(edition, account.user)
+
+
+def test_sync_edition__does_not_resume_previous_release(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, test_epub_path: Path
+) -> None:
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, str(tmp_path))
+    account = TolinoAccount("foo", "baa", "thalia")
+    calls = []
+
+    def download_e_paper(webdriver) -> Path:
+        calls.append("download")
+        return Path(shutil.copy(test_epub_path, tmp_path / "e-paper.epub"))
+
+    def upload(webdriver, path: Path, title: str) -> None:
+        calls.append("upload")
+        raise tolino_cloud.TolinoCloudError("503 Service Unavailable")
+
+    monkeypatch.setattr(zeit, "download_e_paper", download_e_paper)
+    monkeypatch.setattr(tolino, "_login", lambda webdriver, account: None)
+    monkeypatch.setattr(tolino, "_upload", upload)
+    monkeypatch.setattr(tolino_cloud, "get_credentials", lambda webdriver, indexed_db: None)
+    monkeypatch.setattr(library, "contains_title", lambda webdriver, title, *args, **kwargs: False)
+    monkeypatch.setattr(runner, "RETRY_DELAY", 0)
+
+    release_day = date(2024, 5, 15)
+    with pytest.raises(tolino_cloud.TolinoCloudError):
+        runner.sync_edition(None, [account], today=release_day)
+
+    # within the same release window, the downloaded e-paper is reused
+    calls.clear()
+    with pytest.raises(tolino_cloud.TolinoCloudError):
+        runner.sync_edition(None, [account], today=release_day + timedelta(days=1))
+    assert calls[0] == "upload"
+
+    # a week later, a new edition is out and has to be downloaded
+    calls.clear()
+    with pytest.raises(tolino_cloud.TolinoCloudError):
+        runner.sync_edition(None, [account], today=release_day + timedelta(days=7))
+    assert calls[0] == "download"
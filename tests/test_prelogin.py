@@ -0,0 +1,118 @@
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from zeit_on_tolino import ledger, library, prelogin, runner, tolino, tolino_cloud, zeit
+from zeit_on_tolino.accounts import TolinoAccount
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+ACCOUNT = TolinoAccount("foo", "baa", "thalia")
+
+
+class FakeWebDriver:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.quit_called = threading.Event()
+
+    def quit(self) -> None:
+        self.quit_called.set()
+
+
+def test_background_login__cancel(monkeypatch: pytest.MonkeyPatch) -> None:
+    webdriver = FakeWebDriver("tolino")
+
+    def login(webdriver: FakeWebDriver, account: TolinoAccount) -> None:
+        # a login is aborted by quitting its browser
+        if webdriver.quit_called.wait(timeout=5):
+            raise RuntimeError("browser was quit")
+
+    monkeypatch.setattr(tolino, "_login", login)
+    start = time.monotonic()
+    with pytest.raises(zeit.EpubNotReady):
+        with prelogin.BackgroundLogin(lambda: webdriver, ACCOUNT):
+            # the download fails while the login is still going on
+            raise zeit.EpubNotReady("EPUB is not available yet")
+    assert webdriver.quit_called.is_set()
+    assert time.monotonic() - start < 1
+
+
+def test_background_login__failed(monkeypatch: pytest.MonkeyPatch) -> None:
+    webdriver = FakeWebDriver("tolino")
+    monkeypatch.setattr(tolino, "_login", lambda webdriver, account: 1 / 0)
+    with prelogin.BackgroundLogin(lambda: webdriver, ACCOUNT) as background_login:
+        with pytest.raises(ZeroDivisionError):
+            background_login.join()
+    assert webdriver.quit_called.is_set()
+
+
+def test_sync_edition__parallel_login(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, test_epub_path: Path, test_epub_title: str
+) -> None:
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, str(tmp_path))
+    zeit_webdriver, tolino_webdriver = FakeWebDriver("zeit"), FakeWebDriver("tolino")
+    library_titles, uploaded_with = [], []
+
+    def download_e_paper(webdriver: FakeWebDriver) -> Path:
+        time.sleep(0.3)
+        return Path(shutil.copy(test_epub_path, tmp_path / "e-paper.epub"))
+
+    def login(webdriver: FakeWebDriver, account: TolinoAccount) -> None:
+        assert webdriver is tolino_webdriver
+        time.sleep(0.3)
+
+    def upload(webdriver: FakeWebDriver, path: Path, title: str) -> None:
+        uploaded_with.append(webdriver.name)
+        library_titles.append(title)
+
+    monkeypatch.setattr(zeit, "download_e_paper", download_e_paper)
+    monkeypatch.setattr(tolino, "_login", login)
+    monkeypatch.setattr(tolino, "_upload", upload)
+    monkeypatch.setattr(tolino_cloud, "get_credentials", lambda webdriver, indexed_db: None)
+    monkeypatch.setattr(library, "contains_title", lambda webdriver, title, *args, **kwargs: title in library_titles)
+
+    start = time.monotonic()
+    edition = runner.sync_edition(zeit_webdriver, [ACCOUNT], create_tolino_webdriver=lambda: tolino_webdriver)
+    # the login overlaps with the download, so the sync takes about as long as one of them
+    assert time.monotonic() - start < 0.55
+    assert uploaded_with == ["tolino"]
+    assert ledger.is_uploaded(edition, ACCOUNT.user)
+    assert edition.title == test_epub_title
+    assert tolino_webdriver.quit_called.is_set() and not zeit_webdriver.quit_called.is_set()
+
+
+def test_sync_edition__parallel_login_failed(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, test_epub_path: Path
+) -> None:
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, str(tmp_path))
+    zeit_webdriver, tolino_webdriver = FakeWebDriver("zeit"), FakeWebDriver("tolino")
+    logins, uploaded_with = [], []
+
+    def login(webdriver: FakeWebDriver, account: TolinoAccount) -> None:
+        logins.append(webdriver.name)
+        if webdriver is tolino_webdriver:
+            raise RuntimeError("login failed")
+
+    monkeypatch.setattr(zeit, "download_e_paper", lambda webdriver: Path(shutil.copy(test_epub_path, tmp_path)))
+    monkeypatch.setattr(tolino, "_login", login)
+    monkeypatch.setattr(tolino, "_upload", lambda webdriver, path, title: uploaded_with.append(webdriver.name))
+    monkeypatch.setattr(tolino_cloud, "get_credentials", lambda webdriver, indexed_db: None)
+    monkeypatch.setattr(library, "contains_title", lambda webdriver, title, *args, **kwargs: True)
+    monkeypatch.setattr(runner, "RETRY_DELAY", 0)
+
+    runner.sync_edition(zeit_webdriver, [ACCOUNT], create_tolino_webdriver=lambda: tolino_webdriver)
+    # the failed login in the second browser is retried with the main one
+    assert logins == ["tolino", "zeit"]
+    assert uploaded_with == ["zeit"]
+    assert tolino_webdriver.quit_called.is_set()
+
+
+@pytest.mark.parametrize("value, enabled", [(None, True), ("true", True), ("false", False), ("0", False)])
+def test_is_enabled(value: str, enabled: bool, monkeypatch: pytest.MonkeyPatch) -> None:
+    if value is None:
+        monkeypatch.delenv(OptionalEnvVars.ZEIT_ON_TOLINO_PARALLEL_LOGIN, raising=False)
+    else:
+        monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_PARALLEL_LOGIN, value)
+    assert prelogin.is_enabled() is enabled
@@ -0,0 +1,123 @@
+import json
+import threading
+from dataclasses import asdict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from zeit_on_tolino import ledger, probe, session, zeit
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+ACCOUNT = "foo@example.com"
+
+
+class _EpaperHandler(BaseHTTPRequestHandler):
+    pages = {}
+    requests = []
+
+    def do_GET(self) -> None:
+        body = self.pages.get(self.path)
+        etag = f'"{hash(body)}"'
+        self.requests.append((self.path, self.headers.get("Cookie"), self.headers.get("If-None-Match")))
+        if body is None:
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def epaper_url(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, str(tmp_path))
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_SESSION_KEY, "secret")
+    state = session.SessionState(
+        origin=zeit.ZEIT_SESSION.origin,
+        saved_at=0,
+        cookies=[{"name": "zeit_session", "value": "abc", "domain": "127.0.0.1", "path": "/"}],
+    )
+    session.get_session_path(zeit.ZEIT_SESSION).write_bytes(
+        session.encrypt(json.dumps(asdict(state)).encode(), "secret")
+    )
+    _EpaperHandler.pages = {
+        "/abo/diezeit": (
+            '<a href="/abo/diezeit/16.05.2024">Zur aktuellen Ausgabe</a>'
+            '<a href="/abo/diezeit/16.05.2024">DIE ZEIT 22/2024 16.05.2024</a>'
+            '<a href="/abo/diezeit/08.05.2024">08.05.2024</a>'
+        ),
+        "/abo/diezeit/16.05.2024": "<span>EPUB folgt in Kürze</span>",
+    }
+    _EpaperHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EpaperHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/abo/diezeit"
+    server.shutdown()
+
+
+def test_parse_overview() -> None:
+    url = "https://epaper.zeit.de/abo/diezeit"
+    html = '<a href="/abo/diezeit/16.05.2024">ZUR AKTUELLEN AUSGABE</a><a href="/abo/diezeit/16.05.2024">16.05.2024</a>'
+    assert probe.parse_overview(html, url) == {
+        "edition_url": "https://epaper.zeit.de/abo/diezeit/16.05.2024",
+        "edition_date": "2024-05-16",
+    }
+    # the login page does not link the recent edition
+    assert probe.parse_overview('<form id="login"></form>', url) == {}
+
+
+def test_probe(epaper_url: str, tmp_path: Path) -> None:
+    ledger_path = tmp_path / "ledger.sqlite3"
+
+    result = probe.probe([ACCOUNT], epaper_url, ledger_path=ledger_path)
+    assert result.status == probe.STATUS_PENDING
+    assert result.edition_date == date(2024, 5, 16)
+    assert {cookie for _, cookie, _ in _EpaperHandler.requests} == {"zeit_session=abc"}
+
+    # unchanged pages are answered with 304 and taken from the cache
+    _EpaperHandler.requests = []
+    assert probe.probe([ACCOUNT], epaper_url, ledger_path=ledger_path).status == probe.STATUS_PENDING
+    assert all(etag is not None for _, _, etag in _EpaperHandler.requests)
+
+    _EpaperHandler.pages["/abo/diezeit/16.05.2024"] = '<a href="/download/16">EPUB für E-Reader laden</a>'
+    assert probe.probe([ACCOUNT], epaper_url, ledger_path=ledger_path).status == probe.STATUS_NEW
+
+    edition = ledger.Edition(identifier="urn:zeit:22", title="DIE ZEIT 22/2024", date=date(2024, 5, 15), sha256="a")
+    ledger.record_upload(edition, ACCOUNT, ledger_path)
+    _EpaperHandler.requests = []
+    assert probe.probe([ACCOUNT], epaper_url, ledger_path=ledger_path).status == probe.STATUS_SYNCED
+    assert [path for path, _, _ in _EpaperHandler.requests] == ["/abo/diezeit"]
+
+
+def test_probe__unknown(epaper_url: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    _EpaperHandler.pages["/abo/diezeit"] = '<form id="login"></form>'
+    assert probe.probe([ACCOUNT], epaper_url).status == probe.STATUS_UNKNOWN
+
+    monkeypatch.delenv(OptionalEnvVars.ZEIT_ON_TOLINO_SESSION_KEY)
+    result = probe.probe([ACCOUNT], epaper_url)
+    assert result.status == probe.STATUS_UNKNOWN
+    assert result.reason == "no stored ZEIT session"
+
+
+@pytest.mark.parametrize(
+    "status, sync_needed",
+    [
+        (probe.STATUS_NEW, True),
+        (probe.STATUS_UNKNOWN, True),
+        (probe.STATUS_PENDING, False),
+        (probe.STATUS_SYNCED, False),
+    ],
+)
+def test_is_sync_needed(status: str, sync_needed: bool, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(probe, "probe", lambda accounts: probe.ProbeResult(status, date(2024, 5, 16)))
+    assert probe.is_sync_needed([ACCOUNT]) is sync_needed
@@ -0,0 +1,37 @@
+from typing import List
+
+from zeit_on_tolino import query
+
+
+class _FakeWebDriver:
+    """Answers every script with the given result, recording the scripts run."""
+
+    def __init__(self, result) -> None:
+        self.result = result
+        self.scripts: List[tuple] = []
+
+    def execute_script(self, script: str, *args):
+        self.scripts.append((script, args))
+        return self.result
+
+
+def test_first_of() -> None:
+    webdriver = _FakeWebDriver([1, "element"])
+    assert query.first_of(webdriver, "span.a", "div.b", "div.c") == query.Match("div.b", "element")
+    # all selectors are looked up in a single round trip
+    assert len(webdriver.scripts) == 1
+    assert webdriver.scripts[0][1] == (["span.a", "div.b", "div.c"],)
+
+    assert query.first_of(_FakeWebDriver(None), "span.a") is None
+
+
+def test_by_text() -> None:
+    webdriver = _FakeWebDriver("link")
+    assert query.by_text(webdriver, "ZUR AKTUELLEN AUSGABE") == "link"
+    assert webdriver.scripts[0][1] == ("a", "ZUR AKTUELLEN AUSGABE")
+    assert query.by_text(_FakeWebDriver(None), "EPUB FÜR E-READER LADEN", tag="span") is None
+
+
+def test_exists() -> None:
+    assert query.exists(_FakeWebDriver(True), 'div[data-test-id="dialogButton-0"]')
+    assert not query.exists(_FakeWebDriver(False), 'div[data-test-id="dialogButton-0"]')
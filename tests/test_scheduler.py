@@ -0,0 +1,103 @@
+from typing import List
+
+import pytest
+
+from zeit_on_tolino import ledger, probe, scheduler, zeit
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_backoff() -> None:
+    delays = scheduler.Backoff(initial=10, maximum=60, factor=2, jitter=0.5).delays()
+    for expected in (10, 20, 40, 60, 60):
+        assert expected * 0.5 <= next(delays) <= expected * 1.5
+
+
+def test_poll() -> None:
+    clock = FakeClock()
+    results = iter([False, False, True])
+    backoff = scheduler.Backoff(initial=10, jitter=0)
+    assert scheduler.poll(lambda: next(results), 1000, backoff, clock.sleep, clock.time) is True
+    assert clock.sleeps == [10, 20]
+
+
+def test_poll__deadline() -> None:
+    clock = FakeClock()
+    attempts = []
+    backoff = scheduler.Backoff(initial=10, jitter=0)
+    assert scheduler.poll(lambda: attempts.append(clock.now) or False, 100, backoff, clock.sleep, clock.time) is False
+    # the last attempt happens right at the deadline
+    assert attempts == [0, 10, 30, 70, 100]
+
+
+def test_sync_when_released(monkeypatch: pytest.MonkeyPatch) -> None:
+    synced = []
+    monkeypatch.setattr(ledger, "is_up_to_date", lambda accounts: bool(synced))
+    statuses = iter([probe.STATUS_SYNCED, probe.STATUS_PENDING, probe.STATUS_UNKNOWN, probe.STATUS_NEW])
+    monkeypatch.setattr(probe, "probe", lambda accounts: probe.ProbeResult(next(statuses)))
+    runs = []
+
+    def run_sync() -> None:
+        runs.append(len(runs))
+        if len(runs) == 1:
+            raise zeit.EpubNotReady("EPUB version is not available.")
+        synced.append(True)
+
+    clock = FakeClock()
+    backoff = scheduler.Backoff(initial=10, jitter=0)
+    assert scheduler.sync_when_released(["foo"], run_sync, 1000, backoff, clock.sleep, clock.time) is True
+    # the browser is only started if the probe could not tell or found the EPUB
+    assert runs == [0, 1]
+    assert clock.sleeps == [10, 20, 40]
+
+
+def test_sync_when_released__unknown(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(ledger, "is_up_to_date", lambda accounts: False)
+    monkeypatch.setattr(probe, "probe", lambda accounts: probe.ProbeResult(probe.STATUS_UNKNOWN, reason="no session"))
+    monkeypatch.setattr(scheduler, "BROWSER_CHECK_INTERVAL", 50)
+    clock = FakeClock()
+    runs = []
+
+    def run_sync() -> None:
+        runs.append(clock.now)
+        raise zeit.EpubNotReady("EPUB version is not available.")
+
+    backoff = scheduler.Backoff(initial=10, jitter=0)
+    assert scheduler.sync_when_released(["foo"], run_sync, 200, backoff, clock.sleep, clock.time) is False
+    # without the probe telling, the browser checks for the EPUB at most every interval, not at every attempt
+    assert clock.sleeps == [10, 20, 40, 80, 50]
+    assert runs == [0, 70, 150, 200]
+
+
+def test_sync_when_released__error(monkeypatch: pytest.MonkeyPatch) -> None:
+    synced = []
+    monkeypatch.setattr(ledger, "is_up_to_date", lambda accounts: bool(synced))
+    monkeypatch.setattr(probe, "probe", lambda accounts: probe.ProbeResult(probe.STATUS_NEW))
+    errors = [ConnectionError("tolino unavailable")]
+
+    def run_sync() -> None:
+        if errors:
+            raise errors.pop()
+        synced.append(True)
+
+    clock = FakeClock()
+    backoff = scheduler.Backoff(initial=10, jitter=0)
+    assert scheduler.sync_when_released(["foo"], run_sync, 1000, backoff, clock.sleep, clock.time) is True
+    assert clock.sleeps == [10]
+
+    # an error which persists until the deadline is raised
+    synced.clear()
+    errors.extend([ConnectionError("tolino unavailable")] * 10)
+    with pytest.raises(ConnectionError, match="tolino unavailable"):
+        scheduler.sync_when_released(["foo"], run_sync, clock.now + 100, backoff, clock.sleep, clock.time)
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from cryptography.fernet import InvalidToken
+
+from zeit_on_tolino import session
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+SITE = session.Site(name="example", origin="https://www.example.com", cookie_domains=("example.com",), indexed_db="db")
+
+
+class _FakeWebDriver:
+    def __init__(self) -> None:
+        self.cdp_commands = []
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        self.cdp_commands.append((cmd, params))
+        if cmd == "Network.getAllCookies":
+            return {
+                "cookies": [
+                    {"name": "session", "value": "foo", "domain": ".example.com", "path": "/", "expires": -1},
+                    {"name": "tracker", "value": "baa", "domain": ".ads.net", "path": "/", "expires": -1},
+                ]
+            }
+        if cmd == "Page.addScriptToEvaluateOnNewDocument":
+            return {"identifier": "1"}
+        return {}
+
+    def execute_async_script(self, script: str, *args) -> dict:
+        return {"local_storage": {"token": "baz"}, "indexed_db": {}, "version": 1}
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, str(tmp_path))
+    monkeypatch.setenv(OptionalEnvVars.ZEIT_ON_TOLINO_SESSION_KEY, "secret")
+    yield tmp_path
+
+
+def test_encrypt_decrypt() -> None:
+    encrypted = session.encrypt(b"cookies", "secret")
+    assert b"cookies" not in encrypted
+    assert session.decrypt(encrypted, "secret") == b"cookies"
+    with pytest.raises(InvalidToken):
+        session.decrypt(encrypted, "wrong")
+
+
+def test_save_and_restore(state_dir) -> None:
+    path = session.save(_FakeWebDriver(), SITE)
+    assert path.is_file()
+    assert b"baz" not in path.read_bytes()
+
+    webdriver = _FakeWebDriver()
+    assert session.restore(webdriver, SITE)
+    (_, set_cookies), (_, add_script) = webdriver.cdp_commands
+    assert set_cookies["cookies"] == [{"name": "session", "value": "foo", "domain": ".example.com", "path": "/"}]
+    assert json.dumps({"token": "baz"}) in add_script["source"]
+
+    session.finish_restore(webdriver, SITE)
+    assert webdriver.cdp_commands[-1] == ("Page.removeScriptToEvaluateOnNewDocument", {"identifier": "1"})
+
+
+def test_no_session_without_key(state_dir, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv(OptionalEnvVars.ZEIT_ON_TOLINO_SESSION_KEY)
+    assert session.save(_FakeWebDriver(), SITE) is None
+    assert not session.restore(_FakeWebDriver(), SITE)
+
+
+def test_discard(state_dir) -> None:
+    session.save(_FakeWebDriver(), SITE)
+    webdriver = _FakeWebDriver()
+    session.restore(webdriver, SITE)
+    session.discard(webdriver, SITE)
+    assert not session.get_session_path(SITE).exists()
+    assert ("Network.deleteCookies", {"name": "session", "domain": ".example.com"}) in webdriver.cdp_commands
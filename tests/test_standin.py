@@ -0,0 +1,75 @@
+import re
+import time
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+from pathlib import Path
+
+from tests.standin import StandIn
+from zeit_on_tolino import backfill, probe, zeit
+
+
+def _opener() -> urllib.request.OpenerDirector:
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+
+def _post(opener: urllib.request.OpenerDirector, url: str, form: dict) -> str:
+    with opener.open(url, data=urllib.parse.urlencode(form).encode()) as response:
+        return response.read().decode()
+
+
+def test_standin__zeit(standin: StandIn, test_epub_path: Path) -> None:
+    opener = _opener()
+    with opener.open(standin.zeit_url) as response:
+        assert 'id="login_email"' in response.read().decode()
+
+    overview = _post(opener, f"{standin.url}/zeit/login", {"email": "foo", "password": "baa"})
+    assert probe.parse_overview(overview, standin.zeit_url)["edition_date"] == "2024-05-16"
+
+    edition_url = probe.parse_overview(overview, standin.zeit_url)["edition_url"]
+    with opener.open(edition_url) as response:
+        epub_url = backfill.find_epub_url(response.read().decode(), edition_url)
+    with opener.open(epub_url) as response:
+        assert response.read() == test_epub_path.read_bytes()
+
+    standin.epub_ready = False
+    with opener.open(edition_url) as response:
+        assert zeit.BUTTON_TEXT_EPUB_DOWNLOAD_IS_PENDING in response.read().decode()
+
+
+def test_standin__tolino(standin: StandIn, test_epub_path: Path, test_epub_title: str) -> None:
+    opener = _opener()
+    with opener.open(standin.tolino_url) as response:
+        assert 'data-test-id="countrySelector"' in response.read().decode()
+
+    library = _post(opener, f"{standin.url}/shop/login", {"email": "foo", "password": "baa"})
+    assert 'data-test-id="library-drawer-labelLoggedIn"' in library
+    assert "library-myBooks-titles-list-0" not in library
+
+    opener.open(urllib.request.Request(f"{standin.url}/webreader/upload", data=test_epub_path.read_bytes()))
+    with opener.open(standin.tolino_url) as response:
+        assert (
+            f'<span data-test-id="library-myBooks-titles-list-0-title">{test_epub_title}</span>'
+            in response.read().decode()
+        )
+    assert standin.library == [test_epub_title]
+
+
+def test_standin__tolino_login_state(standin: StandIn) -> None:
+    with _opener().open(standin.tolino_url) as response:
+        state = re.search(r"const state = '(\w+)'", response.read().decode()).group(1)
+    form = {"email": "foo", "password": "baa", "state": state}
+    assert 'data-test-id="library-drawer-labelLoggedIn"' in _post(_opener(), f"{standin.url}/shop/login", form)
+    # the state is only valid for a single login
+    assert 'data-test-id="email"' in _post(_opener(), f"{standin.url}/shop/login", form)
+
+
+def test_standin__latency(test_epub_path: Path) -> None:
+    standin = StandIn(test_epub_path, latency=0.2).start()
+    try:
+        start = time.monotonic()
+        urllib.request.urlopen(standin.zeit_url).read()
+        assert time.monotonic() - start >= 0.2
+        assert standin.requests == ["GET /abo/diezeit"]
+    finally:
+        standin.stop()
@@ -1,16 +1,113 @@
+import json
 import logging
 import time
+from pathlib import Path
 
+import pytest
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.webdriver import WebDriver
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from zeit_on_tolino import tolino
-from zeit_on_tolino.env_vars import EnvVars
+from tests.standin import StandIn
+from zeit_on_tolino import library, tolino, tolino_cloud, tolino_partner, wait
+from zeit_on_tolino.env_vars import EnvVars, get_state_dir
 from zeit_on_tolino.web import Delay
 
 
+class FakeWebDriver:
+    def __init__(self) -> None:
+        self.refreshed = False
+
+    def refresh(self) -> None:
+        self.refreshed = True
+
+
+@pytest.fixture
+def cloud_upload(monkeypatch):
+    """Uploads via a fake tolino cloud API, `contains_title` returns or raises the queued results one by one."""
+    uploads = []
+    results = []
+
+    def contains_title(webdriver, title, credentials=None, refresh=False):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def upload(credentials, file_path):
+        uploads.append(file_path)
+        return tolino_cloud.CloudBook(id="book-1", title="Die Zeit")
+
+    credentials = tolino_cloud.CloudCredentials("token", "hardware", "reseller")
+    monkeypatch.setattr(tolino_cloud, "get_credentials", lambda webdriver, indexed_db: credentials)
+    monkeypatch.setattr(tolino_cloud, "upload", upload)
+    monkeypatch.setattr(library, "contains_title", contains_title)
+    monkeypatch.setattr(wait, "wait_for", lambda *args, **kwargs: True)
+    monkeypatch.setattr(tolino, "VERIFY_DELAY", 0)
+    return uploads, results
+
+
+def test_upload_via_api__retries_verification(cloud_upload, tmp_path: Path) -> None:
+    uploads, results = cloud_upload
+    results.extend([False, tolino_cloud.TolinoCloudError("library unavailable"), False, True])
+    webdriver = FakeWebDriver()
+
+    assert tolino._upload_via_api(webdriver, tmp_path / "die_zeit.epub", "Die Zeit") is True
+    assert len(uploads) == 1
+    assert webdriver.refreshed
+
+
+def test_upload_via_api__no_fallback_after_upload(cloud_upload, tmp_path: Path) -> None:
+    uploads, results = cloud_upload
+    results.extend([False] + [tolino_cloud.TolinoCloudError("library unavailable")] * tolino.VERIFY_ATTEMPTS)
+
+    # the book is uploaded already, falling back to the web UI would upload it again
+    with pytest.raises(tolino_cloud.TolinoCloudError, match="not found in library after upload"):
+        tolino._upload_via_api(FakeWebDriver(), tmp_path / "die_zeit.epub", "Die Zeit")
+    assert len(uploads) == 1
+
+
+def test_upload_via_api__list_fails_after_upload(monkeypatch, tmp_path: Path) -> None:
+    uploads, books = [], []
+    list_errors = 1
+
+    def upload(credentials, file_path):
+        uploads.append(file_path)
+        books.append(tolino_cloud.CloudBook(id="book-1", title="Die Zeit"))
+        return books[-1]
+
+    def list_books(credentials):
+        nonlocal list_errors
+        # the library request right after the upload fails once
+        if uploads and list_errors > 0:
+            list_errors -= 1
+            raise tolino_cloud.TolinoCloudError("503 Service Unavailable")
+        return list(books)
+
+    credentials = tolino_cloud.CloudCredentials("token", "hardware", "reseller")
+    monkeypatch.setattr(tolino_cloud, "get_credentials", lambda webdriver, indexed_db: credentials)
+    monkeypatch.setattr(tolino_cloud, "upload", upload)
+    monkeypatch.setattr(tolino_cloud, "list_books", list_books)
+    monkeypatch.setattr(wait, "wait_for", lambda *args, **kwargs: True)
+    monkeypatch.setattr(tolino, "VERIFY_DELAY", 0)
+
+    # the stale webreader page is not read, which would not show the uploaded book yet
+    assert tolino._upload_via_api(FakeWebDriver(), tmp_path / "die_zeit.epub", "Die Zeit") is True
+    assert len(uploads) == 1
+
+
+def test_upload_via_api__falls_back_if_upload_fails(cloud_upload, monkeypatch, tmp_path: Path) -> None:
+    _, results = cloud_upload
+    results.append(False)
+
+    def upload(credentials, file_path):
+        raise tolino_cloud.TolinoCloudError("upload rejected")
+
+    monkeypatch.setattr(tolino_cloud, "upload", upload)
+    assert tolino._upload_via_api(FakeWebDriver(), tmp_path / "die_zeit.epub", "Die Zeit") is False
+
+
 def test__login(webdriver) -> None:
     tolino._login(webdriver)
     # wait until logged in
@@ -20,6 +117,35 @@ def test__login(webdriver) -> None:
     assert "Angemeldet" in webdriver.page_source
 
 
+def test_login__deep_link(webdriver, standin: StandIn) -> None:
+    tolino._login(webdriver)
+    # the one-time state of the login is not stored along with the URL
+    assert tolino_partner.get_shop("thalia").login_url == f"{standin.url}/shop/login?shop=thalia"
+
+    # the next login opens the partner shop login directly
+    webdriver.delete_all_cookies()
+    standin.requests.clear()
+    tolino._login(webdriver)
+    assert "GET /shop/login?shop=thalia" in standin.requests
+    assert not any(request.startswith("GET /shop/login?shop=thalia&state=") for request in standin.requests)
+    assert "Angemeldet" in webdriver.page_source
+
+
+def test_login__deep_link_fallback(webdriver, standin: StandIn, monkeypatch) -> None:
+    # the rejected login is only noticed once waiting for the library timed out
+    monkeypatch.setattr(Delay, "large", Delay.small)
+    # a stored login URL whose one-time state was used already
+    cache_path = get_state_dir() / tolino_partner.CACHE_FILE_NAME
+    cache_path.write_text(json.dumps({"thalia": f"{standin.url}/shop/login?shop=thalia&state=used"}))
+
+    tolino._login(webdriver)
+    assert "Angemeldet" in webdriver.page_source
+    # the partner shop was selected in the webreader within the same login
+    picked = [r for r in standin.requests if r.startswith("GET /shop/login?shop=thalia&state=") and "used" not in r]
+    assert len(picked) == 1
+    assert tolino_partner.get_shop("thalia").login_url == f"{standin.url}/shop/login?shop=thalia"
+
+
 def _delete_last_uploaded_epub(webdriver: WebDriver) -> None:
     # refresh page to ensure menu is closed for further interaction with the page
     webdriver.refresh()
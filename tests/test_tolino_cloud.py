@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from zeit_on_tolino import tolino_cloud
+
+CREDENTIALS = tolino_cloud.CloudCredentials(access_token="token", hardware_id="hardware", reseller_id="3")
+
+
+class _FakeTolinoCloud(BaseHTTPRequestHandler):
+    books = []
+
+    def _send_json(self, status: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        return self.headers.get("t_auth_token") == "token" and self.headers.get("reseller_id") == "3"
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return self._send_json(401, {})
+        edata = [{"publicationId": str(i), "epubMetaData": {"title": title}} for i, title in enumerate(self.books)]
+        self._send_json(200, {"PublicationInventory": {"edata": edata, "ebook": []}})
+
+    def do_POST(self) -> None:
+        if not self._authorized():
+            return self._send_json(401, {})
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        assert b'filename="test.epub"' in body
+        self.books.append("Test Title")
+        self._send_json(200, {"metadata": {"deliverableId": "42", "title": "Test Title"}})
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def api_url():
+    _FakeTolinoCloud.books = ["Other Book"]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeTolinoCloud)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/bosh/rest"
+    server.shutdown()
+
+
+def test_upload_and_list_books(api_url, tmp_path) -> None:
+    epub_path = tmp_path / "test.epub"
+    epub_path.write_bytes(b"PK fake epub")
+
+    assert [b.title for b in tolino_cloud.list_books(CREDENTIALS, api_url)] == ["Other Book"]
+    book = tolino_cloud.upload(CREDENTIALS, epub_path, api_url)
+    assert book == tolino_cloud.CloudBook(id="42", title="Test Title")
+    assert [b.title for b in tolino_cloud.list_books(CREDENTIALS, api_url)] == ["Other Book", "Test Title"]
+
+
+def test_unauthorized(api_url) -> None:
+    credentials = tolino_cloud.CloudCredentials(access_token="expired", hardware_id="hardware", reseller_id="3")
+    with pytest.raises(tolino_cloud.TolinoCloudError, match="HTTP status 401"):
+        tolino_cloud.list_books(credentials, api_url)
+
+
+def test_find_value() -> None:
+    storage = {
+        "local_storage": {"settings": "{}", "auth": json.dumps({"token": {"accessToken": "abc"}})},
+        "indexed_db": {"user": {"items": [{"key": 1, "value": {"hardwareId": "hw", "resellerId": 3}}]}},
+    }
+    assert tolino_cloud._find_value(storage, tolino_cloud.ACCESS_TOKEN_KEYS) == "abc"
+    assert tolino_cloud._find_value(storage, tolino_cloud.HARDWARE_ID_KEYS) == "hw"
+    assert tolino_cloud._find_value(storage, tolino_cloud.RESELLER_ID_KEYS) == "3"
+    assert tolino_cloud._find_value(storage, ("missing",)) is None
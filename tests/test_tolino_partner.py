@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from zeit_on_tolino import tolino_partner
+
+
+def test_get_shop(tmp_path: Path) -> None:
+    cache_path = tmp_path / tolino_partner.CACHE_FILE_NAME
+    shop = tolino_partner.get_shop("thalia", cache_path)
+    assert shop.country == tolino_partner.DEFAULT_COUNTRY
+    assert shop.login_url is None
+
+    login_url = "https://www.thalia.de/auth/oauth2/authorize?client_id=webreader"
+    tolino_partner.remember_login_url("thalia", login_url, cache_path)
+    assert tolino_partner.get_shop("thalia", cache_path).login_url == login_url
+    assert tolino_partner.get_shop("hugendubel", cache_path).login_url is None
+    # the registry itself is not changed by the learned URL
+    assert tolino_partner.PartnerDetails.thalia.value.login_url is None
+
+    tolino_partner.remember_login_url("thalia", None, cache_path)
+    assert tolino_partner.get_shop("thalia", cache_path).login_url is None
+
+    with pytest.raises(ValueError, match="'foo' is not supported"):
+        tolino_partner.get_shop("foo", cache_path)
+
+
+def test_get_shop__broken_cache(tmp_path: Path) -> None:
+    cache_path = tmp_path / tolino_partner.CACHE_FILE_NAME
+    cache_path.write_text("{")
+    assert tolino_partner.get_shop("thalia", cache_path).login_url is None
+
+
+def test_remember_login_url__strips_one_time_parameters(tmp_path: Path) -> None:
+    cache_path = tmp_path / tolino_partner.CACHE_FILE_NAME
+    login_url = "https://www.thalia.de/auth/oauth2/authorize?client_id=webreader&state=4f1c&nonce=9a2e#login"
+    tolino_partner.remember_login_url("thalia", login_url, cache_path)
+    assert (
+        tolino_partner.get_shop("thalia", cache_path).login_url
+        == "https://www.thalia.de/auth/oauth2/authorize?client_id=webreader"
+    )
+    assert [path.name for path in tmp_path.iterdir()] == [tolino_partner.CACHE_FILE_NAME]
+
+
+def test_remember_login_url__in_parallel(tmp_path: Path) -> None:
+    cache_path = tmp_path / tolino_partner.CACHE_FILE_NAME
+    shops = [shop.name for shop in tolino_partner.PartnerDetails] * 20
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        urls = [f"https://{shop}.de/login" for shop in shops]
+        list(pool.map(tolino_partner.remember_login_url, shops, urls, [cache_path] * len(shops)))
+    assert [path.name for path in tmp_path.iterdir()] == [tolino_partner.CACHE_FILE_NAME]
+    for shop in tolino_partner.PartnerDetails:
+        assert tolino_partner.get_shop(shop.name, cache_path).login_url == f"https://{shop.name}.de/login"
@@ -0,0 +1,60 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from zeit_on_tolino import tracing
+
+
+def test_nested_spans(tmp_path) -> None:
+    tracer = tracing.reset()
+
+    @tracing.traced("inner")
+    def inner() -> None:
+        pass
+
+    with tracing.span("outer", edition="foo"):
+        inner()
+
+    outer_span, inner_span = tracer.spans()
+    assert outer_span.name == "outer"
+    assert outer_span.parent_id is None
+    assert outer_span.attributes == {"edition": "foo"}
+    assert inner_span.parent_id == outer_span.span_id
+    assert outer_span.duration >= inner_span.duration
+
+    path = tracing.export_timeline(tmp_path)
+    timeline = json.loads(path.read_text())
+    assert timeline["run_id"] == tracer.run_id
+    assert [s["name"] for s in timeline["spans"]] == ["outer", "inner"]
+
+
+def test_span_records_error() -> None:
+    tracer = tracing.reset()
+    with pytest.raises(RuntimeError):
+        with tracing.span("failing"):
+            raise RuntimeError("boom")
+
+    failed_span = tracer.spans()[0]
+    assert failed_span.status == "error"
+    assert failed_span.error == "RuntimeError: boom"
+    assert failed_span.duration is not None
+
+
+def test_submit__nests_spans_of_pool_threads() -> None:
+    tracer = tracing.reset()
+
+    @tracing.traced("worker")
+    def worker() -> tuple:
+        return tracing.current_path()
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pool") as pool:
+        with tracing.span("outer"):
+            assert tracing.submit(pool, worker).result() == ("outer", "worker")
+        # a plain submit does not carry the context over, the span of the worker becomes a root of its own
+        pool.submit(worker).result()
+
+    outer_span, nested_span, root_span = tracer.spans()
+    assert nested_span.parent_id == outer_span.span_id
+    assert nested_span.thread.startswith("pool")
+    assert root_span.parent_id is None
@@ -0,0 +1,105 @@
+import zipfile
+
+from zeit_on_tolino import epub, validate
+
+CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+OPF = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>DIE ZEIT 20/2024</dc:title></metadata>
+  <manifest>
+    <item id="text" href="text/article.xhtml" media-type="application/xhtml+xml"/>
+    <item id="photo" href="images/photo%201.jpg" media-type="image/jpeg"/>
+    <item id="remote" href="https://www.zeit.de/font.otf" media-type="font/otf"/>
+  </manifest>
+</package>"""
+
+ARTICLE = b"<html><p>" + b"Lorem ipsum dolor sit amet. " * 2000 + b"</p></html>"
+
+
+def _write_epub(path, skip=(), mimetype_first=True) -> None:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        if mimetype_first:
+            zip_file.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        members = {
+            epub.CONTAINER_PATH: CONTAINER,
+            "OEBPS/content.opf": OPF,
+            "OEBPS/text/article.xhtml": ARTICLE,
+            "OEBPS/images/photo 1.jpg": b"jpeg" * 100,
+        }
+        for name, data in members.items():
+            if name not in skip:
+                zip_file.writestr(name, data)
+        if not mimetype_first:
+            zip_file.writestr("mimetype", "application/epub+zip")
+
+
+def test_validate_epub(tmp_path, test_epub_path) -> None:
+    assert validate.validate_epub(test_epub_path).ok
+
+    epub_path = tmp_path / "zeit.epub"
+    _write_epub(epub_path)
+    result = validate.validate_epub(epub_path)
+    assert result.ok, result.errors
+    assert result.members_checked == 5
+
+
+def test_validate_epub__structure(tmp_path) -> None:
+    epub_path = tmp_path / "zeit.epub"
+    _write_epub(epub_path, skip=("OEBPS/images/photo 1.jpg",), mimetype_first=False)
+    errors = validate.validate_epub(epub_path).errors
+    assert errors == [
+        "'mimetype' is not the first member of the archive.",
+        "manifest item 'photo' is missing: 'OEBPS/images/photo 1.jpg'.",
+    ]
+
+    _write_epub(epub_path, skip=(epub.CONTAINER_PATH,))
+    assert validate.validate_epub(epub_path).errors == [f"'{epub.CONTAINER_PATH}' is missing."]
+
+    _write_epub(epub_path, skip=("OEBPS/content.opf",))
+    assert "package document 'OEBPS/content.opf'" in validate.validate_epub(epub_path).errors[0]
+
+
+def _corrupt_member(epub_path, name: str, position: float, value: int = None) -> None:
+    """Flip the byte at `position` (relative to the size) of the data of the member `name`, or set it to `value`."""
+    data = bytearray(epub_path.read_bytes())
+    with zipfile.ZipFile(epub_path) as zip_file:
+        info = zip_file.getinfo(name)
+    index = info.header_offset + 30 + len(info.filename) + len(info.extra) + int(info.compress_size * position)
+    data[index] = data[index] ^ 0xFF if value is None else value
+    epub_path.write_bytes(bytes(data))
+
+
+def test_validate_epub__corrupt(tmp_path) -> None:
+    epub_path = tmp_path / "zeit.epub"
+    _write_epub(epub_path)
+
+    # flip a byte in the middle of the compressed article
+    _corrupt_member(epub_path, "OEBPS/text/article.xhtml", 0.5)
+    result = validate.validate_epub(epub_path)
+    assert not result.ok
+    assert len(result.errors) == 1 and "OEBPS/text/article.xhtml" in result.errors[0]
+
+    # a truncated download
+    data = epub_path.read_bytes()
+    epub_path.write_bytes(data[: len(data) // 2])
+    result = validate.validate_epub(epub_path)
+    assert not result.ok
+    assert "not a valid zip archive" in result.errors[0]
+
+
+def test_validate_epub__corrupt_deflate_stream(tmp_path) -> None:
+    epub_path = tmp_path / "zeit.epub"
+    _write_epub(epub_path)
+    # a deflate block of the invalid type 3, which makes zlib fail instead of the CRC check
+    _corrupt_member(epub_path, "OEBPS/text/article.xhtml", 0, value=0xFF)
+    # a mimetype with a wrong CRC
+    _corrupt_member(epub_path, "mimetype", 0)
+
+    errors = validate.validate_epub(epub_path).errors
+    assert len(errors) == 2
+    assert errors[0].startswith("member 'mimetype' is corrupt")
+    assert errors[1].startswith("member 'OEBPS/text/article.xhtml' is corrupt") and "invalid block type" in errors[1]
@@ -0,0 +1,75 @@
+import pytest
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+
+from zeit_on_tolino import wait
+
+
+class _FakeWebDriver:
+    def __init__(self, ready_after_calls: int) -> None:
+        self.calls = 0
+        self.ready_after_calls = ready_after_calls
+
+    def execute_script(self, script: str, *args) -> str:
+        self.calls += 1
+        return "complete" if self.calls >= self.ready_after_calls else "loading"
+
+
+@pytest.fixture(autouse=True)
+def _reset_records():
+    wait.reset_records()
+    yield
+    wait.reset_records()
+
+
+def test_wait_for__returns_as_soon_as_ready() -> None:
+    webdriver = _FakeWebDriver(ready_after_calls=2)
+    assert wait.wait_for(webdriver, "page loaded", 5, wait.document_ready, replaces_sleep=True)
+
+    record = wait.get_records()[0]
+    assert record.step == "page loaded"
+    assert record.satisfied
+    assert record.elapsed < 1
+    assert record.saved > 4
+
+
+def test_wait_for__saves_only_replaced_sleeps() -> None:
+    # waits which replace a WebDriverWait with the same upper bound do not save any time
+    webdriver = _FakeWebDriver(ready_after_calls=2)
+    assert wait.wait_for(webdriver, "page loaded", 5, wait.document_ready)
+    assert wait.wait_any(webdriver, "page state", 5, {"loaded": wait.document_ready})
+    assert [record.saved for record in wait.get_records()] == [0, 0]
+
+
+def test_wait_for__upper_bound_is_not_an_error() -> None:
+    webdriver = _FakeWebDriver(ready_after_calls=1000)
+    assert not wait.wait_for(webdriver, "page loaded", 0.3, wait.document_ready, replaces_sleep=True)
+
+    record = wait.get_records()[0]
+    assert not record.satisfied
+    assert record.elapsed >= 0.3
+    assert record.saved == 0
+
+
+def test_wait_for__raise_on_timeout() -> None:
+    webdriver = _FakeWebDriver(ready_after_calls=1000)
+    with pytest.raises(TimeoutException, match="'page loaded' was not ready within 0.3 seconds."):
+        wait.wait_for(webdriver, "page loaded", 0.3, wait.document_ready, raise_on_timeout=True)
+
+
+def test_wait_for__any_of() -> None:
+    webdriver = _FakeWebDriver(ready_after_calls=1000)
+    assert wait.wait_for(webdriver, "either", 5, wait.any_of(wait.document_ready, lambda _: True))
+
+
+def test_wait_any() -> None:
+    webdriver = _FakeWebDriver(ready_after_calls=3)
+
+    def missing(webdriver) -> None:
+        raise NoSuchElementException()
+
+    matched = wait.wait_any(webdriver, "page state", 5, {"logged in": missing, "logged out": wait.document_ready})
+    assert matched == "logged out"
+    assert wait.get_records()[0].elapsed < 1
+
+    assert wait.wait_any(webdriver, "page state", 0.3, {"logged in": missing}) is None
+    assert not wait.get_records()[1].satisfied
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import pytest
 
-from zeit_on_tolino import zeit
+from zeit_on_tolino import downloads, zeit
 from zeit_on_tolino.env_vars import EnvVars, MissingEnvironmentVariable
 
 ZEIT_E_PAPER_URL = "https://epaper.zeit.de/abo/diezeit"
@@ -43,3 +43,64 @@ def test_wrong_credentials(webdriver) -> None:
     # verify error is raised
     with pytest.raises(RuntimeError, match="Failed to login, check your login credentials."):
         zeit.download_e_paper(webdriver)
+
+
+class FakeWebDriver:
+    def __init__(self, download_dir: Path) -> None:
+        self.download_dir_path = str(download_dir)
+
+
+class FakeTracker:
+    def __init__(self, error: Exception = None) -> None:
+        self.error = error
+
+    def mark(self) -> None:
+        pass
+
+    def wait_for_download(self, start_timeout: float, timeout: float):
+        if self.error is not None:
+            raise self.error
+        return None
+
+
+class FakeLink:
+    def __init__(self, download_path: Path) -> None:
+        self.download_path = download_path
+
+    def click(self) -> None:
+        self.download_path.write_bytes(b"epub")
+
+
+def test_download_via_browser__names_guid_file(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    webdriver = FakeWebDriver(tmp_path)
+    # no download events, the file is found by watching the directory, named after the download's guid
+    webdriver.download_tracker = FakeTracker()
+    guid = "6f8e5f3c-1b1a-4c1e-9a77-3f9a1f4e2b10"
+    monkeypatch.setattr(zeit, "_get_download_link", lambda webdriver: FakeLink(tmp_path / guid))
+
+    e_paper_path = zeit._download_via_browser(webdriver)
+    assert e_paper_path == tmp_path / f"{guid}.epub"
+    assert e_paper_path.read_bytes() == b"epub"
+
+
+def test_download_via_browser__closes_watcher(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    webdriver = FakeWebDriver(tmp_path)
+    webdriver.download_tracker = FakeTracker(RuntimeError("Download of 'die_zeit.epub' was canceled."))
+    monkeypatch.setattr(zeit, "_get_download_link", lambda webdriver: None)
+    watchers = []
+
+    class Watcher(downloads.DirectoryWatcher):
+        def __init__(self, directory: Path) -> None:
+            super().__init__(directory)
+            self.closed = False
+            watchers.append(self)
+
+        def close(self) -> None:
+            super().close()
+            self.closed = True
+
+    monkeypatch.setattr(downloads, "DirectoryWatcher", Watcher)
+
+    with pytest.raises(RuntimeError, match="canceled"):
+        zeit._download_via_browser(webdriver)
+    assert watchers[0].closed
@@ -0,0 +1,5 @@
+import sys
+
+from zeit_on_tolino.cli import main
+
+sys.exit(main())
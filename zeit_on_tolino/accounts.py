@@ -0,0 +1,61 @@
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple
+
+from zeit_on_tolino import env_vars
+from zeit_on_tolino.env_vars import EnvVars, MissingEnvironmentVariable, OptionalEnvVars
+
+
+@dataclass(frozen=True)
+class TolinoAccount:
+    user: str
+    password: str = field(repr=False)
+    partner_shop: str
+
+
+def get_credentials() -> Tuple[str, str, str]:
+    """The username, password and partner shop of the single tolino account configured via env vars."""
+    try:
+        username = os.environ[EnvVars.TOLINO_USER]
+        password = os.environ[EnvVars.TOLINO_PASSWORD]
+        partner_shop = os.environ[EnvVars.TOLINO_PARTNER_SHOP].lower()
+        return username, password, partner_shop
+    except KeyError:
+        raise MissingEnvironmentVariable(
+            f"Ensure to export your tolino username, password and partner shop as environment variables "
+            f"'{EnvVars.TOLINO_USER}', '{EnvVars.TOLINO_PASSWORD}' and '{EnvVars.TOLINO_PARTNER_SHOP}'. "
+            f"For Github Actions, use repository secrets."
+        )
+
+
+def get_accounts() -> List[TolinoAccount]:
+    """The tolino accounts to sync to, from `ZEIT_ON_TOLINO_ACCOUNTS` or else the single account of the env vars.
+
+    `ZEIT_ON_TOLINO_ACCOUNTS` is either a JSON list of objects with the keys "user", "password" and "partner_shop" or
+    the path of a file containing such a list.
+    """
+    accounts = os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_ACCOUNTS)
+    if not accounts:
+        return [TolinoAccount(*get_credentials())]
+    if not accounts.lstrip().startswith("["):
+        accounts = Path(accounts).read_text()
+    try:
+        return [TolinoAccount(a["user"], a["password"], a["partner_shop"].lower()) for a in json.loads(accounts)]
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(
+            f"'{OptionalEnvVars.ZEIT_ON_TOLINO_ACCOUNTS}' must be a JSON list of objects with the keys 'user', "
+            f"'password' and 'partner_shop': {e}"
+        )
+
+
+def load_accounts() -> List[TolinoAccount]:
+    """The configured tolino accounts, after verifying that all required env vars are set and the shops supported."""
+    tolino_env_vars = (EnvVars.TOLINO_USER, EnvVars.TOLINO_PASSWORD, EnvVars.TOLINO_PARTNER_SHOP)
+    multi_account = bool(os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_ACCOUNTS))
+    env_vars.verify_env_vars_are_set(ignore=tolino_env_vars if multi_account else ())
+    accounts = get_accounts()
+    for account in accounts:
+        env_vars.verify_configured_partner_shop_is_supported(account.partner_shop)
+    return accounts
@@ -0,0 +1,187 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+from urllib.parse import urljoin, urlsplit
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from zeit_on_tolino import http_client, ledger, tracing, validate, zeit
+
+MAX_PARALLEL_DOWNLOADS = 3
+DEFAULT_LOOKBACK = timedelta(weeks=8)
+
+STATUS_SYNCED = "synced"
+STATUS_PENDING = "pending"
+STATUS_FAILED = "failed"
+
+# all links of the archive page in a single round trip, filtered in python
+_READ_LINKS_SCRIPT = """
+    return Array.from(document.querySelectorAll('a[href]')).map(a => ({
+        href: a.href,
+        text: [a.innerText, a.getAttribute('title'), a.getAttribute('aria-label')].filter(Boolean).join(' '),
+    }));
+"""
+_DATE_PATTERN = re.compile(r"\b\d{2}\.\d{2}\.\d{4}\b")
+
+# uploads a downloaded edition, e.g. to all configured tolino accounts
+Uploader = Callable[[Path, ledger.Edition], None]
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchiveEdition:
+    date: date
+    url: str
+
+
+@dataclass
+class BackfillResult:
+    date: date
+    status: str
+    path: Optional[Path] = None
+    error: Optional[str] = None
+
+
+class EpubNotAvailable(Exception):
+    pass
+
+
+class _LinkParser(HTMLParser):
+    """Collects the href and text of all links of a page."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: List[Dict[str, str]] = []
+        self._current: Optional[Dict[str, str]] = None
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag == "a":
+            self._current = {"href": dict(attrs).get("href") or "", "text": ""}
+
+    def handle_data(self, data: str) -> None:
+        if self._current is not None:
+            self._current["text"] += data
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "a" and self._current is not None:
+            self._current["text"] = " ".join(self._current["text"].split())
+            self.links.append(self._current)
+            self._current = None
+
+
+def parse_archive(links: Sequence[Dict[str, str]], origin: str = zeit.ZEIT_SESSION.origin) -> List[ArchiveEdition]:
+    """The editions linked on the archive page, newest first, recognized by the date in their link text."""
+    editions: Dict[date, ArchiveEdition] = {}
+    for link in links:
+        match = _DATE_PATTERN.search(link.get("text") or "")
+        if not match or not link.get("href", "").startswith(origin):
+            continue
+        try:
+            edition_date = datetime.strptime(match.group(), zeit.ZEIT_DATE_FORMAT).date()
+        except ValueError:
+            continue
+        editions.setdefault(edition_date, ArchiveEdition(date=edition_date, url=link["href"]))
+    return sorted(editions.values(), key=lambda e: e.date, reverse=True)
+
+
+def parse_links(html: str) -> List[Dict[str, str]]:
+    parser = _LinkParser()
+    parser.feed(html)
+    return parser.links
+
+
+def find_epub_url(html: str, page_url: str) -> str:
+    for link in parse_links(html):
+        if link["text"].upper() == zeit.BUTTON_TEXT_DOWNLOAD_EPUB and link["href"]:
+            return urljoin(page_url, link["href"])
+    if zeit.BUTTON_TEXT_EPUB_DOWNLOAD_IS_PENDING in html.upper():
+        raise EpubNotAvailable("the EPUB of this edition is not available yet.")
+    raise EpubNotAvailable("no EPUB download link found on the edition page.")
+
+
+@tracing.traced("backfill.list_editions")
+def list_editions(webdriver: WebDriver, archive_url: str = zeit.ZEIT_ARCHIVE_URL) -> List[ArchiveEdition]:
+    webdriver.get(archive_url)
+    archive = urlsplit(archive_url)
+    editions = parse_archive(webdriver.execute_script(_READ_LINKS_SCRIPT), f"{archive.scheme}://{archive.netloc}")
+    log.info(f"found {len(editions)} editions in the ZEIT e-paper archive.")
+    return editions
+
+
+def _download_edition(edition: ArchiveEdition, download_dir: Path, headers: Dict[str, str]) -> Path:
+    with tracing.span("backfill.download", edition=edition.date.isoformat()):
+        epub_url = find_epub_url(http_client.fetch_text(edition.url, headers), edition.url)
+        # a directory per edition, so equally named files of different editions do not collide
+        result = http_client.stream_download(epub_url, download_dir / edition.date.isoformat(), headers=headers)
+        validation = validate.validate_epub(result.path)
+        if not validation.ok:
+            result.path.unlink()
+            raise http_client.DownloadError(f"downloaded EPUB is broken: {'; '.join(validation.errors)}")
+        return result.path
+
+
+def backfill(
+    webdriver: WebDriver,
+    accounts: Sequence[str],
+    upload: Uploader,
+    since: Optional[date] = None,
+    max_downloads: int = MAX_PARALLEL_DOWNLOADS,
+    ledger_path: Optional[Path] = None,
+    archive_url: str = zeit.ZEIT_ARCHIVE_URL,
+) -> List[BackfillResult]:
+    """Sync all editions since `since` still in the ZEIT archive which are not yet synced to all `accounts`.
+
+    The editions are downloaded concurrently via plain HTTP with the cookies of the logged-in browser session and
+    handed to `upload` one by one as soon as their download finished.
+    """
+    since = since or date.today() - DEFAULT_LOOKBACK
+    zeit._login(webdriver)
+    missing = [
+        edition
+        for edition in list_editions(webdriver, archive_url)
+        if edition.date >= since and not ledger.is_edition_synced(edition.date, accounts, ledger_path)
+    ]
+    if not missing:
+        log.info(f"all editions since {since} are already synced.")
+        return []
+    log.info(f"backfilling {len(missing)} editions: {', '.join(e.date.isoformat() for e in missing)}")
+
+    # one authenticated session shared by all downloads, the browser itself is only used by the uploads
+    headers = http_client.get_browser_headers(webdriver, missing[0].url)
+    download_dir = Path(webdriver.download_dir_path) / "backfill"
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, max_downloads), thread_name_prefix="backfill") as pool:
+        futures = {tracing.submit(pool, _download_edition, e, download_dir, headers): e for e in missing}
+        for future in as_completed(futures):
+            edition = futures[future]
+            try:
+                path = future.result()
+            except EpubNotAvailable as e:
+                log.info(f"skipping edition of {edition.date}: {e}")
+                results.append(BackfillResult(edition.date, STATUS_PENDING, error=str(e)))
+                continue
+            except http_client.DownloadError as e:
+                log.error(f"could not download edition of {edition.date}: {e}")
+                results.append(BackfillResult(edition.date, STATUS_FAILED, error=str(e)))
+                continue
+
+            try:
+                upload(path, ledger.edition_from_epub(path))
+            except Exception as e:
+                log.error(f"could not upload edition of {edition.date}: {e}", exc_info=True)
+                results.append(BackfillResult(edition.date, STATUS_FAILED, path=path, error=str(e)))
+                continue
+            results.append(BackfillResult(edition.date, STATUS_SYNCED, path=path))
+    return sorted(results, key=lambda r: r.date)
+
+
+def log_results(results: Sequence[BackfillResult]) -> None:
+    for result in results:
+        error = f": {result.error}" if result.error else ""
+        log.info(f"{result.date.isoformat()} {result.status:8}{error}")
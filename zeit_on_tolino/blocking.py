@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from zeit_on_tolino import downloads
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+LEVEL_OFF = "off"
+LEVEL_TRACKERS = "trackers"
+LEVEL_DEFAULT = "default"
+LEVELS = (LEVEL_OFF, LEVEL_TRACKERS, LEVEL_DEFAULT)
+
+BLOCK_ALL = "*"
+FONTS = ("*.woff", "*.woff2", "*.ttf", "*.otf")
+IMAGES = ("*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif")
+MEDIA = ("*.mp4", "*.webm")
+
+# ads, analytics and consent tracking, neither the ZEIT nor the tolino flow depends on them
+TRACKERS: Dict[str, Tuple[str, ...]] = {
+    domain: (BLOCK_ALL,)
+    for domain in (
+        "doubleclick.net",
+        "googlesyndication.com",
+        "googletagmanager.com",
+        "googletagservices.com",
+        "google-analytics.com",
+        "adnxs.com",
+        "adition.com",
+        "amazon-adsystem.com",
+        "criteo.com",
+        "criteo.net",
+        "outbrain.com",
+        "taboola.com",
+        "chartbeat.com",
+        "chartbeat.net",
+        "scorecardresearch.com",
+        "ioam.de",
+        "iocnt.net",
+        "hotjar.com",
+        "facebook.net",
+        "wt-safetag.com",
+        "webtrekk.net",
+    )
+}
+
+# the automation only looks at texts, links and form fields of these sites, their fonts and images are never needed
+SITES: Dict[str, Tuple[str, ...]] = {
+    "zeit.de": FONTS + IMAGES + MEDIA,
+    "mytolino.com": FONTS + MEDIA,
+}
+
+log = logging.getLogger(__name__)
+
+
+def get_level() -> str:
+    level = os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_BLOCKING, LEVEL_DEFAULT).lower()
+    if level not in LEVELS:
+        log.warning(f"unknown blocking level '{level}', supported levels are {LEVELS}. Using '{LEVEL_DEFAULT}'.")
+        return LEVEL_DEFAULT
+    return level
+
+
+def get_block_list(level: str, block_list_path: Optional[Path] = None) -> Dict[str, Tuple[str, ...]]:
+    """The resource patterns to block per domain, extended by the JSON file `{"<domain>": ["*.png", ...]}`."""
+    block_list: Dict[str, Tuple[str, ...]] = {}
+    if level in (LEVEL_TRACKERS, LEVEL_DEFAULT):
+        block_list.update(TRACKERS)
+    if level == LEVEL_DEFAULT:
+        block_list.update(SITES)
+    if block_list_path is not None:
+        for domain, patterns in json.loads(Path(block_list_path).read_text()).items():
+            block_list[domain] = tuple(dict.fromkeys(block_list.get(domain, ()) + tuple(patterns)))
+    return block_list
+
+
+def url_patterns(block_list: Dict[str, Tuple[str, ...]]) -> List[str]:
+    """DevTools URL patterns matching the resources of the domains, including their subdomains."""
+    patterns = []
+    for domain, resources in block_list.items():
+        for resource in resources:
+            if resource == BLOCK_ALL:
+                patterns.append(f"*{domain}/*")
+            else:
+                patterns += [f"*{domain}/{resource}", f"*{domain}/{resource}?*"]
+    return patterns
+
+
+def _domain_of(url: str, block_list: Dict[str, Tuple[str, ...]]) -> str:
+    host = urlsplit(url).hostname or ""
+    return next((d for d in block_list if host == d or host.endswith(f".{d}")), host)
+
+
+class BlockingStats:
+    """Counts blocked and loaded requests using the network events of the performance log.
+
+    The size of blocked resources is unknown, as they are never requested. Instead, the loaded bytes are reported, which
+    can be compared to a run with blocking turned off.
+    """
+
+    def __init__(self, webdriver: WebDriver, block_list: Dict[str, Tuple[str, ...]]) -> None:
+        self.webdriver = webdriver
+        self.block_list = block_list
+        self.blocked: Counter = Counter()
+        self.loaded_requests = 0
+        self.loaded_bytes = 0
+        self._urls: Dict[str, str] = {}
+        downloads.add_performance_log_listener(webdriver, self._handle_event)
+
+    def _handle_event(self, method: str, params: Dict[str, Any]) -> None:
+        if method == "Network.requestWillBeSent":
+            self._urls[params.get("requestId", "")] = params.get("request", {}).get("url", "")
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            self.blocked[_domain_of(self._urls.pop(params.get("requestId", ""), ""), self.block_list)] += 1
+        elif method == "Network.loadingFinished":
+            self._urls.pop(params.get("requestId", ""), None)
+            self.loaded_requests += 1
+            self.loaded_bytes += int(params.get("encodedDataLength", 0))
+
+    def log_summary(self) -> None:
+        try:
+            downloads.poll_performance_log(self.webdriver)
+        except Exception as e:
+            log.info(f"could not read the network events of the browser: {e}")
+            return
+        by_domain = ", ".join(f"{domain}: {count}" for domain, count in self.blocked.most_common())
+        log.info(
+            f"blocked {sum(self.blocked.values())} requests ({by_domain or 'none'}), "
+            f"loaded {self.loaded_requests} requests with {self.loaded_bytes} bytes."
+        )
+
+
+def enable_blocking(webdriver: WebDriver) -> Optional[BlockingStats]:
+    """Block the resources of the configured block list in all pages of `webdriver`."""
+    level = get_level()
+    block_list_path = os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_BLOCK_LIST)
+    block_list = get_block_list(level, Path(block_list_path) if block_list_path else None)
+    if not block_list:
+        return None
+    try:
+        webdriver.execute_cdp_cmd("Network.enable", {})
+        webdriver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": url_patterns(block_list)})
+    except Exception as e:
+        log.info(f"could not block requests via DevTools: {e}")
+        return None
+    stats = BlockingStats(webdriver, block_list)
+    setattr(webdriver, "blocking_stats", stats)
+    log.info(f"blocking requests of {len(block_list)} domains ('{level}' level).")
+    return stats
+
+
+def log_summary(webdriver: WebDriver) -> None:
+    stats = getattr(webdriver, "blocking_stats", None)
+    if stats is not None:
+        stats.log_summary()
@@ -0,0 +1,177 @@
+import argparse
+import json
+import logging
+import sys
+import time
+from dataclasses import asdict
+from datetime import date
+from pathlib import Path
+from typing import List, Optional
+
+DEFAULT_POLL_TIMEOUT = 180  # minutes, the EPUB is usually available within a few hours after the release
+
+log = logging.getLogger(__name__)
+
+# Commands import the modules they need themselves. Selenium, undetected_chromedriver and lxml take much longer to
+# import than reading the env vars or the ledger, so commands which do not start a browser must not import them.
+
+
+def _run_browser_sync(tolino_accounts: list, backfill_editions: bool = False, since: Optional[date] = None) -> None:
+    from zeit_on_tolino import prelogin, runner, tracing
+
+    log.info("logging into ZEIT premium...")
+    with tracing.span("driver setup"):
+        webdriver = runner.setup_webdriver()
+    # log into tolino in a second browser during the download, instead of after it
+    create_tolino_webdriver = runner.setup_tolino_webdriver if prelogin.is_enabled() else None
+    try:
+        runner.run_sync(webdriver, tolino_accounts, backfill_editions, since, create_tolino_webdriver)
+    finally:
+        runner.report_run(webdriver)
+        webdriver.quit()
+
+
+def sync(args: argparse.Namespace) -> int:
+    from zeit_on_tolino import accounts, ledger
+
+    try:
+        tolino_accounts = accounts.load_accounts()
+        users = [account.user for account in tolino_accounts]
+        if args.poll:
+            from zeit_on_tolino import scheduler
+
+            deadline = time.time() + args.poll_timeout * 60
+            if not scheduler.sync_when_released(users, lambda: _run_browser_sync(tolino_accounts), deadline):
+                log.error(f"the EPUB of the current ZEIT release was not available within {args.poll_timeout} minutes.")
+                return 1
+            log.info("done.")
+            return 0
+
+        if args.serve:
+            from zeit_on_tolino import daemon, runner
+
+            browser_daemon = daemon.BrowserDaemon(
+                runner.setup_webdriver, lambda webdriver, job: runner.run_daemon_job(webdriver, tolino_accounts, job)
+            )
+            browser_daemon.serve_forever()
+            return 0
+
+        if not args.backfill:
+            if ledger.is_up_to_date(users):
+                return 0
+            # ask the ZEIT via plain HTTP whether there is anything to download, before starting a browser
+            from zeit_on_tolino import probe
+
+            if not probe.is_sync_needed(users):
+                return 0
+
+        _run_browser_sync(tolino_accounts, args.backfill, args.since)
+        log.info("done.")
+    except Exception as e:
+        log.error(f"An error occurred: {e}", exc_info=True)
+        return 1
+    return 0
+
+
+def check_env(args: argparse.Namespace) -> int:
+    from zeit_on_tolino import accounts
+    from zeit_on_tolino.env_vars import MissingEnvironmentVariable
+
+    try:
+        tolino_accounts = accounts.load_accounts()
+    except (OSError, ValueError, MissingEnvironmentVariable) as e:
+        print(e, file=sys.stderr)
+        return 1
+    account_list = ", ".join(f"{account.user} ({account.partner_shop})" for account in tolino_accounts)
+    print(f"all required environment variables are set, syncing to {len(tolino_accounts)} account(s): {account_list}")
+    return 0
+
+
+def status(args: argparse.Namespace) -> int:
+    from zeit_on_tolino import daemon, ledger
+
+    try:
+        daemon_status = daemon.send_command(daemon.COMMAND_STATUS, timeout=args.timeout)
+    except (daemon.DaemonNotRunning, OSError):
+        daemon_status = None
+    uploads = ledger.list_uploads(args.limit)
+    print(json.dumps({"daemon": daemon_status, "uploads": uploads}, indent=2, default=str))
+    return 0
+
+
+def inspect_epub(args: argparse.Namespace) -> int:
+    from zeit_on_tolino import epub, ledger, validate
+
+    try:
+        info = epub.get_epub_info(args.path)
+        edition = ledger.edition_from_epub(args.path)
+    except (OSError, epub.EpubError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    result = validate.validate_epub(args.path)
+    details = {
+        **asdict(info),
+        "edition_date": edition.date,
+        "sha256": edition.sha256,
+        "size": args.path.stat().st_size,
+        "valid": result.ok,
+        "errors": result.errors,
+    }
+    print(json.dumps(details, indent=2, default=str))
+    return 0 if result.ok else 1
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="zeit-on-tolino", description="Sync the e-paper of DIE ZEIT to your tolino cloud."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = commands.add_parser("sync", help="download the most recent e-paper and upload it to tolino")
+    modes = sync_parser.add_mutually_exclusive_group()
+    modes.add_argument(
+        "--backfill", action="store_true", help="also sync missed editions which are still in the ZEIT e-paper archive"
+    )
+    modes.add_argument(
+        "--serve",
+        action="store_true",
+        help="keep a browser running and sync on request, see `python -m zeit_on_tolino.daemon --help`",
+    )
+    modes.add_argument(
+        "--poll",
+        action="store_true",
+        help="wait for the EPUB of the current release, checking with growing pauses, and sync it once it is out",
+    )
+    sync_parser.add_argument(
+        "--since", type=date.fromisoformat, help="oldest edition to backfill (YYYY-MM-DD), defaults to 8 weeks ago"
+    )
+    sync_parser.add_argument(
+        "--poll-timeout",
+        type=int,
+        default=DEFAULT_POLL_TIMEOUT,
+        help=f"minutes to wait for the EPUB with --poll, defaults to {DEFAULT_POLL_TIMEOUT}",
+    )
+    sync_parser.set_defaults(func=sync)
+
+    check_env_parser = commands.add_parser("check-env", help="verify the env vars and the configured tolino accounts")
+    check_env_parser.set_defaults(func=check_env)
+
+    status_parser = commands.add_parser("status", help="show the most recent uploads and the state of the daemon")
+    status_parser.add_argument("--limit", type=int, default=10, help="number of uploads to show")
+    status_parser.add_argument("--timeout", type=float, default=5, help="seconds to wait for the daemon to answer")
+    status_parser.set_defaults(func=status)
+
+    inspect_parser = commands.add_parser("inspect-epub", help="show the metadata of an EPUB and validate it")
+    inspect_parser.add_argument("path", type=Path)
+    inspect_parser.set_defaults(func=inspect_epub)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from zeit_on_tolino.env_vars import get_state_dir
+
+if TYPE_CHECKING:  # clients of the daemon do not need selenium
+    from selenium.webdriver.firefox.webdriver import WebDriver
+
+SOCKET_FILE_NAME = "daemon.sock"
+HEALTH_CHECK_INTERVAL = 60  # seconds
+CLIENT_TIMEOUT = 60 * 60  # seconds, a sync job including a backfill may take a while
+
+COMMAND_SYNC = "sync"
+COMMAND_STATUS = "status"
+COMMAND_HEALTH = "health"
+COMMAND_SHUTDOWN = "shutdown"
+COMMANDS = (COMMAND_SYNC, COMMAND_STATUS, COMMAND_HEALTH, COMMAND_SHUTDOWN)
+
+# runs a sync job, given as dict of its arguments, on the warm browser and returns a JSON serializable result
+JobRunner = Callable[["WebDriver", Dict[str, Any]], Dict[str, Any]]
+
+log = logging.getLogger(__name__)
+
+
+class DaemonNotRunning(Exception):
+    pass
+
+
+def get_socket_path() -> Path:
+    return get_state_dir() / SOCKET_FILE_NAME
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    browser_daemon: "BrowserDaemon"
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON request per connection and answers with one JSON response, each terminated by a newline."""
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            response = self.server.browser_daemon.handle(request)
+        except (ValueError, AttributeError) as e:
+            response = {"ok": False, "error": f"invalid request: {e}"}
+        self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+
+
+class BrowserDaemon:
+    """Keeps a browser running between sync jobs, which it receives via a unix socket.
+
+    Jobs run one at a time. The browser is checked periodically and restarted if it crashed.
+    """
+
+    def __init__(
+        self,
+        create_webdriver: Callable[[], "WebDriver"],
+        run_job: JobRunner,
+        socket_path: Optional[Path] = None,
+        health_check_interval: float = HEALTH_CHECK_INTERVAL,
+    ) -> None:
+        self.create_webdriver = create_webdriver
+        self.run_job = run_job
+        self.socket_path = Path(socket_path or get_socket_path())
+        self.health_check_interval = health_check_interval
+        self.webdriver: Optional["WebDriver"] = None
+        self.started_at = time.time()
+        self.browser_started_at: Optional[float] = None
+        self.restarts = 0
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.current_job: Optional[Dict[str, Any]] = None
+        self.last_job: Optional[Dict[str, Any]] = None
+        # the browser is used by one job or health check at a time
+        self._browser_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server: Optional[_Server] = None
+
+    def _browser_alive(self) -> bool:
+        if self.webdriver is None:
+            return False
+        try:
+            return self.webdriver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _ensure_browser(self) -> None:
+        if self._browser_alive():
+            return
+        if self.webdriver is not None:
+            self.restarts += 1
+            log.warning(f"browser is not responding, restarting it (restart #{self.restarts})...")
+            try:
+                self.webdriver.quit()
+            except Exception:
+                pass
+        self.webdriver = None
+        self.webdriver = self.create_webdriver()
+        self.browser_started_at = time.time()
+        log.info("browser is ready.")
+
+    def sync(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        with self._browser_lock:
+            self.current_job = {**job, "started_at": time.time()}
+            start = time.monotonic()
+            try:
+                self._ensure_browser()
+                response = {"ok": True, "result": self.run_job(self.webdriver, job)}
+                self.jobs_completed += 1
+            except Exception as e:
+                log.error(f"sync job failed: {e}", exc_info=True)
+                response = {"ok": False, "error": str(e)}
+                self.jobs_failed += 1
+            self.last_job = {**self.current_job, **response, "duration": time.monotonic() - start}
+            self.current_job = None
+            return response
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime": now - self.started_at,
+            "busy": self.current_job is not None,
+            "current_job": self.current_job,
+            "browser_uptime": now - self.browser_started_at if self.browser_started_at else None,
+            "browser_restarts": self.restarts,
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "last_job": self.last_job,
+        }
+
+    def health(self) -> Dict[str, Any]:
+        # a running job proves the browser is in use, do not wait for it to finish
+        if not self._browser_lock.acquire(blocking=False):
+            return {"ok": True, "busy": True}
+        try:
+            alive = self._browser_alive()
+        finally:
+            self._browser_lock.release()
+        return {"ok": alive, "busy": False, "browser_alive": alive}
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        command = request.get("command")
+        if command == COMMAND_SYNC:
+            return self.sync(request.get("args", {}))
+        if command == COMMAND_STATUS:
+            return self.status()
+        if command == COMMAND_HEALTH:
+            return self.health()
+        if command == COMMAND_SHUTDOWN:
+            self.shutdown()
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown command '{command}', supported commands are {COMMANDS}"}
+
+    def _watch_browser(self) -> None:
+        while not self._stopped.wait(self.health_check_interval):
+            with self._browser_lock:
+                try:
+                    self._ensure_browser()
+                except Exception as e:
+                    log.error(f"could not restart browser, retrying in {self.health_check_interval}s: {e}")
+
+    def _bind(self) -> _Server:
+        if self.socket_path.exists():
+            try:
+                send_command(COMMAND_HEALTH, socket_path=self.socket_path, timeout=5)
+            except DaemonNotRunning:
+                self.socket_path.unlink()  # left over from a daemon which did not shut down cleanly
+            else:
+                raise RuntimeError(f"a daemon is already listening on {self.socket_path}.")
+        server = _Server(str(self.socket_path), _RequestHandler)
+        os.chmod(self.socket_path, 0o600)
+        server.browser_daemon = self
+        return server
+
+    def serve_forever(self) -> None:
+        self._server = self._bind()
+        try:
+            with self._browser_lock:
+                self._ensure_browser()
+            threading.Thread(target=self._watch_browser, name="browser-watch", daemon=True).start()
+            log.info(f"daemon is listening on {self.socket_path}")
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+            with self._browser_lock:
+                if self.webdriver is not None:
+                    self.webdriver.quit()
+                    self.webdriver = None
+            log.info("daemon stopped.")
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        if self._server is not None:
+            # `shutdown` waits for `serve_forever` to return, so it must not block the request handler
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+
+def send_command(
+    command: str, socket_path: Optional[Path] = None, timeout: float = CLIENT_TIMEOUT, **args: Any
+) -> Dict[str, Any]:
+    request = {"command": command, "args": args}
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(str(socket_path or get_socket_path()))
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        client.close()
+        raise DaemonNotRunning(f"no daemon is listening on {socket_path or get_socket_path()}.") from e
+    with client, client.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Control the zeit-on-tolino daemon, started via `sync.py --serve`.")
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--backfill", action="store_true", help="sync: also sync missed editions")
+    parser.add_argument("--since", help="sync: oldest edition to backfill (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    job = {"backfill": args.backfill, "since": args.since} if args.command == COMMAND_SYNC else {}
+    try:
+        response = send_command(args.command, **job)
+    except DaemonNotRunning as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(json.dumps(response, indent=2, default=str))
+    return 0 if response.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
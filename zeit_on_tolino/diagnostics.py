@@ -0,0 +1,147 @@
+import gzip
+import json
+import logging
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from zeit_on_tolino import tracing
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+LEVEL_OFF = "off"
+LEVEL_SUMMARY = "summary"
+LEVEL_FULL = "full"
+LEVELS = (LEVEL_OFF, LEVEL_SUMMARY, LEVEL_FULL)
+
+DIAGNOSTICS_DIR = Path(os.getenv("GITHUB_WORKSPACE", ".")) / "diagnostics"
+
+_SUMMARY_SCRIPT = """
+    const done = arguments[arguments.length - 1];
+    const summary = {url: location.href, local_storage: localStorage.length, session_storage: sessionStorage.length};
+    (indexedDB.databases ? indexedDB.databases() : Promise.resolve([]))
+        .then(dbs => done({...summary, databases: dbs.map(db => db.name)}))
+        .catch(() => done({...summary, databases: []}));
+"""
+
+# snapshot of all client side storage of the current page in a single round trip, without navigating away
+_SNAPSHOT_SCRIPT = """
+    const done = arguments[arguments.length - 1];
+    const readStorage = (storage) => {
+        const items = {};
+        for (let i = 0; i < storage.length; i++) {
+            const key = storage.key(i);
+            items[key] = storage.getItem(key);
+        }
+        return items;
+    };
+    const readDatabase = (name) => new Promise(resolve => {
+        const request = indexedDB.open(name);
+        request.onerror = () => resolve({error: `could not open IndexedDB '${name}'`});
+        request.onsuccess = (event) => {
+            const db = event.target.result;
+            const stores = Array.from(db.objectStoreNames);
+            const result = {};
+            if (stores.length === 0) {
+                db.close();
+                resolve(result);
+                return;
+            }
+            const transaction = db.transaction(stores, 'readonly');
+            stores.forEach(storeName => {
+                const items = [];
+                result[storeName] = items;
+                transaction.objectStore(storeName).openCursor().onsuccess = (cursorEvent) => {
+                    const cursor = cursorEvent.target.result;
+                    if (cursor) {
+                        items.push({key: cursor.key, value: cursor.value});
+                        cursor.continue();
+                    }
+                };
+            });
+            transaction.oncomplete = () => { db.close(); resolve(result); };
+        };
+    });
+    (async () => {
+        const databases = indexedDB.databases ? await indexedDB.databases() : [];
+        const indexedDb = {};
+        for (const db of databases) {
+            indexedDb[db.name] = await readDatabase(db.name);
+        }
+        done({
+            url: location.href,
+            local_storage: readStorage(localStorage),
+            session_storage: readStorage(sessionStorage),
+            databases: databases.map(db => ({name: db.name, version: db.version})),
+            indexed_db: indexedDb,
+        });
+    })().catch(e => done({url: location.href, error: String(e)}));
+"""
+
+log = logging.getLogger(__name__)
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diagnostics")
+_pending: List[Future] = []
+
+
+def get_level() -> str:
+    level = os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_DIAGNOSTICS, LEVEL_OFF).lower()
+    if level not in LEVELS:
+        log.warning(f"unknown diagnostics level '{level}', supported levels are {LEVELS}. Diagnostics are off.")
+        return LEVEL_OFF
+    return level
+
+
+def _get_all_cookies(webdriver: WebDriver) -> List[Dict[str, Any]]:
+    """Cookies of all domains, including the partner shop ones, without navigating to them."""
+    try:
+        return webdriver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+    except Exception:
+        return webdriver.get_cookies()
+
+
+def _write_snapshot(path: Path, snapshot: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2, default=str)
+    log.info(f"wrote diagnostics snapshot to {path}")
+
+
+def capture(webdriver: WebDriver, location: str) -> None:
+    """Capture the cookies and storage of the current page, depending on the configured diagnostics level."""
+    level = get_level()
+    if level == LEVEL_OFF:
+        return
+
+    try:
+        cookies = _get_all_cookies(webdriver)
+        if level == LEVEL_SUMMARY:
+            summary = webdriver.execute_async_script(_SUMMARY_SCRIPT)
+            log.info(
+                f"diagnostics at '{location}': url={summary['url']}, {len(cookies)} cookies "
+                f"({', '.join(sorted({c['name'] for c in cookies}))}), {summary['local_storage']} local storage and "
+                f"{summary['session_storage']} session storage items, IndexedDBs: {summary['databases']}"
+            )
+            return
+        snapshot = webdriver.execute_async_script(_SNAPSHOT_SCRIPT)
+    except Exception as e:
+        log.warning(f"could not capture diagnostics at '{location}': {e}")
+        return
+
+    snapshot.update(location=location, captured_at=datetime.now().astimezone().isoformat(), cookies=cookies)
+    file_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{re.sub(r'[^a-z0-9]+', '_', location.lower())}.json.gz"
+    _pending.append(tracing.submit(_writer, _write_snapshot, DIAGNOSTICS_DIR / file_name, snapshot))
+    log.info(f"captured diagnostics snapshot at '{location}' with {len(cookies)} cookies.")
+
+
+def flush() -> None:
+    """Wait until all captured snapshots are written."""
+    while _pending:
+        try:
+            _pending.pop().result()
+        except Exception as e:
+            log.warning(f"could not write diagnostics snapshot: {e}")
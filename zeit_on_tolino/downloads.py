@@ -0,0 +1,219 @@
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+PERFORMANCE_LOGGING_PREFS = {"performance": "ALL"}
+TEMPORARY_SUFFIXES = (".crdownload", ".part", ".tmp")
+POLL_INTERVAL = 0.1  # seconds
+
+# see `man 7 inotify`
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+# called with the method and params of each DevTools event of the performance log
+PerformanceLogListener = Callable[[str, Dict[str, Any]], None]
+
+log = logging.getLogger(__name__)
+
+
+def add_performance_log_listener(webdriver: WebDriver, listener: PerformanceLogListener) -> None:
+    listeners = getattr(webdriver, "performance_log_listeners", None)
+    if listeners is None:
+        listeners = []
+        setattr(webdriver, "performance_log_listeners", listeners)
+    listeners.append(listener)
+
+
+def poll_performance_log(webdriver: WebDriver) -> None:
+    """Hand the new events of the performance log to all listeners, reading the log drains it for everybody."""
+    listeners = getattr(webdriver, "performance_log_listeners", [])
+    for entry in webdriver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        for listener in listeners:
+            listener(message.get("method", ""), message.get("params", {}))
+
+
+@dataclass
+class Download:
+    guid: str
+    url: str = ""
+    suggested_file_name: str = ""
+    state: str = "inProgress"
+    received_bytes: int = 0
+    total_bytes: int = 0
+
+
+def _is_complete_file(name: str) -> bool:
+    return not name.startswith(".") and not name.endswith(TEMPORARY_SUFFIXES)
+
+
+class DownloadTracker:
+    """Follows the downloads of a Chrome driver via the DevTools download events in its performance log.
+
+    The driver needs to be created with the `goog:loggingPrefs` capability set to `PERFORMANCE_LOGGING_PREFS`.
+    """
+
+    def __init__(self, webdriver: WebDriver, download_dir: Path) -> None:
+        self.webdriver = webdriver
+        self.download_dir = Path(download_dir)
+        self.downloads: Dict[str, Download] = {}
+        self._known_before_mark: Set[str] = set()
+        add_performance_log_listener(webdriver, self._handle_event)
+
+    def _handle_event(self, method: str, params: Dict[str, Any]) -> None:
+        # depending on the chrome version the events are emitted by the `Page` and/or the `Browser` domain
+        if method.endswith(".downloadWillBegin"):
+            download = self.downloads.setdefault(params["guid"], Download(guid=params["guid"]))
+            download.url = params.get("url", "")
+            download.suggested_file_name = params.get("suggestedFilename", "")
+        elif method.endswith(".downloadProgress"):
+            download = self.downloads.setdefault(params["guid"], Download(guid=params["guid"]))
+            download.state = params.get("state", download.state)
+            download.received_bytes = int(params.get("receivedBytes", 0))
+            download.total_bytes = int(params.get("totalBytes", 0))
+
+    def _poll_events(self) -> None:
+        poll_performance_log(self.webdriver)
+
+    def mark(self) -> None:
+        """Only consider downloads started after this call."""
+        self._poll_events()
+        self._known_before_mark = set(self.downloads)
+
+    def _new_downloads(self) -> List[Download]:
+        return [d for guid, d in self.downloads.items() if guid not in self._known_before_mark]
+
+    def _final_path(self, download: Download) -> Path:
+        # with the "allowAndName" behavior chrome names the file after the download's guid
+        guid_path = self.download_dir / download.guid
+        if not guid_path.is_file():
+            return self.download_dir / download.suggested_file_name
+        target = self.download_dir / (download.suggested_file_name or download.guid)
+        if target.exists() and target != guid_path:
+            target = target.with_name(f"{target.stem}_{download.guid[:8]}{target.suffix}")
+        return guid_path.replace(target)
+
+    def wait_for_download(self, start_timeout: float, timeout: float) -> Optional[Path]:
+        """Return the file of the first download started after `mark()` once it completed.
+
+        Returns None if no download started within `start_timeout` seconds, e.g. because the events are not available.
+        """
+        start = time.monotonic()
+        while True:
+            self._poll_events()
+            new_downloads = self._new_downloads()
+            elapsed = time.monotonic() - start
+            if not new_downloads and elapsed > start_timeout:
+                return None
+            for download in new_downloads:
+                if download.state == "completed":
+                    path = self._final_path(download)
+                    log.info(f"download of '{path.name}' completed with {download.received_bytes} bytes.")
+                    return path
+                if download.state == "canceled":
+                    raise RuntimeError(f"Download of '{download.suggested_file_name or download.url}' was canceled.")
+            if elapsed > timeout:
+                raise TimeoutError(f"Did not manage to download file within {timeout} seconds.")
+            time.sleep(POLL_INTERVAL)
+
+
+def enable_download_tracking(webdriver: WebDriver, download_dir: Path) -> Optional[DownloadTracker]:
+    try:
+        webdriver.execute_cdp_cmd(
+            "Browser.setDownloadBehavior",
+            {"behavior": "allowAndName", "downloadPath": str(download_dir), "eventsEnabled": True},
+        )
+    except Exception as e:
+        log.info(f"could not enable tracking of downloads via DevTools: {e}")
+        return None
+    tracker = DownloadTracker(webdriver, download_dir)
+    setattr(webdriver, "download_tracker", tracker)
+    return tracker
+
+
+class DirectoryWatcher:
+    """Waits for a new, complete file in a directory. Uses inotify on Linux and polls the directory elsewhere.
+
+    Create the watcher before triggering the download, so no file can be missed.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self._files_before = set(os.listdir(self.directory))
+        self._last_sizes: Dict[str, int] = {}
+        self._fd = None
+        if sys.platform.startswith("linux"):
+            self._fd = self._init_inotify()
+
+    def _init_inotify(self) -> Optional[int]:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0 or libc.inotify_add_watch(fd, str(self.directory).encode(), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+                raise OSError(ctypes.get_errno(), "inotify setup failed")
+            return fd
+        except (OSError, AttributeError) as e:
+            log.info(f"inotify is not available, polling the download directory instead: {e}")
+            return None
+
+    def _new_complete_files(self) -> List[str]:
+        """New files which are neither temporary nor still growing since the previous check."""
+        candidates = [f for f in os.listdir(self.directory) if f not in self._files_before and _is_complete_file(f)]
+        sizes = {f: (self.directory / f).stat().st_size for f in candidates}
+        stable = [f for f, size in sizes.items() if self._last_sizes.get(f) == size]
+        self._last_sizes = sizes
+        return stable
+
+    def _read_inotify_names(self, timeout: float) -> List[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        data = os.read(self._fd, 64 * 1024)
+        names, offset = [], 0
+        while offset < len(data):
+            _, _, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name_end = offset + name_length
+            names.append(data[offset:name_end].rstrip(b"\0").decode())
+            offset = name_end
+        return names
+
+    def wait_for_file(self, timeout: float) -> Path:
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                new_files = self._new_complete_files()
+                if new_files:
+                    return self.directory / max(new_files, key=lambda f: (self.directory / f).stat().st_mtime)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Did not manage to download file within {timeout} seconds.")
+                if self._last_sizes:
+                    # check again shortly whether the new files are still growing
+                    time.sleep(min(remaining, POLL_INTERVAL))
+                elif self._fd is not None:
+                    # the names are only used as wake up signal, the directory listing is the source of truth
+                    self._read_inotify_names(min(remaining, 1.0))
+                else:
+                    time.sleep(min(remaining, POLL_INTERVAL * 5))
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
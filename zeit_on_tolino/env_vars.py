@@ -1,6 +1,6 @@
 import os
-
-from zeit_on_tolino.tolino_partner import PartnerDetails
+from pathlib import Path
+from typing import Iterable, Optional
 
 
 class EnvVars:
@@ -14,22 +14,59 @@ class EnvVars:
     ZEIT_PREMIUM_PASSWORD: str = "ZEIT_PREMIUM_PASSWORD"
 
 
+class OptionalEnvVars:
+    # directory for state kept between runs, defaults to `DEFAULT_STATE_DIR`
+    ZEIT_ON_TOLINO_STATE_DIR: str = "ZEIT_ON_TOLINO_STATE_DIR"
+    # passphrase to encrypt stored login sessions with, sessions are not stored if unset
+    ZEIT_ON_TOLINO_SESSION_KEY: str = "ZEIT_ON_TOLINO_SESSION_KEY"
+    # how to download the e-paper, either "http" (default) or "browser"
+    ZEIT_ON_TOLINO_DOWNLOAD_MODE: str = "ZEIT_ON_TOLINO_DOWNLOAD_MODE"
+    # how to upload the e-paper, either "api" (default) or "browser"
+    ZEIT_ON_TOLINO_UPLOAD_MODE: str = "ZEIT_ON_TOLINO_UPLOAD_MODE"
+    # how much debugging information to capture, either "off" (default), "summary" or "full"
+    ZEIT_ON_TOLINO_DIAGNOSTICS: str = "ZEIT_ON_TOLINO_DIAGNOSTICS"
+    # several tolino accounts to sync to, replaces the `TOLINO_*` env vars, see `accounts.get_accounts`
+    ZEIT_ON_TOLINO_ACCOUNTS: str = "ZEIT_ON_TOLINO_ACCOUNTS"
+    # set to "true" to shrink the EPUB before uploading it, see `optimize.optimize_epub`
+    ZEIT_ON_TOLINO_OPTIMIZE_EPUB: str = "ZEIT_ON_TOLINO_OPTIMIZE_EPUB"
+    # which requests the browser blocks, either "default", "trackers" or "off", see `blocking.get_block_list`
+    ZEIT_ON_TOLINO_BLOCKING: str = "ZEIT_ON_TOLINO_BLOCKING"
+    # path of a JSON file with additional resources to block per domain, e.g. {"zeit.de": ["*.svg"]}
+    ZEIT_ON_TOLINO_BLOCK_LIST: str = "ZEIT_ON_TOLINO_BLOCK_LIST"
+    # set to "false" to log into tolino only after the download instead of in a second browser meanwhile
+    ZEIT_ON_TOLINO_PARALLEL_LOGIN: str = "ZEIT_ON_TOLINO_PARALLEL_LOGIN"
+    # set to "true" to record every command sent to the browser, see `instrumentation.instrument`
+    ZEIT_ON_TOLINO_INSTRUMENTATION: str = "ZEIT_ON_TOLINO_INSTRUMENTATION"
+
+
+DEFAULT_STATE_DIR = Path.home() / ".config" / "zeit-on-tolino"
+
+
 class MissingEnvironmentVariable(Exception):
     pass
 
 
-def verify_env_vars_are_set() -> None:
+def verify_env_vars_are_set(ignore: Iterable[str] = ()) -> None:
     for var_key in EnvVars.__dict__.keys():
         if not var_key.startswith("__"):
             var_name = getattr(EnvVars, var_key)
-            if var_name not in os.environ:
+            if var_name not in os.environ and var_name not in ignore:
                 raise MissingEnvironmentVariable(
                     f"The environment variable '{var_name}' is missing. Ensure to export it."
                 )
 
 
-def verify_configured_partner_shop_is_supported() -> None:
-    shop = os.environ.get(EnvVars.TOLINO_PARTNER_SHOP)
+def verify_configured_partner_shop_is_supported(shop: Optional[str] = None) -> None:
+    # imported here, as pydantic is not needed to read the env vars
+    from zeit_on_tolino.tolino_partner import PartnerDetails
+
+    shop = shop or os.environ.get(EnvVars.TOLINO_PARTNER_SHOP)
     if shop not in PartnerDetails.__annotations__.keys():
         supported_shops = [p for p in PartnerDetails.__annotations__.keys()]
         raise ValueError(f"Tolino partner shop '{shop}' is not supported. Supported shops are: {supported_shops}")
+
+
+def get_state_dir() -> Path:
+    state_dir = Path(os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_STATE_DIR, DEFAULT_STATE_DIR))
+    state_dir.mkdir(parents=True, exist_ok=True)
+    return state_dir
@@ -1,32 +1,73 @@
+import functools
 import zipfile
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import IO, Optional
 
 from lxml import etree
 
+from zeit_on_tolino import tracing
 
-def get_epub_info(file_path: Path) -> Dict[str, str]:
-    def xpath(element, path):
-        return element.xpath(
-            path,
-            namespaces={
-                "n": "urn:oasis:names:tc:opendocument:xmlns:container",
-                "pkg": "http://www.idpf.org/2007/opf",
-                "dc": "http://purl.org/dc/elements/1.1/",
-            },
-        )[0]
+CONTAINER_PATH = "META-INF/container.xml"
+CONTAINER_NAMESPACE = "urn:oasis:names:tc:opendocument:xmlns:container"
+OPF_NAMESPACE = "http://www.idpf.org/2007/opf"
+DC_NAMESPACE = "http://purl.org/dc/elements/1.1/"
 
-    # prepare to read from the .epub file
-    zip_content = zipfile.ZipFile(file_path)
+METADATA_FIELDS = ("title", "language", "creator", "date", "identifier")
+CACHE_SIZE = 32
 
-    # find the contents metafile
-    cfname = xpath(
-        etree.fromstring(zip_content.read("META-INF/container.xml")),
-        "n:rootfiles/n:rootfile/@full-path",
-    )
 
-    # grab the metadata block from the contents metafile
-    metadata = xpath(etree.fromstring(zip_content.read(cfname)), "/pkg:package/pkg:metadata")
+class EpubError(Exception):
+    pass
 
-    # repackage the data
-    return {s: xpath(metadata, f"dc:{s}/text()") for s in ("title", "language", "creator", "date", "identifier")}
+
+@dataclass(frozen=True)
+class EpubInfo:
+    title: Optional[str] = None
+    language: Optional[str] = None
+    creator: Optional[str] = None
+    date: Optional[str] = None
+    identifier: Optional[str] = None
+
+
+def read_rootfile_path(container: IO[bytes]) -> str:
+    for _, element in etree.iterparse(container, events=("start",), tag=f"{{{CONTAINER_NAMESPACE}}}rootfile"):
+        full_path = element.get("full-path")
+        if full_path:
+            return full_path
+    raise EpubError(f"no rootfile found in {CONTAINER_PATH}.")
+
+
+def _read_metadata(opf: IO[bytes]) -> EpubInfo:
+    """Parse the metadata block of the OPF, without reading the manifest and spine following it."""
+    values = {}
+    dc_tags = {f"{{{DC_NAMESPACE}}}{field}": field for field in METADATA_FIELDS}
+    for _, element in etree.iterparse(opf, events=("end",)):
+        field = dc_tags.get(element.tag)
+        if field is not None and field not in values and element.text and element.text.strip():
+            # like before, the first occurrence of a field wins, e.g. the first of several creators
+            values[field] = element.text.strip()
+        elif element.tag == f"{{{OPF_NAMESPACE}}}metadata":
+            break
+        element.clear()
+    return EpubInfo(**values)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _get_epub_info(file_path: Path, size: int, mtime_ns: int) -> EpubInfo:
+    try:
+        with zipfile.ZipFile(file_path) as zip_file:
+            with zip_file.open(CONTAINER_PATH) as container:
+                rootfile_path = read_rootfile_path(container)
+            with zip_file.open(rootfile_path) as opf:
+                return _read_metadata(opf)
+    except (zipfile.BadZipFile, KeyError, etree.XMLSyntaxError) as e:
+        raise EpubError(f"could not read the metadata of {file_path}: {e}") from e
+
+
+@tracing.traced("epub.get_epub_info")
+def get_epub_info(file_path: Path) -> EpubInfo:
+    """The Dublin Core metadata of an EPUB, cached as long as the file is not modified. Missing fields are None."""
+    file_path = Path(file_path).resolve()
+    stat = file_path.stat()
+    return _get_epub_info(file_path, stat.st_size, stat.st_mtime_ns)
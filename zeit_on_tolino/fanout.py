@@ -0,0 +1,91 @@
+import logging
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from zeit_on_tolino import blocking, instrumentation, ledger, tolino, tracing
+from zeit_on_tolino.accounts import TolinoAccount
+
+MAX_PARALLEL_BROWSERS = 3
+
+STATUS_UPLOADED = "uploaded"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+# creates a browser using the given profile and download directory
+WebDriverFactory = Callable[[Path, Path], WebDriver]
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class AccountResult:
+    account: str
+    status: str
+    duration: float
+    error: Optional[str] = None
+
+
+def _sync_account(
+    create_webdriver: WebDriverFactory,
+    e_paper_path: Path,
+    edition: ledger.Edition,
+    account: TolinoAccount,
+    ledger_path: Optional[Path],
+) -> AccountResult:
+    start = time.monotonic()
+    if ledger.is_uploaded(edition, account.user, ledger_path):
+        log.info(f"'{edition.title}' was already uploaded to tolino account '{account.user}', skipping upload.")
+        return AccountResult(account.user, STATUS_SKIPPED, time.monotonic() - start)
+
+    webdriver = None
+    # a fresh profile per account, logins are restored from the stored session of the account instead
+    with tracing.span("tolino.account", account=account.user), tempfile.TemporaryDirectory(
+        prefix="zeit-on-tolino-profile-"
+    ) as profile_dir:
+        try:
+            webdriver = create_webdriver(Path(profile_dir), Path(profile_dir) / "downloads")
+            tolino.login_and_upload(webdriver, e_paper_path, edition.title, account)
+            ledger.record_upload(edition, account.user, ledger_path)
+        except Exception as e:
+            log.error(f"syncing '{edition.title}' to tolino account '{account.user}' failed: {e}", exc_info=True)
+            return AccountResult(account.user, STATUS_FAILED, time.monotonic() - start, error=str(e))
+        finally:
+            if webdriver is not None:
+                blocking.log_summary(webdriver)
+                instrumentation.log_summary(webdriver)
+                webdriver.quit()
+    return AccountResult(account.user, STATUS_UPLOADED, time.monotonic() - start)
+
+
+def upload_to_accounts(
+    create_webdriver: WebDriverFactory,
+    e_paper_path: Path,
+    edition: ledger.Edition,
+    accounts: Sequence[TolinoAccount],
+    max_browsers: int = MAX_PARALLEL_BROWSERS,
+    ledger_path: Optional[Path] = None,
+) -> List[AccountResult]:
+    """Upload the downloaded e-paper to all `accounts`, each in its own browser, at most `max_browsers` at a time.
+
+    A failing account does not affect the others, its error is reported in its result.
+    """
+    workers = max(1, min(max_browsers, len(accounts)))
+    log.info(f"uploading '{edition.title}' to {len(accounts)} tolino accounts using {workers} browsers...")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tolino-account") as pool:
+        futures = [
+            tracing.submit(pool, _sync_account, create_webdriver, e_paper_path, edition, account, ledger_path)
+            for account in accounts
+        ]
+        return [future.result() for future in futures]
+
+
+def log_results(results: Sequence[AccountResult]) -> None:
+    for result in results:
+        error = f": {result.error}" if result.error else ""
+        log.info(f"{result.account:40} {result.status:10} {result.duration:7.1f}s{error}")
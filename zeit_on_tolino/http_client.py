@@ -0,0 +1,305 @@
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import re
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from http.client import HTTPException, HTTPResponse
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+from urllib.parse import unquote, urlsplit
+
+if TYPE_CHECKING:
+    from selenium.webdriver.firefox.webdriver import WebDriver
+
+CHUNK_SIZE = 256 * 1024
+TIMEOUT = 30  # seconds without any response from the server
+MAX_RETRIES = 3
+
+log = logging.getLogger(__name__)
+
+
+class DownloadError(Exception):
+    pass
+
+
+@dataclass
+class DownloadResult:
+    path: Path
+    size: int
+    sha256: str
+    resumed_from: int = 0
+
+
+def _domain_matches(cookie_domain: str, host: str) -> bool:
+    cookie_domain = cookie_domain.lstrip(".").lower()
+    return host == cookie_domain or host.endswith(f".{cookie_domain}")
+
+
+def cookie_header(cookies: Iterable[Dict[str, Any]], url: str) -> str:
+    """Build a `Cookie` header value out of the selenium/DevTools `cookies` which apply to `url`."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+    applicable = []
+    for cookie in cookies:
+        if not _domain_matches(cookie.get("domain", host), host):
+            continue
+        if not path.startswith(cookie.get("path", "/")):
+            continue
+        if cookie.get("secure") and parts.scheme != "https":
+            continue
+        applicable.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(applicable)
+
+
+def get_browser_cookies(webdriver: "WebDriver") -> list:
+    """All cookies of the browser, not only the ones of the current page, if DevTools are available."""
+    try:
+        return webdriver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+    except Exception:
+        return webdriver.get_cookies()
+
+
+def get_browser_headers(webdriver: "WebDriver", url: str) -> Dict[str, str]:
+    """Headers making a plain HTTP request to `url` look like it was sent by the browser session."""
+    headers = {
+        "User-Agent": webdriver.execute_script("return navigator.userAgent"),
+        "Referer": webdriver.current_url,
+    }
+    cookies = cookie_header(get_browser_cookies(webdriver), url)
+    if cookies:
+        headers["Cookie"] = cookies
+    return headers
+
+
+@dataclass
+class Page:
+    # None if the page was not modified since the given `etag` or `last_modified`
+    text: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def fetch_page(
+    url: str, headers: Optional[Dict[str, str]] = None, etag: Optional[str] = None, last_modified: Optional[str] = None
+) -> Page:
+    """Fetch a (HTML) page, conditionally if the validators of a previous response are given."""
+    headers = dict(headers or {})
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=TIMEOUT) as response:
+            charset = response.headers.get_content_charset() or "utf-8"
+            text = response.read().decode(charset, errors="replace")
+            return Page(text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and (etag or last_modified):
+            return Page(None, etag, last_modified)
+        raise DownloadError(f"Request to {url} failed with HTTP status {e.code}.") from e
+    except (urllib.error.URLError, HTTPException, OSError) as e:
+        raise DownloadError(f"Request to {url} failed: {e}") from e
+
+
+def fetch_text(url: str, headers: Optional[Dict[str, str]] = None) -> str:
+    """Fetch a (HTML) page, e.g. with the headers of `get_browser_headers`."""
+    return fetch_page(url, headers).text
+
+
+def _file_name_from_response(response: HTTPResponse, url: str) -> str:
+    content_disposition = response.headers.get("Content-Disposition", "")
+    match = re.search(r"filename\*=UTF-8''([^;]+)", content_disposition, re.IGNORECASE)
+    if match:
+        return Path(unquote(match.group(1))).name
+    match = re.search(r'filename="?([^";]+)"?', content_disposition, re.IGNORECASE)
+    if match:
+        return Path(match.group(1)).name
+    return Path(unquote(urlsplit(response.geturl() or url).path)).name or "download"
+
+
+def _total_size(response: HTTPResponse, offset: int) -> Optional[int]:
+    content_range = response.headers.get("Content-Range")
+    if content_range:
+        match = re.match(r"bytes (\d+)-\d+/(\d+)", content_range)
+        if not match or int(match.group(1)) != offset:
+            raise DownloadError(f"Server answered with unexpected range '{content_range}' for offset {offset}.")
+        return int(match.group(2))
+    content_length = response.headers.get("Content-Length")
+    return int(content_length) if content_length is not None else None
+
+
+def _decode_checksum(header: str, value: str) -> Optional[str]:
+    try:
+        return base64.b64decode(value, validate=True).hex()
+    except binascii.Error as e:
+        log.warning(f"ignoring malformed '{header}' header '{value}': {e}")
+        return None
+
+
+def _server_checksum(response: HTTPResponse) -> Optional[tuple]:
+    """Checksum of the complete file as announced by the server, only meaningful for non-range responses."""
+    digest = response.headers.get("Digest", "")
+    match = re.search(r"sha-256=([A-Za-z0-9+/=]+)", digest, re.IGNORECASE)
+    checksum = _decode_checksum("Digest", match.group(1)) if match else None
+    if checksum:
+        return "sha256", checksum
+    content_md5 = response.headers.get("Content-MD5")
+    checksum = _decode_checksum("Content-MD5", content_md5.strip()) if content_md5 else None
+    if checksum:
+        return "md5", checksum
+    return None
+
+
+def _hash_existing(path: Path, hashers: Iterable) -> int:
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            size += len(chunk)
+            for hasher in hashers:
+                hasher.update(chunk)
+    return size
+
+
+def stream_download(
+    url: str,
+    download_dir: Path,
+    headers: Optional[Dict[str, str]] = None,
+    file_name: Optional[str] = None,
+    expected_sha256: Optional[str] = None,
+    max_retries: int = MAX_RETRIES,
+) -> DownloadResult:
+    """Download `url` in chunks into `download_dir`, resuming a previously interrupted download via HTTP ranges.
+
+    The data is written to a `.part` file which is renamed to its final name only after the size and, if known, the
+    checksum were verified, so a file with the final name is always complete. The ETag or Last-Modified of the first
+    response is stored next to it and sent as `If-Range`, so a file which changed in the meantime is downloaded anew.
+    """
+    download_dir = Path(download_dir)
+    download_dir.mkdir(parents=True, exist_ok=True)
+    part_path = download_dir / f".{hashlib.sha1(url.encode()).hexdigest()[:16]}.part"
+    resumed_from = part_path.stat().st_size if part_path.is_file() and _load_validator(part_path) else 0
+
+    for attempt in range(max_retries + 1):
+        try:
+            return _download_attempt(url, part_path, headers or {}, file_name, expected_sha256, resumed_from)
+        except (urllib.error.URLError, HTTPException, ConnectionError, TimeoutError) as e:
+            if isinstance(e, urllib.error.HTTPError) and e.code != 416 and e.code < 500:
+                raise DownloadError(f"Download of {url} failed with HTTP status {e.code}.") from e
+            if attempt == max_retries:
+                raise DownloadError(f"Download of {url} failed after {max_retries + 1} attempts: {e}") from e
+            log.info(f"download interrupted ({e}), resuming...")
+            time.sleep(2**attempt)
+    raise AssertionError("unreachable")
+
+
+def _validator_path(part_path: Path) -> Path:
+    return part_path.with_suffix(".validator")
+
+
+def _load_validator(part_path: Path) -> Optional[str]:
+    """The ETag or Last-Modified of the response the `.part` file was started with, to resume it via `If-Range`."""
+    try:
+        return json.loads(_validator_path(part_path).read_text())["if_range"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_validator(part_path: Path, response: HTTPResponse) -> None:
+    # weak ETags must not be used for ranges, see RFC 9110 section 13.1.5
+    etag = response.headers.get("ETag")
+    if_range = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+    if if_range:
+        _validator_path(part_path).write_text(json.dumps({"if_range": if_range}))
+    else:
+        _validator_path(part_path).unlink(missing_ok=True)
+
+
+def _discard_part(part_path: Path) -> None:
+    part_path.unlink(missing_ok=True)
+    _validator_path(part_path).unlink(missing_ok=True)
+
+
+def _finish(
+    part_path: Path, path: Path, size: int, sha256: Any, expected_sha256: Optional[str], resumed_from: int
+) -> DownloadResult:
+    if expected_sha256 and sha256.hexdigest() != expected_sha256:
+        _discard_part(part_path)
+        raise DownloadError(f"Downloaded file does not match the expected sha256 checksum '{expected_sha256}'.")
+    part_path.replace(path)
+    _validator_path(part_path).unlink(missing_ok=True)
+    log.info(f"downloaded {size} bytes to {path}")
+    return DownloadResult(path=path, size=size, sha256=sha256.hexdigest(), resumed_from=resumed_from)
+
+
+def _download_attempt(
+    url: str,
+    part_path: Path,
+    headers: Dict[str, str],
+    file_name: Optional[str],
+    expected_sha256: Optional[str],
+    resumed_from: int,
+) -> DownloadResult:
+    offset = part_path.stat().st_size if part_path.is_file() else 0
+    if_range = _load_validator(part_path) if offset else None
+    if offset and if_range is None:
+        log.info("cannot tell whether the partial download is still current, starting from scratch.")
+        _discard_part(part_path)
+        offset = 0
+    request_headers = dict(headers)
+    if offset:
+        # the server sends the complete file instead of the range if it changed since, e.g. for a new edition
+        request_headers["Range"] = f"bytes={offset}-"
+        request_headers["If-Range"] = if_range
+
+    try:
+        response = urllib.request.urlopen(urllib.request.Request(url, headers=request_headers), timeout=TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code != 416 or not offset:
+            raise
+        match = re.match(r"bytes \*/(\d+)", e.headers.get("Content-Range", ""))
+        if match and int(match.group(1)) == offset:
+            log.info(f"the partial download is already complete with {offset} bytes.")
+            sha256 = hashlib.sha256()
+            _hash_existing(part_path, (sha256,))
+            path = part_path.parent / (file_name or _file_name_from_response(e, url))
+            return _finish(part_path, path, offset, sha256, expected_sha256, resumed_from)
+        log.info("the partial download does not match the file on the server, starting from scratch.")
+        _discard_part(part_path)
+        return _download_attempt(url, part_path, headers, file_name, expected_sha256, resumed_from=0)
+
+    with response:
+        if offset and response.status != 206:
+            log.info("the file changed or the server does not support resuming downloads, starting from scratch.")
+            offset = 0
+        if offset == 0:
+            _save_validator(part_path, response)
+        total_size = _total_size(response, offset)
+        server_checksum = _server_checksum(response) if offset == 0 else None
+
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+        if offset:
+            _hash_existing(part_path, (sha256, md5))
+            log.info(f"resuming download at {offset} of {total_size} bytes.")
+        size = offset
+        with open(part_path, "ab" if offset else "wb") as f:
+            while chunk := response.read(CHUNK_SIZE):
+                f.write(chunk)
+                sha256.update(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+
+        if total_size is not None and size != total_size:
+            raise ConnectionError(f"Download ended after {size} of {total_size} bytes.")
+        if server_checksum and server_checksum[1] != (sha256 if server_checksum[0] == "sha256" else md5).hexdigest():
+            _discard_part(part_path)
+            raise DownloadError(f"Downloaded file does not match the {server_checksum[0]} checksum sent by the server.")
+
+        path = part_path.parent / (file_name or _file_name_from_response(response, url))
+    return _finish(part_path, path, size, sha256, expected_sha256, resumed_from if offset else 0)
@@ -0,0 +1,174 @@
+"""Counts, times and sizes every command a driver sends to the chromedriver, grouped by the tracing span it was sent in.
+
+Every `find_element`, `.text`, `page_source` or `execute_script` is an HTTP round trip to the chromedriver. Turn this on
+via `ZEIT_ON_TOLINO_INSTRUMENTATION=true` to see which steps of a sync are chatty or move large payloads.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from zeit_on_tolino import tracing
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+UNTRACED = "untraced"
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class CommandRecord:
+    command: str
+    path: Tuple[str, ...]  # names of the tracing spans the command was sent in, the outermost first
+    duration: float
+    sent_bytes: int
+    received_bytes: int
+
+    @property
+    def stage(self) -> str:
+        return self.path[-1] if self.path else UNTRACED
+
+
+def _json_size(value: Any) -> int:
+    try:
+        return len(json.dumps(value, default=str).encode())
+    except (TypeError, ValueError):
+        return 0
+
+
+def is_enabled() -> bool:
+    return os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_INSTRUMENTATION, "").lower() in ("1", "true", "yes", "on")
+
+
+class CommandStats:
+    def __init__(self) -> None:
+        self._records: List[CommandRecord] = []
+        self._lock = threading.Lock()
+
+    def record(self, record: CommandRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def records(self, stage: Optional[str] = None) -> List[CommandRecord]:
+        """All records, or the ones sent within the span `stage`, including the spans nested in it."""
+        with self._lock:
+            records = list(self._records)
+        if stage is None:
+            return records
+        return [r for r in records if stage in r.path or (stage == UNTRACED and not r.path)]
+
+    def round_trips(self, stage: Optional[str] = None, command: Optional[str] = None) -> int:
+        return sum(1 for r in self.records(stage) if command is None or r.command == command)
+
+    def received_bytes(self, stage: Optional[str] = None, command: Optional[str] = None) -> int:
+        return sum(r.received_bytes for r in self.records(stage) if command is None or r.command == command)
+
+    def exceeded_budgets(self, budgets: Dict[str, int]) -> List[str]:
+        """The stages which took more round trips than their budget, e.g. `{"tolino.login": 40}`."""
+        exceeded = []
+        for stage, budget in budgets.items():
+            round_trips = self.round_trips(stage)
+            if round_trips > budget:
+                exceeded.append(f"{stage} took {round_trips} round trips, budget is {budget}")
+        return exceeded
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, duration and payload sizes of the commands per stage, i.e. the innermost span they were sent in."""
+        stages: Dict[str, Dict[str, Any]] = defaultdict(
+            lambda: {"round_trips": 0, "duration": 0.0, "sent_bytes": 0, "received_bytes": 0, "commands": {}}
+        )
+        for r in self.records():
+            stage = stages[r.stage]
+            stage["round_trips"] += 1
+            stage["duration"] += r.duration
+            stage["sent_bytes"] += r.sent_bytes
+            stage["received_bytes"] += r.received_bytes
+            stage["commands"][r.command] = stage["commands"].get(r.command, 0) + 1
+        return dict(stages)
+
+    def log_summary(self) -> None:
+        records = self.records()
+        total_bytes = sum(r.received_bytes for r in records)
+        log.info(
+            f"sent {len(records)} commands to the browser in {sum(r.duration for r in records):.1f}s, "
+            f"receiving {total_bytes / 1e6:.2f} MB."
+        )
+        by_round_trips = sorted(self.summary().items(), key=lambda item: item[1]["round_trips"], reverse=True)
+        for stage, stats in by_round_trips:
+            commands = ", ".join(f"{c}: {n}" for c, n in sorted(stats["commands"].items(), key=lambda i: -i[1]))
+            log.info(
+                f"{stage:45} {stats['round_trips']:5} commands {stats['duration']:6.1f}s "
+                f"{stats['received_bytes'] / 1e6:7.2f} MB ({commands})"
+            )
+
+    def export_json(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        report = {"summary": self.summary(), "commands": [asdict(r) for r in self.records()]}
+        path.write_text(json.dumps(report, indent=2))
+        return path
+
+
+def instrument(webdriver: "WebDriver") -> CommandStats:
+    """Record every command `webdriver` sends from now on, see `get_stats`."""
+    stats = getattr(webdriver, "command_stats", None)
+    if stats is not None:
+        return stats
+    stats = CommandStats()
+    executor = webdriver.command_executor
+    execute = executor.execute
+
+    def instrumented_execute(command: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        response = execute(command, params)
+        stats.record(
+            CommandRecord(
+                command=command,
+                path=tracing.current_path(),
+                duration=time.perf_counter() - start,
+                sent_bytes=_json_size(params),
+                received_bytes=_json_size(response),
+            )
+        )
+        return response
+
+    # the elements of the driver send their commands via its executor as well
+    executor.execute = instrumented_execute
+    setattr(webdriver, "command_stats", stats)
+    return stats
+
+
+def enable_instrumentation(webdriver: "WebDriver") -> Optional[CommandStats]:
+    if not is_enabled():
+        return None
+    log.info("recording the commands sent to the browser.")
+    return instrument(webdriver)
+
+
+def get_stats(webdriver: "WebDriver") -> Optional[CommandStats]:
+    return getattr(webdriver, "command_stats", None)
+
+
+def log_summary(webdriver: "WebDriver") -> None:
+    stats = get_stats(webdriver)
+    if stats is not None:
+        stats.log_summary()
+
+
+def export_report(webdriver: "WebDriver", trace_dir: Path = tracing.TRACE_DIR) -> Optional[Path]:
+    stats = get_stats(webdriver)
+    if stats is None:
+        return None
+    tracer = tracing.get_tracer()
+    file_name = f"commands_{tracer.started_at.strftime('%Y%m%d_%H%M%S')}_{tracer.run_id}.json"
+    path = stats.export_json(trace_dir / file_name)
+    log.info(f"wrote the commands sent to the browser to {path}")
+    return path
@@ -0,0 +1,166 @@
+import functools
+import hashlib
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from zeit_on_tolino.env_vars import get_state_dir
+
+LEDGER_FILE_NAME = "ledger.sqlite3"
+CHECKSUM_CACHE_SIZE = 32
+RELEASE_WEEKDAY = 2  # the e-paper of the ZEIT is released on wednesdays, dated the next day
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Edition:
+    identifier: str
+    title: str
+    date: Optional[date]
+    sha256: str
+
+
+@functools.lru_cache(maxsize=CHECKSUM_CACHE_SIZE)
+def _sha256_of(file_path: Path, size: int, mtime_ns: int) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def sha256_of(file_path: Path) -> str:
+    """Checksum of a file, cached as long as the file is not modified."""
+    file_path = Path(file_path).resolve()
+    stat = file_path.stat()
+    return _sha256_of(file_path, stat.st_size, stat.st_mtime_ns)
+
+
+def parse_edition_date(value: Optional[str]) -> Optional[date]:
+    """Parse the `dc:date` of an EPUB, which is either an ISO 8601 date (time) or in the ZEIT date format."""
+    if not value:
+        return None
+    for parse in (lambda v: datetime.fromisoformat(v[:10]), lambda v: datetime.strptime(v, "%d.%m.%Y")):
+        try:
+            return parse(value.strip()).date()
+        except ValueError:
+            continue
+    return None
+
+
+def current_release_window(today: date) -> tuple:
+    """First and last possible date of the most recent edition released on or before `today`."""
+    release_day = today - timedelta(days=(today.weekday() - RELEASE_WEEKDAY) % 7)
+    return release_day, release_day + timedelta(days=1)
+
+
+def _connect(ledger_path: Optional[Path] = None) -> sqlite3.Connection:
+    connection = sqlite3.connect(ledger_path or get_state_dir() / LEDGER_FILE_NAME)
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS synced_editions (
+            identifier TEXT NOT NULL,
+            title TEXT NOT NULL,
+            edition_date TEXT,
+            sha256 TEXT NOT NULL,
+            account TEXT NOT NULL,
+            synced_at TEXT NOT NULL,
+            PRIMARY KEY (identifier, account)
+        )
+        """
+    )
+    return connection
+
+
+def _account_key(account: str) -> str:
+    return account.strip().lower()
+
+
+def record_upload(edition: Edition, account: str, ledger_path: Optional[Path] = None) -> None:
+    with _connect(ledger_path) as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO synced_editions VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                edition.identifier,
+                edition.title,
+                edition.date.isoformat() if edition.date else None,
+                edition.sha256,
+                _account_key(account),
+                datetime.now().astimezone().isoformat(),
+            ),
+        )
+    connection.close()
+    log.info(f"recorded '{edition.title}' as synced to tolino account '{account}'.")
+
+
+def is_uploaded(edition: Edition, account: str, ledger_path: Optional[Path] = None) -> bool:
+    """Whether this exact edition, identified by its identifier or content, was already uploaded to `account`."""
+    with _connect(ledger_path) as connection:
+        row = connection.execute(
+            "SELECT 1 FROM synced_editions WHERE account = ? AND (identifier = ? OR sha256 = ?) LIMIT 1",
+            (_account_key(account), edition.identifier, edition.sha256),
+        ).fetchone()
+    connection.close()
+    return row is not None
+
+
+def list_uploads(limit: int = 10, ledger_path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """The most recently recorded uploads, newest first."""
+    with _connect(ledger_path) as connection:
+        rows = connection.execute(
+            "SELECT title, edition_date, account, synced_at FROM synced_editions ORDER BY synced_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    connection.close()
+    return [dict(zip(("title", "edition_date", "account", "synced_at"), row)) for row in rows]
+
+
+def _is_synced_between(
+    first_date: date, last_date: date, accounts: Iterable[str], ledger_path: Optional[Path] = None
+) -> bool:
+    accounts = {_account_key(a) for a in accounts}
+    with _connect(ledger_path) as connection:
+        rows = connection.execute(
+            "SELECT DISTINCT account FROM synced_editions WHERE edition_date BETWEEN ? AND ?",
+            (first_date.isoformat(), last_date.isoformat()),
+        ).fetchall()
+    connection.close()
+    return accounts <= {account for (account,) in rows}
+
+
+def is_release_synced(today: date, accounts: Iterable[str], ledger_path: Optional[Path] = None) -> bool:
+    """Whether the most recent release as of `today` was synced to all `accounts`, checked without any download."""
+    return _is_synced_between(*current_release_window(today), accounts, ledger_path)
+
+
+def is_up_to_date(accounts: Iterable[str], ledger_path: Optional[Path] = None) -> bool:
+    if is_release_synced(date.today(), accounts, ledger_path):
+        log.info("the most recent ZEIT e-paper was already synced to your tolino cloud, nothing to do.")
+        return True
+    return False
+
+
+def is_edition_synced(edition_date: date, accounts: Iterable[str], ledger_path: Optional[Path] = None) -> bool:
+    """Whether the edition dated `edition_date` in the ZEIT archive was synced to all `accounts`.
+
+    The EPUB of an edition may be dated on its release day, the day before.
+    """
+    return _is_synced_between(edition_date - timedelta(days=1), edition_date, accounts, ledger_path)
+
+
+def edition_from_epub(file_path: Path) -> Edition:
+    # imported here, so that reading the ledger does not require lxml
+    from zeit_on_tolino import epub
+
+    info = epub.get_epub_info(file_path)
+    sha256 = sha256_of(file_path)
+    return Edition(
+        identifier=info.identifier or f"sha256:{sha256}",
+        title=info.title or Path(file_path).stem,
+        date=parse_edition_date(info.date),
+        sha256=sha256,
+    )
@@ -0,0 +1,84 @@
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from zeit_on_tolino import tolino_cloud, tracing
+
+SOURCE_DOM = "dom"
+SOURCE_CLOUD = "cloud"
+
+# reads all rendered entries of 'my books' at once instead of transferring and searching the whole page source
+_READ_LIBRARY_SCRIPT = """
+    const titles = document.querySelectorAll(
+        '[data-test-id^="library-myBooks-titles-list-"][data-test-id$="-title"]'
+    );
+    return Array.from(titles).map(titleElement => {
+        const index = parseInt(titleElement.getAttribute('data-test-id').split('-')[4]);
+        const entry = document.querySelector(`[data-test-id="library-myBooks-titles-list-${index}"]`)
+            || titleElement.parentElement;
+        const dateElement = entry.querySelector('time, [data-test-id$="-date"], [data-test-id$="-uploadDate"]');
+        return {
+            index: index,
+            title: titleElement.textContent.trim(),
+            id: entry.getAttribute('data-id') || entry.getAttribute('data-book-id') || null,
+            upload_date: dateElement ? (dateElement.getAttribute('datetime') || dateElement.textContent.trim()) : null,
+        };
+    });
+"""
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class LibraryItem:
+    title: str
+    id: Optional[str] = None
+    upload_date: Optional[str] = None
+    index: Optional[int] = None
+    source: str = SOURCE_DOM
+
+
+def _read_from_dom(webdriver: WebDriver) -> List[LibraryItem]:
+    return [LibraryItem(**entry, source=SOURCE_DOM) for entry in webdriver.execute_script(_READ_LIBRARY_SCRIPT)]
+
+
+def _read_from_cloud(credentials: tolino_cloud.CloudCredentials) -> List[LibraryItem]:
+    books = tolino_cloud.list_books(credentials)
+    return [LibraryItem(title=book.title, id=book.id, index=i, source=SOURCE_CLOUD) for i, book in enumerate(books)]
+
+
+@tracing.traced("library.get_inventory")
+def get_inventory(
+    webdriver: WebDriver,
+    credentials: Optional[tolino_cloud.CloudCredentials] = None,
+    refresh: bool = False,
+) -> List[LibraryItem]:
+    """The books in the tolino library, cached for the session of `webdriver` until `refresh` or `invalidate`.
+
+    With `credentials` the complete library is read from the tolino cloud, otherwise only the entries of 'my books'
+    rendered by the webreader are visible. A failing cloud request raises `TolinoCloudError` rather than falling back
+    to the webreader, whose page may not show a book uploaded via the API yet.
+    """
+    inventory = getattr(webdriver, "library_inventory", None)
+    if inventory is not None and not refresh:
+        return inventory
+
+    inventory = _read_from_cloud(credentials) if credentials is not None else _read_from_dom(webdriver)
+    setattr(webdriver, "library_inventory", inventory)
+    log.info(f"found {len(inventory)} books in the tolino library.")
+    return inventory
+
+
+def invalidate(webdriver: WebDriver) -> None:
+    setattr(webdriver, "library_inventory", None)
+
+
+def contains_title(
+    webdriver: WebDriver,
+    title: str,
+    credentials: Optional[tolino_cloud.CloudCredentials] = None,
+    refresh: bool = False,
+) -> bool:
+    return any(item.title == title for item in get_inventory(webdriver, credentials, refresh))
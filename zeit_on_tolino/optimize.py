@@ -0,0 +1,223 @@
+import io
+import logging
+import os
+import posixpath
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+from lxml import etree
+
+from zeit_on_tolino import epub, tracing, validate
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency, install the "optimize" extra to recompress images
+    Image = None
+
+# screen resolution of current tolino e-readers, larger images are scaled down to fit
+MAX_IMAGE_SIZE = (1264, 1680)
+JPEG_QUALITY = 75
+# recompressed images have to be at least this much smaller, which also avoids degrading them on every run
+MIN_IMAGE_SAVING = 0.05
+IMAGE_MEDIA_TYPES = ("image/jpeg", "image/png")
+FONT_EXTENSIONS = (".ttf", ".otf", ".woff", ".woff2")
+TEXT_EXTENSIONS = (".css", ".xhtml", ".html", ".htm")
+
+_FONT_FACE_PATTERN = re.compile(r"@font-face\s*{[^}]*}", re.IGNORECASE)
+_FONT_FAMILY_PATTERN = re.compile(r"font-family\s*:\s*([^;}]+)", re.IGNORECASE)
+_FONT_SHORTHAND_PATTERN = re.compile(r"(?<![-\w])font\s*:\s*([^;}]+)", re.IGNORECASE)
+_URL_PATTERN = re.compile(r"url\(\s*['\"]?([^'\")]+)", re.IGNORECASE)
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class OptimizeResult:
+    path: Path
+    original_size: int
+    optimized_size: int
+    images_recompressed: int = 0
+    fonts_dropped: int = 0
+
+    @property
+    def saved(self) -> int:
+        return self.original_size - self.optimized_size
+
+
+def is_enabled() -> bool:
+    return os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_OPTIMIZE_EPUB, "").lower() in ("1", "true", "yes", "on")
+
+
+def recompress_image(data: bytes, max_size: Tuple[int, int], quality: int) -> Optional[bytes]:
+    """The image scaled down to fit into `max_size` and recompressed in its format, None if that is hardly smaller."""
+    with Image.open(io.BytesIO(data)) as image:
+        image_format = image.format
+        image.load()
+        if image.width > max_size[0] or image.height > max_size[1]:
+            image.thumbnail(max_size, Image.LANCZOS)
+        output = io.BytesIO()
+        if image_format == "JPEG":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+        else:
+            image.save(output, image_format, optimize=True)
+    optimized = output.getvalue()
+    return optimized if len(optimized) < len(data) * (1 - MIN_IMAGE_SAVING) else None
+
+
+def _recompress_or_keep(data: bytes, max_size: Tuple[int, int], quality: int) -> Tuple[Optional[bytes], Optional[str]]:
+    """`recompress_image` along with the error it failed with, if so. Optimizing must not fail the sync."""
+    try:
+        return recompress_image(data, max_size, quality), None
+    except Exception as e:  # Pillow raises all kinds of errors for images it cannot decode
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _font_families(declaration: str) -> Set[str]:
+    return {family.strip().strip("'\"").lower() for family in declaration.split(",") if family.strip()}
+
+
+def _resolve(base_path: str, href: str) -> str:
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_path), unquote(href.split("#")[0])))
+
+
+def find_unused_fonts(texts: Dict[str, str], font_paths: Set[str]) -> Set[str]:
+    """Fonts which are not referenced, or only by `@font-face` rules of font families which are never used.
+
+    `texts` maps the paths of all stylesheets and content documents to their content.
+    """
+    referenced, declared = set(), {}
+    used_families: Set[str] = set()
+    for path, text in texts.items():
+        for font_face in _FONT_FACE_PATTERN.findall(text):
+            family = _FONT_FAMILY_PATTERN.search(font_face)
+            sources = {_resolve(path, url) for url in _URL_PATTERN.findall(font_face)}
+            for family_name in _font_families(family.group(1)) if family else {""}:
+                declared.setdefault(family_name, set()).update(sources)
+        text_without_font_faces = _FONT_FACE_PATTERN.sub("", text)
+        for declaration in _FONT_FAMILY_PATTERN.findall(text_without_font_faces):
+            used_families |= _font_families(declaration)
+        for declaration in _FONT_SHORTHAND_PATTERN.findall(text_without_font_faces):
+            used_families |= _font_families(declaration.replace('"', "").replace("'", ""))
+        referenced |= {_resolve(path, url) for url in _URL_PATTERN.findall(text_without_font_faces)}
+
+    for family, sources in declared.items():
+        # the shorthand `font` lists the family last, after size and line height
+        if family in used_families or any(used.endswith(f" {family}") for used in used_families):
+            referenced |= sources
+    return font_paths - referenced
+
+
+def _drop_font_faces(text: str, dropped_fonts: Set[str], path: str) -> str:
+    def replace(match: re.Match) -> str:
+        sources = {_resolve(path, url) for url in _URL_PATTERN.findall(match.group())}
+        return "" if sources and sources <= dropped_fonts else match.group()
+
+    return _FONT_FACE_PATTERN.sub(replace, text)
+
+
+def _read_manifest(zip_file: zipfile.ZipFile) -> Tuple[str, etree._Element, List[etree._Element]]:
+    with zip_file.open(epub.CONTAINER_PATH) as container:
+        opf_path = epub.read_rootfile_path(container)
+    opf = etree.fromstring(zip_file.read(opf_path))
+    return opf_path, opf, opf.findall(f"{{{epub.OPF_NAMESPACE}}}manifest/{{{epub.OPF_NAMESPACE}}}item")
+
+
+@tracing.traced("optimize.optimize_epub")
+def optimize_epub(
+    file_path: Path,
+    max_image_size: Tuple[int, int] = MAX_IMAGE_SIZE,
+    jpeg_quality: int = JPEG_QUALITY,
+    max_workers: Optional[int] = None,
+) -> OptimizeResult:
+    """Shrink the EPUB in place by recompressing its images in parallel processes and dropping unused fonts.
+
+    The file is only replaced if the rewritten EPUB is valid and smaller. Images which cannot be recompressed, and all
+    images if Pillow is not installed, are left as they are.
+    """
+    file_path = Path(file_path)
+    original_size = file_path.stat().st_size
+    with zipfile.ZipFile(file_path) as zip_file:
+        members = zip_file.infolist()
+        contents = {info.filename: zip_file.read(info) for info in members}
+        opf_path, opf, manifest_items = _read_manifest(zip_file)
+
+    media_types = {_resolve(opf_path, item.get("href", "")): item.get("media-type", "") for item in manifest_items}
+    font_paths = {path for path in contents if path.lower().endswith(FONT_EXTENSIONS)}
+    texts = {
+        path: data.decode("utf-8", errors="surrogateescape")
+        for path, data in contents.items()
+        if path.lower().endswith(TEXT_EXTENSIONS)
+    }
+    dropped_fonts = find_unused_fonts(texts, font_paths)
+    for path in dropped_fonts:
+        del contents[path]
+    if dropped_fonts:
+        for item in manifest_items:
+            if _resolve(opf_path, item.get("href", "")) in dropped_fonts:
+                item.getparent().remove(item)
+        contents[opf_path] = etree.tostring(opf, xml_declaration=True, encoding="utf-8")
+        for path, text in texts.items():
+            if path.lower().endswith(".css"):
+                contents[path] = _drop_font_faces(text, dropped_fonts, path).encode("utf-8", errors="surrogateescape")
+
+    images_recompressed = 0
+    image_paths = [path for path in contents if media_types.get(path) in IMAGE_MEDIA_TYPES]
+    if Image is None:
+        log.info("Pillow is not installed, skipping the recompression of images.")
+    elif image_paths:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            optimized_images = pool.map(
+                _recompress_or_keep,
+                (contents[path] for path in image_paths),
+                repeat(max_image_size),
+                repeat(jpeg_quality),
+                chunksize=4,
+            )
+            for path, (optimized, error) in zip(image_paths, optimized_images):
+                if error is not None:
+                    log.warning(f"could not recompress image '{path}', keeping it as is: {error}")
+                elif optimized is not None:
+                    contents[path] = optimized
+                    images_recompressed += 1
+
+    optimized_path = file_path.with_name(f".{file_path.name}.optimizing")
+    with zipfile.ZipFile(optimized_path, "w") as zip_file:
+        for info in members:
+            if info.filename not in contents:
+                continue
+            # the mimetype has to be the first entry and stored uncompressed, see the EPUB OCF specification
+            compression = zipfile.ZIP_STORED if info.filename == "mimetype" else zipfile.ZIP_DEFLATED
+            new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+            new_info.compress_type = compression
+            new_info.external_attr = info.external_attr
+            zip_file.writestr(new_info, contents[info.filename], compresslevel=9)
+
+    validation = validate.validate_epub(optimized_path)
+    if not validation.ok:
+        optimized_path.unlink()
+        log.warning(f"the optimized {file_path.name} is broken, keeping the original: {'; '.join(validation.errors)}")
+        return OptimizeResult(file_path, original_size, original_size)
+
+    optimized_size = optimized_path.stat().st_size
+    if optimized_size >= original_size:
+        optimized_path.unlink()
+        log.info(f"could not reduce the size of {file_path.name}, keeping it as is.")
+        return OptimizeResult(file_path, original_size, original_size)
+    optimized_path.replace(file_path)
+
+    result = OptimizeResult(file_path, original_size, optimized_size, images_recompressed, len(dropped_fonts))
+    log.info(
+        f"optimized {file_path.name} from {original_size} to {optimized_size} bytes, saved {result.saved} bytes "
+        f"({result.saved / original_size:.0%}) by recompressing {images_recompressed} images and dropping "
+        f"{len(dropped_fonts)} unused fonts."
+    )
+    return result
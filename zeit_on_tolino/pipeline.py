@@ -0,0 +1,134 @@
+"""Runs a job as a sequence of stages, with the state saved to disk after each stage.
+
+A failing stage is retried according to its `RetryPolicy`. If it still fails, the state is kept, so the next run of
+the same job continues with the failed stage instead of starting over.
+"""
+
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Type
+
+from zeit_on_tolino import tracing
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# runs a stage with the context of the job, which it can extend by returning a JSON serializable dict
+StageRunner = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+# whether a stage finished by a previous run can be skipped, given the context of the job
+ResumeCheck = Callable[[Dict[str, Any]], bool]
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 1  # attempts within one run
+    delay: float = 0.0  # seconds to wait before the next attempt
+    # the stage to continue with on a retry, e.g. a login, defaults to the failed stage itself
+    retry_from: Optional[str] = None
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    run: StageRunner
+    retry: RetryPolicy = RetryPolicy()
+    # e.g. a login to a new browser can never be resumed, a download only as long as the file is still there
+    can_resume: ResumeCheck = lambda context: True
+
+
+@dataclass
+class PipelineState:
+    job: str
+    context: Dict[str, Any] = field(default_factory=dict)
+    # stage name -> {"status": ..., "attempts": ..., "error": ...}
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    updated_at: float = 0.0
+
+    def is_done(self, stage: str) -> bool:
+        return self.stages.get(stage, {}).get("status") == STATUS_DONE
+
+
+def load_state(state_path: Path, job: str) -> PipelineState:
+    """The saved state of `job`, or an empty one if none is saved or it belongs to another job."""
+    try:
+        state = PipelineState(**json.loads(state_path.read_text()))
+    except (OSError, ValueError, TypeError):
+        return PipelineState(job)
+    if state.job != job:
+        log.info(f"discarding saved state of job '{state.job}'.")
+        return PipelineState(job)
+    return state
+
+
+def save_state(state_path: Path, state: PipelineState) -> None:
+    state.updated_at = time.time()
+    temporary_path = state_path.with_name(f".{state_path.name}.tmp")
+    temporary_path.write_text(json.dumps(asdict(state), default=str))
+    temporary_path.replace(state_path)
+
+
+def run_pipeline(
+    job: str,
+    stages: Sequence[Stage],
+    state_path: Path,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, Any]:
+    """Run all `stages` of `job`, skipping the ones finished by a previous run. Returns the context of the job.
+
+    The state is removed once all stages are done. The error of a stage which still fails after all attempts is raised.
+    """
+    names = [stage.name for stage in stages]
+    state = load_state(state_path, job)
+    for stage in stages:
+        if state.is_done(stage.name) and not stage.can_resume(state.context):
+            state.stages.pop(stage.name)
+    resumed = [name for name in names if state.is_done(name)]
+    if resumed:
+        log.info(f"resuming job '{job}', skipping the finished stages {resumed}.")
+
+    # counted per run, a stage which is rerun as part of the retry of a later stage only counts its own failures
+    failures = dict.fromkeys(names, 0)
+    index = 0
+    while index < len(stages):
+        stage = stages[index]
+        if state.is_done(stage.name):
+            index += 1
+            continue
+
+        stage_state = state.stages.setdefault(stage.name, {"attempts": 0})
+        stage_state["attempts"] += 1
+        try:
+            with tracing.span(f"pipeline.{stage.name}", attempt=failures[stage.name] + 1):
+                updates = stage.run(state.context)
+        except Exception as e:
+            failures[stage.name] += 1
+            stage_state.update(status=STATUS_FAILED, error=str(e))
+            save_state(state_path, state)
+            if not isinstance(e, stage.retry.retry_on) or failures[stage.name] >= stage.retry.attempts:
+                log.error(f"stage '{stage.name}' of job '{job}' failed, the next run continues with it: {e}")
+                raise
+            retry_from = stage.retry.retry_from or stage.name
+            log.warning(
+                f"stage '{stage.name}' failed (attempt {failures[stage.name]} of {stage.retry.attempts}), "
+                f"retrying from stage '{retry_from}' in {stage.retry.delay}s: {e}"
+            )
+            index = names.index(retry_from)
+            for name in names[index:]:
+                if name != stage.name:
+                    state.stages.pop(name, None)
+            sleep(stage.retry.delay)
+            continue
+
+        state.context.update(updates or {})
+        stage_state.update(status=STATUS_DONE, error=None)
+        save_state(state_path, state)
+        index += 1
+
+    state_path.unlink(missing_ok=True)
+    return state.context
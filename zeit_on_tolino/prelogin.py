@@ -0,0 +1,82 @@
+"""Logs into the tolino webreader in a browser of its own, while the ZEIT e-paper is downloaded in the main browser.
+
+Both sites do not depend on each other until the upload, so the sync does not have to wait for the tolino login after
+the download is done.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Optional
+
+from zeit_on_tolino import blocking, instrumentation, tolino, tracing
+from zeit_on_tolino.accounts import TolinoAccount
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+log = logging.getLogger(__name__)
+
+
+class LoginCancelled(RuntimeError):
+    pass
+
+
+def is_enabled() -> bool:
+    value = os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_PARALLEL_LOGIN, "true")
+    return value.lower() not in ("0", "false", "no", "off")
+
+
+class BackgroundLogin:
+    """Creates a browser and logs it into the tolino webreader in a background thread.
+
+    Use it as a context manager: on exit, the browser is quit and an ongoing login is cancelled, e.g. if the download
+    failed in the meantime.
+    """
+
+    def __init__(self, create_webdriver: Callable[[], "WebDriver"], account: TolinoAccount) -> None:
+        self.account = account
+        self.webdriver: Optional["WebDriver"] = None
+        self._create_webdriver = create_webdriver
+        self._closed = False
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tolino-login")
+        self._future = tracing.submit(self._pool, self._login)
+
+    def __enter__(self) -> "BackgroundLogin":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _login(self) -> "WebDriver":
+        with tracing.span("tolino.background_login", account=self.account.user):
+            webdriver = self._create_webdriver()
+            with self._lock:
+                if self._closed:
+                    webdriver.quit()
+                    raise LoginCancelled("the tolino login was cancelled before it started.")
+                self.webdriver = webdriver
+            tolino._login(webdriver, self.account)
+            return webdriver
+
+    def join(self, timeout: Optional[float] = None) -> "WebDriver":
+        """The logged in browser, once the login finished. Raises the error of a failed login."""
+        with tracing.span("tolino.join_login"):
+            return self._future.result(timeout)
+
+    def close(self) -> None:
+        """Quit the browser, which aborts a login still going on, and wait for the background thread."""
+        with self._lock:
+            self._closed = True
+            webdriver, self.webdriver = self.webdriver, None
+        if webdriver is not None:
+            if not self._future.done():
+                log.info("cancelling the tolino login...")
+            else:
+                blocking.log_summary(webdriver)
+                instrumentation.log_summary(webdriver)
+            webdriver.quit()
+        self._pool.shutdown(wait=True)
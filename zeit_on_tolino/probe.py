@@ -0,0 +1,136 @@
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+from urllib.parse import urljoin, urlsplit
+
+from zeit_on_tolino import backfill, http_client, ledger, session, tracing, zeit
+from zeit_on_tolino.env_vars import get_state_dir
+
+CACHE_FILE_NAME = "probe_cache.json"
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
+
+STATUS_NEW = "new"  # a new edition is out and its EPUB can be downloaded
+STATUS_SYNCED = "synced"
+STATUS_PENDING = "pending"  # a new edition is out, but its EPUB is not available yet
+STATUS_UNKNOWN = "unknown"  # the probe could not tell, e.g. without a stored session
+
+# parses a fetched page into a JSON serializable dict, which is cached along with the validators of the response
+PageParser = Callable[[str, str], Dict[str, Any]]
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ProbeResult:
+    status: str
+    edition_date: Optional[date] = None
+    reason: Optional[str] = None
+
+
+def _load_cache(cache_path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _headers(state: session.SessionState, url: str) -> Dict[str, str]:
+    headers = {"User-Agent": USER_AGENT}
+    cookies = http_client.cookie_header(state.cookies, url)
+    if cookies:
+        headers["Cookie"] = cookies
+    return headers
+
+
+def _fetch_parsed(url: str, headers: Dict[str, str], cache: Dict[str, Any], parse: PageParser) -> Dict[str, Any]:
+    """The parsed page at `url`, only downloaded and parsed again if it was modified since it was cached."""
+    cached = cache.get(url, {})
+    page = http_client.fetch_page(url, headers, cached.get("etag"), cached.get("last_modified"))
+    if page.text is None:
+        log.info(f"{url} was not modified since the last probe.")
+        return cached["content"]
+    content = parse(page.text, url)
+    if page.etag or page.last_modified:
+        cache[url] = {"etag": page.etag, "last_modified": page.last_modified, "content": content}
+    else:
+        cache.pop(url, None)
+    return content
+
+
+def parse_overview(html: str, url: str) -> Dict[str, Any]:
+    """The URL and date of the most recent edition, empty if the page is not the one of a logged in subscriber."""
+    links = [{**link, "href": urljoin(url, link["href"])} for link in backfill.parse_links(html)]
+    edition_url = next(
+        (link["href"] for link in links if link["text"].upper() == zeit.BUTTON_TEXT_TO_RECENT_EDITION), None
+    )
+    if edition_url is None:
+        return {}
+    parts = urlsplit(url)
+    editions = backfill.parse_archive(links, f"{parts.scheme}://{parts.netloc}")
+    return {"edition_url": edition_url, "edition_date": editions[0].date.isoformat() if editions else None}
+
+
+def parse_edition(html: str, url: str) -> Dict[str, Any]:
+    try:
+        return {"epub_url": backfill.find_epub_url(html, url)}
+    except backfill.EpubNotAvailable as e:
+        return {"unavailable": str(e)}
+
+
+@tracing.traced("probe.probe")
+def probe(
+    accounts: Sequence[str],
+    url: str = zeit.ZEIT_LOGIN_URL,
+    cache_path: Optional[Path] = None,
+    ledger_path: Optional[Path] = None,
+) -> ProbeResult:
+    """Check via plain HTTP whether a new edition is out and its EPUB is ready, without starting a browser.
+
+    The requests are authenticated with the cookies of the stored ZEIT session. Pages are requested conditionally, so
+    unchanged pages are neither transferred nor parsed again.
+    """
+    state = session.load(zeit.ZEIT_SESSION)
+    if state is None:
+        return ProbeResult(STATUS_UNKNOWN, reason="no stored ZEIT session")
+
+    cache_path = cache_path or get_state_dir() / CACHE_FILE_NAME
+    cache = _load_cache(cache_path)
+    try:
+        overview = _fetch_parsed(url, _headers(state, url), cache, parse_overview)
+        if not overview:
+            return ProbeResult(STATUS_UNKNOWN, reason="the stored ZEIT session is no longer logged in")
+        edition_date = date.fromisoformat(overview["edition_date"]) if overview["edition_date"] else None
+        if edition_date is not None and ledger.is_edition_synced(edition_date, accounts, ledger_path):
+            return ProbeResult(STATUS_SYNCED, edition_date)
+        edition_url = overview["edition_url"]
+        edition = _fetch_parsed(edition_url, _headers(state, edition_url), cache, parse_edition)
+    except http_client.DownloadError as e:
+        return ProbeResult(STATUS_UNKNOWN, reason=str(e))
+    finally:
+        cache_path.write_text(json.dumps(cache))
+
+    if "epub_url" not in edition:
+        return ProbeResult(STATUS_PENDING, edition_date, reason=edition["unavailable"])
+    return ProbeResult(STATUS_NEW, edition_date)
+
+
+def log_result(result: ProbeResult) -> None:
+    edition = f"of {result.edition_date.strftime(zeit.ZEIT_DATE_FORMAT)} " if result.edition_date else ""
+    if result.status == STATUS_SYNCED:
+        log.info(f"the most recent ZEIT e-paper {edition}was already synced to your tolino cloud, nothing to do.")
+    elif result.status == STATUS_PENDING:
+        log.info(f"a new ZEIT e-paper {edition}is out, however, its EPUB is not available yet. Retry again later.")
+    elif result.status == STATUS_UNKNOWN:
+        log.info(f"could not probe for a new ZEIT e-paper ({result.reason}).")
+    else:
+        log.info(f"the ZEIT e-paper {edition}is ready for download.")
+
+
+def is_sync_needed(accounts: Sequence[str]) -> bool:
+    """Whether the browser based sync has to run, which is also the case if the probe could not tell."""
+    result = probe(accounts)
+    log_result(result)
+    return result.status in (STATUS_NEW, STATUS_UNKNOWN)
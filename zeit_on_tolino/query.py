@@ -0,0 +1,56 @@
+"""DOM lookups which take a single WebDriver round trip, however many selectors or elements they have to look at.
+
+Looking up several selectors one after another, or reading the text of every link, costs one round trip to the
+chromedriver per selector or element. Here, all of that happens in one script run by the browser.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+    from selenium.webdriver.remote.webelement import WebElement
+
+_FIRST_OF_SCRIPT = """
+    const selectors = arguments[0];
+    for (let i = 0; i < selectors.length; i++) {
+        const element = document.querySelector(selectors[i]);
+        if (element !== null) { return [i, element]; }
+    }
+    return null;
+"""
+
+# compares the rendered text like `WebElement.text` does, i.e. with CSS text transforms applied
+_BY_TEXT_SCRIPT = """
+    const [tag, text] = arguments;
+    for (const element of document.getElementsByTagName(tag)) {
+        if (element.innerText.replace(/\\s+/g, ' ').trim() === text) { return element; }
+    }
+    return null;
+"""
+
+_EXISTS_SCRIPT = "return document.querySelector(arguments[0]) !== null"
+
+
+@dataclass
+class Match:
+    selector: str
+    element: "WebElement"
+
+
+def first_of(webdriver: "WebDriver", *selectors: str) -> Optional[Match]:
+    """The element of the first of the CSS `selectors` present on the page, in the order the selectors are given."""
+    result = webdriver.execute_script(_FIRST_OF_SCRIPT, list(selectors))
+    if result is None:
+        return None
+    index, element = result
+    return Match(selectors[index], element)
+
+
+def by_text(webdriver: "WebDriver", text: str, tag: str = "a") -> Optional["WebElement"]:
+    """The first `tag` element whose visible text is `text`, e.g. a link labelled like a button."""
+    return webdriver.execute_script(_BY_TEXT_SCRIPT, tag, text)
+
+
+def exists(webdriver: "WebDriver", selector: str) -> bool:
+    return webdriver.execute_script(_EXISTS_SCRIPT, selector)
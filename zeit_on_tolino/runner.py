@@ -0,0 +1,296 @@
+import logging
+import sys
+import threading
+from dataclasses import asdict
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from zeit_on_tolino import (
+    backfill,
+    blocking,
+    diagnostics,
+    downloads,
+    fanout,
+    instrumentation,
+    ledger,
+    library,
+    optimize,
+    pipeline,
+    prelogin,
+    probe,
+    tolino,
+    tolino_cloud,
+    tracing,
+    validate,
+    wait,
+    zeit,
+)
+from zeit_on_tolino.accounts import TolinoAccount
+from zeit_on_tolino.env_vars import get_state_dir
+
+log = logging.getLogger(__name__)
+
+MAX_DOWNLOAD_ATTEMPTS = 2
+RETRY_DELAY = 5  # seconds
+PIPELINE_FILE_NAME = "pipeline.json"
+# the browser logging into tolino while the main browser downloads needs a profile of its own
+TOLINO_PROFILE_DIR = Path.home() / ".config" / "chrome-profile-tolino"
+
+STAGE_DOWNLOAD = "download"
+STAGE_VALIDATE = "validate"
+STAGE_TOLINO_LOGIN = "tolino-login"
+STAGE_UPLOAD = "upload"
+STAGE_VERIFY = "verify"
+
+_driver_setup_lock = threading.Lock()
+
+
+def setup_webdriver(profile_dir: Optional[Path] = None, download_path: Optional[Path] = None):
+    # imported here, commands which do not start a browser should not pay for importing it
+    import undetected_chromedriver as uc
+
+    options = uc.ChromeOptions()
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-dev-shm-usage")
+
+    # Add persistent profile directory
+    profile_dir = profile_dir or Path.home() / ".config" / "chrome-profile"
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    options.add_argument(f"--user-data-dir={profile_dir}")
+    options.add_argument("--profile-directory=Default")
+
+    # Set Chrome binary location for Mac
+    if sys.platform == "darwin":  # Mac OS
+        options.binary_location = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+
+    # Add language preferences
+    options.add_argument("--lang=de-DE")
+
+    # Expose the DevTools download events for tracking downloads
+    options.set_capability("goog:loggingPrefs", downloads.PERFORMANCE_LOGGING_PREFS)
+
+    # Set download directory
+    download_path = download_path or Path("downloads")
+    download_path.mkdir(parents=True, exist_ok=True)
+
+    # undetected_chromedriver patches the chromedriver binary on start, which must not happen concurrently
+    with _driver_setup_lock:
+        driver = uc.Chrome(
+            options=options,
+            version_main=133,  # Match your Chrome version
+        )
+
+    # Add download_dir_path attribute
+    setattr(driver, "download_dir_path", str(download_path.absolute()))
+    downloads.enable_download_tracking(driver, download_path.absolute())
+    blocking.enable_blocking(driver)
+    instrumentation.enable_instrumentation(driver)
+
+    return driver
+
+
+def setup_tolino_webdriver():
+    return setup_webdriver(TOLINO_PROFILE_DIR, TOLINO_PROFILE_DIR / "downloads")
+
+
+def _edition(context: Dict[str, Any]) -> ledger.Edition:
+    edition = context["edition"]
+    return ledger.Edition(**{**edition, "date": date.fromisoformat(edition["date"]) if edition["date"] else None})
+
+
+def _is_download_intact(context: Dict[str, Any]) -> bool:
+    path = Path(context.get("path", ""))
+    return path.is_file() and ledger.sha256_of(path) == context.get("file_sha256")
+
+
+def _edition_stages(
+    webdriver, accounts: List[TolinoAccount], background_login: Optional[prelogin.BackgroundLogin] = None
+) -> List[pipeline.Stage]:
+    """Download, validate and upload the most recent edition, with the login and upload retried within seconds.
+
+    With a `background_login`, the upload uses its browser once its login finished. Otherwise, or if it failed, the
+    main browser logs into tolino after the download.
+    """
+    tolino_webdriver = webdriver
+
+    def download(context: Dict[str, Any]) -> Dict[str, Any]:
+        e_paper_path = zeit.download_e_paper(webdriver)
+        if not e_paper_path.is_file():
+            raise FileNotFoundError(f"Downloaded file not found: {e_paper_path}")
+        return {"path": str(e_paper_path.absolute()), "file_sha256": ledger.sha256_of(e_paper_path)}
+
+    def check(context: Dict[str, Any]) -> Dict[str, Any]:
+        e_paper_path = Path(context["path"])
+        result = validate.validate_epub(e_paper_path)
+        if not result.ok:
+            e_paper_path.unlink()
+            raise ValueError(f"downloaded e-paper is broken: {'; '.join(result.errors)}")
+        edition = ledger.edition_from_epub(e_paper_path)
+        log.info(f"successfully finished download of '{edition.title}'")
+        if optimize.is_enabled():
+            # the edition keeps the checksum of the download, the optimized file differs with every Pillow version
+            optimize.optimize_epub(e_paper_path)
+        edition_date = edition.date.isoformat() if edition.date else None
+        return {"edition": {**asdict(edition), "date": edition_date}, "file_sha256": ledger.sha256_of(e_paper_path)}
+
+    def is_uploaded(context: Dict[str, Any]) -> bool:
+        return all(ledger.is_uploaded(_edition(context), account.user) for account in accounts)
+
+    def login(context: Dict[str, Any]) -> None:
+        nonlocal background_login, tolino_webdriver
+        if is_uploaded(context):
+            return
+        if background_login is not None:
+            # joined once only, a retry logs in again with the browser of a successful or the main one of a failed login
+            pending, background_login = background_login, None
+            tolino_webdriver = pending.join()
+            return
+        tolino._login(tolino_webdriver, accounts[0])
+
+    def upload(context: Dict[str, Any]) -> None:
+        edition = _edition(context)
+        if is_uploaded(context):
+            log.info(f"'{edition.title}' was already uploaded to your tolino cloud, skipping upload.")
+            return
+        if len(accounts) > 1:
+            results = fanout.upload_to_accounts(setup_webdriver, Path(context["path"]), edition, accounts)
+            fanout.log_results(results)
+            failed = [r.account for r in results if r.status == fanout.STATUS_FAILED]
+            if failed:
+                raise RuntimeError(f"upload to {len(failed)} of {len(accounts)} tolino accounts failed: {failed}")
+            return
+        log.info("upload ZEIT e-paper to tolino cloud...")
+        tolino._upload(tolino_webdriver, Path(context["path"]), edition.title)
+
+    def verify(context: Dict[str, Any]) -> None:
+        edition = _edition(context)
+        if is_uploaded(context):
+            return
+        credentials = tolino_cloud.get_credentials(tolino_webdriver, tolino.TOLINO_SESSION.indexed_db)
+        if not library.contains_title(tolino_webdriver, edition.title, credentials, refresh=True):
+            raise RuntimeError(f"'{edition.title}' is not in the tolino library after the upload.")
+        ledger.record_upload(edition, accounts[0].user)
+
+    stages = [
+        pipeline.Stage(STAGE_DOWNLOAD, download, can_resume=_is_download_intact),
+        pipeline.Stage(
+            STAGE_VALIDATE,
+            check,
+            pipeline.RetryPolicy(attempts=MAX_DOWNLOAD_ATTEMPTS, retry_from=STAGE_DOWNLOAD, retry_on=(ValueError,)),
+            can_resume=_is_download_intact,
+        ),
+    ]
+    if len(accounts) > 1:
+        # every account is logged in, uploaded to and verified in its own browser, accounts already done are skipped
+        return stages + [pipeline.Stage(STAGE_UPLOAD, upload, pipeline.RetryPolicy(attempts=2, delay=RETRY_DELAY))]
+    return stages + [
+        pipeline.Stage(
+            STAGE_TOLINO_LOGIN, login, pipeline.RetryPolicy(attempts=2, delay=RETRY_DELAY), can_resume=lambda c: False
+        ),
+        pipeline.Stage(
+            STAGE_UPLOAD, upload, pipeline.RetryPolicy(attempts=3, delay=RETRY_DELAY, retry_from=STAGE_TOLINO_LOGIN)
+        ),
+        pipeline.Stage(STAGE_VERIFY, verify, pipeline.RetryPolicy(attempts=2, delay=RETRY_DELAY)),
+    ]
+
+
+def sync_edition(
+    webdriver,
+    accounts: List[TolinoAccount],
+    state_path: Optional[Path] = None,
+    create_tolino_webdriver: Optional[Callable] = None,
+    today: Optional[date] = None,
+) -> ledger.Edition:
+    """Sync the most recent edition, continuing where a failed previous run stopped.
+
+    A failed run is only continued within the release window it started in, a later run syncs the edition released
+    since. With `create_tolino_webdriver`, a single tolino account is logged into in a second browser during the
+    download.
+    """
+    release_day, _ = ledger.current_release_window(today or date.today())
+    users = ",".join(sorted(account.user.lower() for account in accounts))
+    job = f"sync-edition:{release_day.isoformat()}:{users}"
+    state_path = state_path or get_state_dir() / PIPELINE_FILE_NAME
+    if create_tolino_webdriver is None or len(accounts) > 1:
+        return _edition(pipeline.run_pipeline(job, _edition_stages(webdriver, accounts), state_path))
+
+    log.info("logging into tolino in a second browser meanwhile...")
+    with prelogin.BackgroundLogin(create_tolino_webdriver, accounts[0]) as background_login:
+        return _edition(pipeline.run_pipeline(job, _edition_stages(webdriver, accounts, background_login), state_path))
+
+
+def upload_edition(webdriver, e_paper_path: Path, edition: ledger.Edition, accounts) -> None:
+    e_paper_title = edition.title
+    if optimize.is_enabled():
+        # the edition keeps the checksum of the download, the optimized file differs with every Pillow version
+        optimize.optimize_epub(e_paper_path)
+    if len(accounts) > 1:
+        results = fanout.upload_to_accounts(setup_webdriver, e_paper_path, edition, accounts)
+        fanout.log_results(results)
+        failed = [r.account for r in results if r.status == fanout.STATUS_FAILED]
+        if failed:
+            raise RuntimeError(f"upload to {len(failed)} of {len(accounts)} tolino accounts failed: {failed}")
+    elif ledger.is_uploaded(edition, accounts[0].user):
+        log.info(f"'{e_paper_title}' was already uploaded to your tolino cloud, skipping upload.")
+    else:
+        log.info("upload ZEIT e-paper to tolino cloud...")
+        tolino.login_and_upload(webdriver, e_paper_path, e_paper_title, accounts[0])
+        ledger.record_upload(edition, accounts[0].user)
+
+
+def report_run(webdriver=None) -> None:
+    diagnostics.flush()
+    if webdriver is not None:
+        blocking.log_summary(webdriver)
+        instrumentation.log_summary(webdriver)
+        instrumentation.export_report(webdriver)
+    wait.log_summary()
+    tracing.log_summary()
+    tracing.export_timeline()
+
+
+def run_sync(
+    webdriver,
+    accounts: List[TolinoAccount],
+    backfill_editions: bool = False,
+    since: Optional[date] = None,
+    create_tolino_webdriver: Optional[Callable] = None,
+) -> Dict[str, Any]:
+    """Download and upload the most recent or all missed editions with an already running browser.
+
+    See `sync_edition` for `create_tolino_webdriver`.
+    """
+    if backfill_editions:
+        log.info("backfilling missed ZEIT e-papers...")
+        results = backfill.backfill(
+            webdriver,
+            [account.user for account in accounts],
+            lambda path, edition: upload_edition(webdriver, path, edition, accounts),
+            since=since,
+        )
+        backfill.log_results(results)
+        failed = [r.date.isoformat() for r in results if r.status == backfill.STATUS_FAILED]
+        if failed:
+            raise RuntimeError(f"backfilling the editions of {failed} failed.")
+        return {"synced": [r.date.isoformat() for r in results if r.status == backfill.STATUS_SYNCED]}
+
+    log.info("syncing most recent ZEIT e-paper...")
+    edition = sync_edition(webdriver, accounts, create_tolino_webdriver=create_tolino_webdriver)
+    return {"synced": [edition.title]}
+
+
+def run_daemon_job(webdriver, accounts: List[TolinoAccount], job: Dict[str, Any]) -> Dict[str, Any]:
+    tracing.reset()
+    wait.reset_records()
+    backfill_editions = bool(job.get("backfill"))
+    users = [account.user for account in accounts]
+    if not backfill_editions and (ledger.is_up_to_date(users) or not probe.is_sync_needed(users)):
+        return {"synced": []}
+    try:
+        since = date.fromisoformat(job["since"]) if job.get("since") else None
+        return run_sync(webdriver, accounts, backfill_editions, since)
+    finally:
+        report_run(webdriver)
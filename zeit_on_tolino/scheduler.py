@@ -0,0 +1,105 @@
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Sequence
+
+from zeit_on_tolino import ledger, probe, zeit
+from zeit_on_tolino.env_vars import OptionalEnvVars
+
+log = logging.getLogger(__name__)
+
+# how often the browser checks for the EPUB while polling, if the probe cannot tell
+BROWSER_CHECK_INTERVAL = 60 * 60.0  # seconds
+
+
+@dataclass(frozen=True)
+class Backoff:
+    """Exponentially growing delays, each randomly shortened or extended by up to `jitter` of its length."""
+
+    initial: float = 60.0  # seconds
+    maximum: float = 15 * 60.0
+    factor: float = 2.0
+    jitter: float = 0.25
+
+    def delays(self) -> Iterator[float]:
+        delay = self.initial
+        while True:
+            yield delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            delay = min(delay * self.factor, self.maximum)
+
+
+def poll(
+    attempt: Callable[[], bool],
+    deadline: float,
+    backoff: Backoff = Backoff(),
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.time,
+) -> bool:
+    """Call `attempt` until it returns True, with growing pauses in between. False if `deadline` passed before."""
+    for delay in backoff.delays():
+        if attempt():
+            return True
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return False
+        delay = min(delay, remaining)
+        log.info(f"trying again in {delay:.0f}s...")
+        sleep(delay)
+    return False
+
+
+def sync_when_released(
+    accounts: Sequence[str],
+    run_sync: Callable[[], None],
+    deadline: float,
+    backoff: Backoff = Backoff(),
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.time,
+) -> bool:
+    """Wait for the EPUB of the current release and sync it via `run_sync` as soon as it is available.
+
+    The ZEIT is polled via plain HTTP. Only if the probe cannot tell, e.g. without a stored session, the browser based
+    `run_sync` is used to check for the EPUB, at most every `BROWSER_CHECK_INTERVAL` seconds. A failing `run_sync` is
+    retried like a pending EPUB, its error is raised if it still failed at `deadline`. False if the current release was
+    not synced until `deadline`.
+    """
+    last_browser_check: Optional[float] = None
+    last_error: Optional[Exception] = None
+
+    def attempt() -> bool:
+        nonlocal last_browser_check, last_error
+        last_error = None
+        if ledger.is_up_to_date(accounts):
+            return True
+        result = probe.probe(accounts)
+        probe.log_result(result)
+        if result.status in (probe.STATUS_SYNCED, probe.STATUS_PENDING):
+            # synced refers to the previous edition here, as the current release is not in the ledger yet
+            return False
+        if result.status == probe.STATUS_UNKNOWN:
+            if last_browser_check is not None and clock() - last_browser_check < BROWSER_CHECK_INTERVAL:
+                log.info(
+                    f"the browser checked for the EPUB less than {BROWSER_CHECK_INTERVAL / 60:.0f} minutes ago, not "
+                    f"starting it yet. Set '{OptionalEnvVars.ZEIT_ON_TOLINO_SESSION_KEY}' to store the ZEIT session, "
+                    "which lets the probe check for the EPUB without a browser."
+                )
+                return False
+            last_browser_check = clock()
+        try:
+            run_sync()
+        except zeit.EpubNotReady as e:
+            log.info(str(e))
+            return False
+        except Exception as e:
+            log.warning(f"the sync failed, trying again later: {e!r}")
+            last_error = e
+            return False
+        # without a stored session, the previous edition may have been downloaded once more
+        return ledger.is_up_to_date(accounts)
+
+    if poll(attempt, deadline, backoff, sleep, clock):
+        return True
+    if last_error is not None:
+        raise last_error
+    return False
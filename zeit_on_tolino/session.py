@@ -0,0 +1,262 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from zeit_on_tolino.env_vars import OptionalEnvVars, get_state_dir
+
+if TYPE_CHECKING:  # stored sessions are also read without a browser
+    from selenium.webdriver.firefox.webdriver import WebDriver
+
+SALT_SIZE = 16
+KEY_DERIVATION_ITERATIONS = 200_000
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Site:
+    name: str
+    origin: str
+    cookie_domains: Tuple[str, ...]
+    indexed_db: Optional[str] = None
+
+
+@dataclass
+class SessionState:
+    origin: str
+    saved_at: float
+    cookies: List[Dict[str, Any]] = field(default_factory=list)
+    local_storage: Dict[str, str] = field(default_factory=dict)
+    # object store name -> {"key_path": ..., "auto_increment": ..., "items": [{"key": ..., "value": ...}]}
+    indexed_db: Dict[str, Any] = field(default_factory=dict)
+    indexed_db_version: Optional[int] = None
+
+
+_CAPTURE_STORAGE_SCRIPT = """
+    const dbName = arguments[0];
+    const done = arguments[arguments.length - 1];
+    const localItems = {};
+    for (let i = 0; i < localStorage.length; i++) {
+        const key = localStorage.key(i);
+        localItems[key] = localStorage.getItem(key);
+    }
+    if (!dbName) {
+        done({local_storage: localItems, indexed_db: {}, version: null});
+        return;
+    }
+    const request = window.indexedDB.open(dbName);
+    request.onerror = () => done({local_storage: localItems, indexed_db: {}, version: null});
+    request.onsuccess = (event) => {
+        const db = event.target.result;
+        const stores = Array.from(db.objectStoreNames);
+        const result = {};
+        if (stores.length === 0) {
+            done({local_storage: localItems, indexed_db: result, version: db.version});
+            return;
+        }
+        let completed = 0;
+        stores.forEach(storeName => {
+            const store = db.transaction(storeName, 'readonly').objectStore(storeName);
+            const items = [];
+            store.openCursor().onsuccess = (event) => {
+                const cursor = event.target.result;
+                if (cursor) {
+                    items.push({key: cursor.key, value: cursor.value});
+                    cursor.continue();
+                } else {
+                    result[storeName] = {key_path: store.keyPath, auto_increment: store.autoIncrement, items: items};
+                    completed++;
+                    if (completed === stores.length) {
+                        done({local_storage: localItems, indexed_db: result, version: db.version});
+                    }
+                }
+            };
+        });
+    };
+"""
+
+# runs before any script of the page, only fills in what is not present yet
+_RESTORE_STORAGE_SCRIPT = """
+(() => {
+    const state = %s;
+    if (window.location.origin !== state.origin) { return; }
+    for (const [key, value] of Object.entries(state.local_storage)) {
+        if (localStorage.getItem(key) === null) { localStorage.setItem(key, value); }
+    }
+    if (!state.db_name || Object.keys(state.indexed_db).length === 0) { return; }
+    const request = state.version ? indexedDB.open(state.db_name, state.version) : indexedDB.open(state.db_name);
+    request.onupgradeneeded = (event) => {
+        const db = event.target.result;
+        for (const [storeName, store] of Object.entries(state.indexed_db)) {
+            if (!db.objectStoreNames.contains(storeName)) {
+                db.createObjectStore(storeName, {keyPath: store.key_path, autoIncrement: store.auto_increment});
+            }
+        }
+    };
+    request.onsuccess = (event) => {
+        const db = event.target.result;
+        for (const [storeName, store] of Object.entries(state.indexed_db)) {
+            if (!db.objectStoreNames.contains(storeName)) { continue; }
+            const objectStore = db.transaction(storeName, 'readwrite').objectStore(storeName);
+            objectStore.count().onsuccess = (countEvent) => {
+                if (countEvent.target.result > 0) { return; }
+                for (const item of store.items) {
+                    if (store.key_path === null) {
+                        objectStore.put(item.value, item.key);
+                    } else {
+                        objectStore.put(item.value);
+                    }
+                }
+            };
+        }
+    };
+})();
+"""
+
+
+def _get_passphrase() -> Optional[str]:
+    return os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_SESSION_KEY) or None
+
+
+def _derive_key(passphrase: str, salt: bytes) -> bytes:
+    key = hashlib.pbkdf2_hmac("sha256", passphrase.encode(), salt, KEY_DERIVATION_ITERATIONS)
+    return base64.urlsafe_b64encode(key)
+
+
+def encrypt(data: bytes, passphrase: str) -> bytes:
+    salt = os.urandom(SALT_SIZE)
+    return salt + Fernet(_derive_key(passphrase, salt)).encrypt(data)
+
+
+def decrypt(data: bytes, passphrase: str) -> bytes:
+    salt, token = data[:SALT_SIZE], data[SALT_SIZE:]
+    return Fernet(_derive_key(passphrase, salt)).decrypt(token)
+
+
+def get_session_path(site: Site) -> Path:
+    session_dir = get_state_dir() / "sessions"
+    session_dir.mkdir(parents=True, exist_ok=True)
+    return session_dir / f"{site.name}.session"
+
+
+def _is_site_cookie(cookie: Dict[str, Any], site: Site) -> bool:
+    domain = cookie.get("domain", "").lstrip(".")
+    return any(domain == d or domain.endswith(f".{d}") for d in site.cookie_domains)
+
+
+def read_storage(webdriver: "WebDriver", indexed_db: Optional[str]) -> Dict[str, Any]:
+    """Read localStorage and the IndexedDB `indexed_db` of the current page in a single round trip."""
+    return webdriver.execute_async_script(_CAPTURE_STORAGE_SCRIPT, indexed_db)
+
+
+def capture(webdriver: "WebDriver", site: Site) -> SessionState:
+    """Read the state of the currently opened page of `site`, the driver needs to be on the site's origin."""
+    cookies = webdriver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+    storage = read_storage(webdriver, site.indexed_db)
+    return SessionState(
+        origin=site.origin,
+        saved_at=time.time(),
+        cookies=[c for c in cookies if _is_site_cookie(c, site)],
+        local_storage=storage["local_storage"] or {},
+        indexed_db=storage["indexed_db"] or {},
+        indexed_db_version=storage["version"],
+    )
+
+
+def save(webdriver: "WebDriver", site: Site) -> Optional[Path]:
+    passphrase = _get_passphrase()
+    if passphrase is None:
+        log.info(f"not storing {site.name} session, '{OptionalEnvVars.ZEIT_ON_TOLINO_SESSION_KEY}' is not set.")
+        return None
+
+    try:
+        state = capture(webdriver, site)
+    except Exception as e:
+        log.warning(f"could not capture {site.name} session: {e}")
+        return None
+
+    path = get_session_path(site)
+    path.write_bytes(encrypt(json.dumps(asdict(state)).encode(), passphrase))
+    path.chmod(0o600)
+    log.info(f"stored {site.name} session with {len(state.cookies)} cookies to {path}")
+    return path
+
+
+def load(site: Site) -> Optional[SessionState]:
+    passphrase = _get_passphrase()
+    path = get_session_path(site)
+    if passphrase is None or not path.is_file():
+        return None
+
+    try:
+        return SessionState(**json.loads(decrypt(path.read_bytes(), passphrase)))
+    except (InvalidToken, ValueError, TypeError) as e:
+        log.warning(f"ignoring stored {site.name} session which could not be read: {e!r}")
+        return None
+
+
+def _to_cdp_cookie(cookie: Dict[str, Any]) -> Dict[str, Any]:
+    cdp_cookie = {k: cookie[k] for k in ("name", "value", "domain", "path", "secure", "httpOnly") if k in cookie}
+    expires = cookie.get("expires", cookie.get("expiry"))
+    if expires is not None and expires > 0:
+        cdp_cookie["expires"] = expires
+    if cookie.get("sameSite") in ("Strict", "Lax", "None"):
+        cdp_cookie["sameSite"] = cookie["sameSite"]
+    return cdp_cookie
+
+
+def restore(webdriver: "WebDriver", site: Site) -> bool:
+    """Restore a stored session of `site` into the driver, call this before navigating to the site."""
+    state = load(site)
+    if state is None:
+        return False
+
+    script_state = {
+        "origin": state.origin,
+        "local_storage": state.local_storage,
+        "db_name": site.indexed_db,
+        "indexed_db": state.indexed_db,
+        "version": state.indexed_db_version,
+    }
+    script = _RESTORE_STORAGE_SCRIPT % json.dumps(script_state)
+    try:
+        webdriver.execute_cdp_cmd("Network.setCookies", {"cookies": [_to_cdp_cookie(c) for c in state.cookies]})
+        script_id = webdriver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": script})
+    except Exception as e:
+        log.warning(f"could not restore stored {site.name} session: {e}")
+        return False
+    restore_script_ids = getattr(webdriver, "restore_script_ids", {})
+    restore_script_ids[site.name] = script_id["identifier"]
+    setattr(webdriver, "restore_script_ids", restore_script_ids)
+
+    age_hours = (time.time() - state.saved_at) / 3600
+    log.info(f"restored {site.name} session stored {age_hours:.1f} hours ago with {len(state.cookies)} cookies")
+    return True
+
+
+def finish_restore(webdriver: "WebDriver", site: Site) -> None:
+    """Stop injecting the stored storage state into pages of `site`, once it was validated or rejected."""
+    script_id = getattr(webdriver, "restore_script_ids", {}).pop(site.name, None)
+    if script_id is not None:
+        webdriver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script_id})
+
+
+def discard(webdriver: "WebDriver", site: Site) -> None:
+    """Forget an invalid stored session and remove its restored state from the driver."""
+    finish_restore(webdriver, site)
+    webdriver.execute_cdp_cmd(
+        "Storage.clearDataForOrigin", {"origin": site.origin, "storageTypes": "local_storage,indexeddb"}
+    )
+    state = load(site)
+    for cookie in state.cookies if state else []:
+        webdriver.execute_cdp_cmd("Network.deleteCookies", {"name": cookie["name"], "domain": cookie["domain"]})
+    get_session_path(site).unlink(missing_ok=True)
+    log.info(f"discarded stored {site.name} session as it is no longer valid.")
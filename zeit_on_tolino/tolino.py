@@ -1,316 +1,206 @@
+import dataclasses
+import hashlib
 import logging
 import os
 import time
 from pathlib import Path
-from typing import Tuple
+from typing import Optional
 
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.webdriver import WebDriver
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.action_chains import ActionChains
-import random
 
-from zeit_on_tolino.env_vars import EnvVars, MissingEnvironmentVariable
-from zeit_on_tolino.tolino_partner import PartnerDetails
+from zeit_on_tolino import diagnostics, library, query, session, tolino_cloud, tolino_partner, tracing, wait
+from zeit_on_tolino.accounts import TolinoAccount, get_credentials
+from zeit_on_tolino.env_vars import EnvVars, OptionalEnvVars
 from zeit_on_tolino.web import Delay
 
 TOLINO_CLOUD_LOGIN_URL = "https://webreader.mytolino.com/"
-TOLINO_COUNTRY_TO_SELECT = "Deutschland"  # TODO make country a partner shop detail depending on selected partner shop
+
+TOLINO_SESSION = session.Site(
+    name="tolino",
+    origin="https://webreader.mytolino.com",
+    cookie_domains=("mytolino.com", "mytolino.de", "pageplace.de", "thalia.de", "hugendubel.de", "buecher.de"),
+    indexed_db="tolino-user",
+)
 
 BUTTON_PLEASE_SELECT_YOUR_COUNTRY = "Bitte wähle Dein Land aus"
 BUTTON_LOGIN = "Anmelden"
 BUTTON_UPLOAD = "Hochladen"
 
+# elements only shown to a logged in user, respectively the first step of the login
+LOGGED_IN_SELECTORS = (
+    'span[data-test-id="library-drawer-labelLoggedIn"]',
+    'span[data-test-id="library-drawer-MyBooks"]',
+    'div[data-test-id="library-headerBar-overflowMenu-button"]',
+)
+COUNTRY_SELECTOR_CSS = 'div[data-test-id="countrySelector"]'
+LOGIN_FORM_EMAIL_CSS = 'input[data-test-id="email"]'
+LOGIN_STATE_LOGGED_IN = "logged in"
+LOGIN_STATE_LOGGED_OUT = "logged out"
+
+UPLOAD_MODE_API = "api"
+UPLOAD_MODE_BROWSER = "browser"
+
+VERIFY_ATTEMPTS = 5
+VERIFY_DELAY = Delay.small
+
 
 log = logging.getLogger(__name__)
 
 
-def _get_credentials() -> Tuple[str, str, str]:
-    try:
-        username = os.environ[EnvVars.TOLINO_USER]
-        password = os.environ[EnvVars.TOLINO_PASSWORD]
-        partner_shop = os.environ[EnvVars.TOLINO_PARTNER_SHOP].lower()
-        return username, password, partner_shop
-    except KeyError:
-        raise MissingEnvironmentVariable(
-            f"Ensure to export your tolino username, password and partner shop as environment variables "
-            f"'{EnvVars.TOLINO_USER}', '{EnvVars.TOLINO_PASSWORD}' and '{EnvVars.TOLINO_PARTNER_SHOP}'. "
-            f"For Github Actions, use repository secrets."
-        )
+def get_session_site(user: str) -> session.Site:
+    """The stored session of a tolino account. Sessions are kept per account, so they do not overwrite each other."""
+    user_hash = hashlib.sha256(user.strip().lower().encode()).hexdigest()[:16]
+    return dataclasses.replace(TOLINO_SESSION, name=f"{TOLINO_SESSION.name}_{user_hash}")
+
+
+def _select_partner_shop(webdriver: WebDriver, partner_shop: str, shop: tolino_partner.ShopDetails) -> None:
+    """Click through the country and partner shop selection of the webreader to the login form of the shop."""
+    # Try to find the country selector
+    log.info("Looking for country selector...")
+    country_selector = WebDriverWait(webdriver, Delay.medium).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, COUNTRY_SELECTOR_CSS))
+    )
+    log.info("Found country selector, clicking...")
+    country_selector.click()
+    country_option = (By.XPATH, f"//div[contains(text(), '{shop.country}')]")
+    wait.wait_for(
+        webdriver, "tolino country list opened", Delay.small, wait.element_stable(country_option), replaces_sleep=True
+    )
+
+    log.info(f"Looking for country option '{shop.country}'...")
+    option = WebDriverWait(webdriver, Delay.medium).until(EC.presence_of_element_located(country_option))
+    log.info("Found country option, clicking...")
+    option.click()
+    partner_shop_option = (By.CSS_SELECTOR, f'div[data-test-id="partnerShop-{partner_shop}"]')
+    wait.wait_for(
+        webdriver,
+        "tolino partner shops listed",
+        Delay.small,
+        wait.element_stable(partner_shop_option),
+        replaces_sleep=True,
+    )
+
+    # Wait for and click the partner shop
+    log.info(f"Looking for partner shop: {partner_shop}...")
+    partner_selector = WebDriverWait(webdriver, Delay.medium).until(EC.presence_of_element_located(partner_shop_option))
+    log.info("Found partner shop, clicking...")
+    partner_selector.click()
+    wait.wait_for(
+        webdriver, "tolino partner shop login page loaded", Delay.small, wait.document_ready, replaces_sleep=True
+    )
+
+
+@tracing.traced("tolino.open_shop_login")
+def _open_shop_login(webdriver: WebDriver, login_url: str) -> bool:
+    """Open the login form of the partner shop directly. False if it did not show up, e.g. as the URL expired."""
+    log.info(f"opening the partner shop login at {login_url}...")
+    webdriver.get(login_url)
+    login_form = (By.CSS_SELECTOR, LOGIN_FORM_EMAIL_CSS)
+    if wait.wait_for(webdriver, "tolino partner shop login form", Delay.medium, wait.element_present(login_form)):
+        return True
+    log.info("the partner shop login form did not show up, selecting the partner shop in the webreader instead.")
+    webdriver.get(TOLINO_CLOUD_LOGIN_URL)
+    wait.wait_for(webdriver, "tolino webreader reloaded", Delay.large, wait.network_idle())
+    return False
+
+
+def _submit_login(webdriver: WebDriver, username: str, password: str) -> str:
+    """Fill in and submit the login form of the partner shop. Returns the URL of the login form."""
+    # Wait for login form
+    log.info("Looking for login form...")
+    username_field = WebDriverWait(webdriver, Delay.medium).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, LOGIN_FORM_EMAIL_CSS))
+    )
+    login_url = webdriver.current_url
+    password_field = webdriver.find_element(By.CSS_SELECTOR, 'input[data-test-id="password"]')
 
+    # Fill in credentials
+    log.info("Entering credentials...")
+    username_field.send_keys(username)
+    password_field.send_keys(password)
 
-def _get_all_cookies(webdriver: WebDriver) -> list:
-    """Get all cookies from all domains we care about"""
-    all_cookies = []
-    
-    # First get cookies from current domain
-    all_cookies.extend(webdriver.get_cookies())
-    
-    # Then explicitly check thalia.de domain
-    webdriver.get("https://www.thalia.de")
-    time.sleep(Delay.small)
-    all_cookies.extend(webdriver.get_cookies())
-    
-    return all_cookies
-
-
-def _log_storage(webdriver: WebDriver, location: str) -> None:
-    """Helper function to log cookies, local storage, session storage, and IndexedDB at a specific location"""
-    log.info(f"\n\n===== TOLINO STORAGE AT: {location} =====")
-    current_url = webdriver.current_url
-    log.info(f"Current URL: {current_url}")
-    
-    # Log cookies with special attention to OAUTH-JSESSIONID
-    cookies = _get_all_cookies(webdriver)
-    if not cookies:
-        log.info("No cookies found!")
-    else:
-        log.info("=== Cookies ===")
-        oauth_cookie = None
-        for cookie in cookies:
-            if cookie['name'] == 'OAUTH-JSESSIONID':
-                oauth_cookie = cookie
-            log.info(f"""
-Cookie details for {cookie['name']}:
-  Name: {cookie['name']}
-  Value: {cookie['value']}
-  Domain: {cookie.get('domain', 'N/A')}
-  Path: {cookie.get('path', 'N/A')}
-  Secure: {cookie.get('secure', False)}
-  HttpOnly: {cookie.get('httpOnly', False)}
-  Expiry: {cookie.get('expiry', 'N/A')}
-----------------------------------------""")
-        if oauth_cookie:
-            log.info("\n!!! FOUND OAUTH-JSESSIONID COOKIE !!!")
-            log.info(f"Domain: {oauth_cookie.get('domain', 'N/A')}")
-            log.info(f"Value: {oauth_cookie['value']}")
-    
-    # Return to original URL if we navigated away
-    if webdriver.current_url != current_url:
-        webdriver.get(current_url)
-        time.sleep(Delay.small)
-    
-    # Log local storage
-    log.info("\n=== Local Storage ===")
-    local_storage = webdriver.execute_script("""
-        let items = {};
-        for (let i = 0; i < localStorage.length; i++) {
-            const key = localStorage.key(i);
-            items[key] = localStorage.getItem(key);
-        }
-        return items;
-    """)
-    if not local_storage:
-        log.info("No local storage items found!")
-    else:
-        for key, value in local_storage.items():
-            log.info(f"Key: {key}")
-            log.info(f"Value: {value[:200]}..." if len(str(value)) > 200 else f"Value: {value}")
-            log.info("----------------------------------------")
-    
-    # Log session storage
-    log.info("\n=== Session Storage ===")
-    session_storage = webdriver.execute_script("""
-        let items = {};
-        for (let i = 0; i < sessionStorage.length; i++) {
-            const key = sessionStorage.key(i);
-            items[key] = sessionStorage.getItem(key);
-        }
-        return items;
-    """)
-    if not session_storage:
-        log.info("No session storage items found!")
-    else:
-        for key, value in session_storage.items():
-            log.info(f"Key: {key}")
-            log.info(f"Value: {value[:200]}..." if len(str(value)) > 200 else f"Value: {value}")
-            log.info("----------------------------------------")
-            
-    # Log IndexedDB contents with focus on tolino-related stores
-    log.info("\n=== IndexedDB ===")
-    indexed_db = webdriver.execute_script("""
-        return new Promise((resolve, reject) => {
-            const databases = {};
-            const request = window.indexedDB.open('tolino-user');
-            
-            request.onerror = () => {
-                resolve({'error': 'Could not open tolino-user IndexedDB'});
-            };
-            
-            request.onsuccess = (event) => {
-                const db = event.target.result;
-                const stores = Array.from(db.objectStoreNames);
-                let completed = 0;
-                
-                if (stores.length === 0) {
-                    resolve({'info': 'No object stores found in tolino-user'});
-                    return;
-                }
-                
-                stores.forEach(storeName => {
-                    const transaction = db.transaction(storeName, 'readonly');
-                    const store = transaction.objectStore(storeName);
-                    const items = [];
-                    
-                    store.openCursor().onsuccess = (event) => {
-                        const cursor = event.target.result;
-                        if (cursor) {
-                            items.push({
-                                key: cursor.key,
-                                value: cursor.value
-                            });
-                            cursor.continue();
-                        } else {
-                            databases[storeName] = items;
-                            completed++;
-                            if (completed === stores.length) {
-                                resolve(databases);
-                            }
-                        }
-                    };
-                });
-            };
-        });
-    """)
-    
-    if indexed_db:
-        if isinstance(indexed_db, dict):
-            for store_name, items in indexed_db.items():
-                if store_name == 'error':
-                    log.info(f"IndexedDB error: {items}")
-                    continue
-                if store_name == 'info':
-                    log.info(items)
-                    continue
-                log.info(f"\nStore: {store_name}")
-                for item in items:
-                    log.info(f"Key: {item['key']}")
-                    value = str(item['value'])
-                    log.info(f"Value: {value[:200]}..." if len(value) > 200 else f"Value: {value}")
-                    log.info("----------------------------------------")
-    else:
-        log.info("No IndexedDB data found!")
-        
-    # Also try to list all IndexedDB databases
-    log.info("\n=== All IndexedDB Databases ===")
-    all_dbs = webdriver.execute_script("""
-        return window.indexedDB.databases().then(dbs => {
-            return dbs.map(db => ({ name: db.name, version: db.version }));
-        }).catch(err => ({ error: 'Could not list databases' }));
-    """)
-    if isinstance(all_dbs, list):
-        for db in all_dbs:
-            log.info(f"Database: {db['name']}, Version: {db['version']}")
-    else:
-        log.info("Could not list IndexedDB databases")
-
-
-def _login(webdriver: WebDriver) -> None:
+    # Click login button
+    log.info("Clicking login button...")
+    login_button = webdriver.find_element(By.CSS_SELECTOR, 'button[data-test-id="submit"]')
+    login_button.click()
+
+    # Wait for successful login
+    log.info("Waiting for successful login...")
+    WebDriverWait(webdriver, Delay.large).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, 'span[data-test-id="library-drawer-labelLoggedIn"]'))
+    )
+    wait.wait_for(webdriver, "tolino library loaded after login", Delay.medium, wait.network_idle(), replaces_sleep=True)
+    return login_url
+
+
+@tracing.traced("tolino.login")
+def _login(webdriver: WebDriver, account: Optional[TolinoAccount] = None) -> None:
     try:
         log.info("Starting Tolino login process...")
-        
+        site = get_session_site(account.user if account else os.environ.get(EnvVars.TOLINO_USER, ""))
+
         # Navigate to Tolino and wait for page load
+        session_restored = session.restore(webdriver, site)
         webdriver.get(TOLINO_CLOUD_LOGIN_URL)
-        time.sleep(Delay.large)
+        wait.wait_for(webdriver, "tolino webreader loaded", Delay.large, wait.network_idle(), replaces_sleep=True)
         log.info(f"Current URL: {webdriver.current_url}")
-        
-        # Wait for page to be fully loaded
-        try:
-            WebDriverWait(webdriver, Delay.large).until(
-                lambda d: d.execute_script('return document.readyState') == 'complete'
-            )
-            log.info("Page fully loaded")
-        except Exception as e:
-            log.error(f"Page did not finish loading: {e}")
-            raise
-            
-        # First check if we're already logged in by looking for elements that only appear when logged in
-        try:
-            # Try to find any of these elements that indicate we're logged in
-            selectors = [
-                'span[data-test-id="library-drawer-labelLoggedIn"]',
-                'span[data-test-id="library-drawer-MyBooks"]',
-                'div[data-test-id="library-headerBar-overflowMenu-button"]'
-            ]
-            
-            for selector in selectors:
-                try:
-                    element = WebDriverWait(webdriver, Delay.small).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    log.info(f"Found logged-in indicator: {selector}")
-                    log.info("Already logged into Tolino")
-                    _log_storage(webdriver, "ALREADY LOGGED IN")
-                    return
-                except Exception:
-                    continue
-                    
-            log.info("No logged-in indicators found, proceeding with login...")
-        except Exception as e:
-            log.info(f"Error checking login state: {e}, proceeding with login...")
-        
-        # If we get here, we need to log in
-        username, password, partner_shop = _get_credentials()
-        
-        # Try to find the country selector
-        log.info("Looking for country selector...")
-        country_selector = WebDriverWait(webdriver, Delay.medium).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-test-id="countrySelector"]'))
-        )
-        log.info("Found country selector, clicking...")
-        country_selector.click()
-        time.sleep(Delay.small)
-        
-        # Select Germany
-        log.info("Looking for Germany option...")
-        germany_option = WebDriverWait(webdriver, Delay.medium).until(
-            EC.presence_of_element_located((By.XPATH, f"//div[contains(text(), '{TOLINO_COUNTRY_TO_SELECT}')]"))
-        )
-        log.info("Found Germany option, clicking...")
-        germany_option.click()
-        time.sleep(Delay.small)
-        
-        # Wait for and click the partner shop
-        log.info(f"Looking for partner shop: {partner_shop}...")
-        partner_selector = WebDriverWait(webdriver, Delay.medium).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, f'div[data-test-id="partnerShop-{partner_shop}"]'))
-        )
-        log.info("Found partner shop, clicking...")
-        partner_selector.click()
-        time.sleep(Delay.small)
-        
-        # Wait for login form
-        log.info("Looking for login form...")
-        username_field = WebDriverWait(webdriver, Delay.medium).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'input[data-test-id="email"]'))
-        )
-        password_field = webdriver.find_element(By.CSS_SELECTOR, 'input[data-test-id="password"]')
-        
-        # Fill in credentials
-        log.info("Entering credentials...")
-        username_field.send_keys(username)
-        password_field.send_keys(password)
-        
-        # Click login button
-        log.info("Clicking login button...")
-        login_button = webdriver.find_element(By.CSS_SELECTOR, 'button[data-test-id="submit"]')
-        login_button.click()
-        
-        # Wait for successful login
-        log.info("Waiting for successful login...")
-        WebDriverWait(webdriver, Delay.large).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'span[data-test-id="library-drawer-labelLoggedIn"]'))
+
+        # First check if we're already logged in, looking for the logged-in indicators and the login at once
+        login_state = wait.wait_any(
+            webdriver,
+            "tolino login state known",
+            Delay.medium,
+            {
+                LOGIN_STATE_LOGGED_IN: wait.first_present(*LOGGED_IN_SELECTORS),
+                LOGIN_STATE_LOGGED_OUT: wait.first_present(COUNTRY_SELECTOR_CSS),
+            },
         )
-        time.sleep(Delay.medium)
-        
+        if login_state == LOGIN_STATE_LOGGED_IN:
+            log.info("Already logged into Tolino")
+            session.finish_restore(webdriver, site)
+            session.save(webdriver, site)
+            diagnostics.capture(webdriver, "ALREADY LOGGED IN")
+            return
+        log.info("No logged-in indicators found, proceeding with login...")
+
+        if session_restored:
+            session.discard(webdriver, site)
+            webdriver.get(TOLINO_CLOUD_LOGIN_URL)
+            wait.wait_for(webdriver, "tolino webreader reloaded", Delay.large, wait.network_idle())
+
+        # If we get here, we need to log in
+        username, password, partner_shop = dataclasses.astuple(account) if account else get_credentials()
+
+        # Go straight to the login form of the partner shop if a previous login learned its URL
+        shop = tolino_partner.get_shop(partner_shop)
+        login_url = None
+        if shop.login_url is not None and _open_shop_login(webdriver, shop.login_url):
+            try:
+                login_url = _submit_login(webdriver, username, password)
+            except WebDriverException as e:
+                log.warning(f"login via the stored partner shop login URL failed, selecting the partner shop: {e}")
+                # the next logins select the partner shop as well, in case the stored URL is to blame
+                tolino_partner.remember_login_url(partner_shop, None)
+                webdriver.get(TOLINO_CLOUD_LOGIN_URL)
+                wait.wait_for(webdriver, "tolino webreader reloaded", Delay.large, wait.network_idle())
+        if login_url is None:
+            _select_partner_shop(webdriver, partner_shop, shop)
+            login_url = _submit_login(webdriver, username, password)
+
         log.info("Successfully logged into Tolino")
-        _log_storage(webdriver, "AFTER SUCCESSFUL LOGIN")
-        
+        if login_url != TOLINO_CLOUD_LOGIN_URL:
+            # the webreader itself shows the partner shop selection, opening it does not lead to the login form
+            tolino_partner.remember_login_url(partner_shop, login_url)
+        session.save(webdriver, site)
+        diagnostics.capture(webdriver, "AFTER SUCCESSFUL LOGIN")
+
     except Exception as e:
         log.error(f"Login failed: {e}")
-        screenshots_dir = Path(os.getenv('GITHUB_WORKSPACE', '.')) / "screenshots"
+        screenshots_dir = Path(os.getenv("GITHUB_WORKSPACE", ".")) / "screenshots"
         screenshots_dir.mkdir(exist_ok=True)
         screenshot_path = screenshots_dir / "tolino_login_failure.png"
         webdriver.save_screenshot(str(screenshot_path))
@@ -318,47 +208,91 @@ def _login(webdriver: WebDriver) -> None:
         raise
 
 
-def element_exists(webdriver: WebDriver, by: str, value: str) -> bool:
+def _verify_api_upload(webdriver: WebDriver, e_paper_title: str, credentials: tolino_cloud.CloudCredentials) -> None:
+    """Poll the library until it lists the uploaded title, which may take a moment after the upload."""
+    for attempt in range(1, VERIFY_ATTEMPTS + 1):
+        try:
+            if library.contains_title(webdriver, e_paper_title, credentials, refresh=True):
+                return
+            log.info(f"title '{e_paper_title}' not yet in library (attempt {attempt}/{VERIFY_ATTEMPTS}).")
+        except tolino_cloud.TolinoCloudError as e:
+            log.warning(f"reading the library failed (attempt {attempt}/{VERIFY_ATTEMPTS}): {e}")
+        if attempt < VERIFY_ATTEMPTS:
+            time.sleep(VERIFY_DELAY)
+    raise tolino_cloud.TolinoCloudError(f"Title '{e_paper_title}' not found in library after upload.")
+
+
+@tracing.traced("tolino.upload_via_api")
+def _upload_via_api(webdriver: WebDriver, file_path: Path, e_paper_title: str) -> bool:
+    credentials = tolino_cloud.get_credentials(webdriver, TOLINO_SESSION.indexed_db)
+    if credentials is None:
+        return False
+
     try:
-        webdriver.find_element(by, value)
-    except NoSuchElementException:
+        if library.contains_title(webdriver, e_paper_title, credentials):
+            log.info(f"The title '{e_paper_title}' is already present in tolino cloud. Skipping upload.")
+            return True
+        book = tolino_cloud.upload(credentials, file_path)
+    except tolino_cloud.TolinoCloudError as e:
+        log.warning(f"uploading via the tolino cloud API failed, falling back to the web UI: {e}")
         return False
-    return True
 
+    # the book is uploaded from here on, falling back to the web UI would upload it a second time
+    log.info(f"uploaded '{file_path.name}' to tolino cloud as '{book.id}', verifying...")
+    _verify_api_upload(webdriver, e_paper_title, credentials)
 
-def _upload(webdriver: WebDriver, file_path: Path, e_paper_title: str) -> None:
-    # wait until logged in
-    WebDriverWait(webdriver, Delay.large).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, 'span[data-test-id="library-drawer-labelLoggedIn"]'))
-    )
-    
-    _log_storage(webdriver, "START OF UPLOAD")
+    # reload the webreader so the library shown in the browser reflects the upload as well
+    webdriver.refresh()
+    wait.wait_for(webdriver, "tolino library shows upload", Delay.medium, wait.text_present(e_paper_title))
+    log.info("successfully uploaded ZEIT e-paper to tolino cloud.")
+    return True
 
+
+@tracing.traced("tolino.upload_via_web_ui")
+def _upload_via_web_ui(webdriver: WebDriver, file_path: Path, e_paper_title: str) -> None:
     # dismiss advertisement popup
     popup_button_css = 'div[data-test-id="dialogButton-0"]'
-    if element_exists(webdriver, by=By.CSS_SELECTOR, value=popup_button_css):
-        WebDriverWait(webdriver, Delay.small).until(EC.presence_of_element_located((By.CSS_SELECTOR, popup_button_css)))
-        WebDriverWait(webdriver, Delay.small).until(EC.element_to_be_clickable((By.CSS_SELECTOR, popup_button_css)))
-        popup_button = webdriver.find_element(By.CSS_SELECTOR, popup_button_css)
-        time.sleep(Delay.small)
+    if query.exists(webdriver, popup_button_css):
+        popup_button = WebDriverWait(webdriver, Delay.small).until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, popup_button_css))
+        )
+        wait.wait_for(
+            webdriver,
+            "tolino popup settled",
+            Delay.small,
+            wait.element_stable((By.CSS_SELECTOR, popup_button_css)),
+            replaces_sleep=True,
+        )
         popup_button.click()
-        _log_storage(webdriver, "AFTER POPUP DISMISS")
+        diagnostics.capture(webdriver, "AFTER POPUP DISMISS")
 
     # click on 'my books'
     my_books_button_css = 'span[data-test-id="library-drawer-MyBooks"]'
-    WebDriverWait(webdriver, Delay.small).until(EC.presence_of_element_located((By.CSS_SELECTOR, my_books_button_css)))
-    WebDriverWait(webdriver, Delay.small).until(EC.element_to_be_clickable((By.CSS_SELECTOR, my_books_button_css)))
-    my_books_button = webdriver.find_element(By.CSS_SELECTOR, my_books_button_css)
-    time.sleep(Delay.small)
+    my_books_button = WebDriverWait(webdriver, Delay.small).until(
+        EC.element_to_be_clickable((By.CSS_SELECTOR, my_books_button_css))
+    )
+    wait.wait_for(
+        webdriver,
+        "tolino my books settled",
+        Delay.small,
+        wait.element_stable((By.CSS_SELECTOR, my_books_button_css)),
+        replaces_sleep=True,
+    )
     my_books_button.click()
-    time.sleep(Delay.medium)  # Give it a moment to process the click
-    _log_storage(webdriver, "AFTER MY BOOKS CLICK")
-
     menu_css = 'div[data-test-id="library-headerBar-overflowMenu-button"]'
-    WebDriverWait(webdriver, Delay.medium).until(EC.presence_of_element_located((By.CSS_SELECTOR, menu_css)))
-    if e_paper_title in webdriver.page_source:
+    wait.wait_for(
+        webdriver,
+        "tolino my books loaded",
+        Delay.medium,
+        wait.element_present((By.CSS_SELECTOR, menu_css)),
+        wait.network_idle(),
+        replaces_sleep=True,
+    )
+    diagnostics.capture(webdriver, "AFTER MY BOOKS CLICK")
+
+    if library.contains_title(webdriver, e_paper_title):
         log.info(f"The title '{e_paper_title}' is already present in tolino cloud. Skipping upload.")
-        _log_storage(webdriver, "BEFORE EXIT")
+        diagnostics.capture(webdriver, "BEFORE EXIT")
         return
 
     # click on vertical ellipsis to get to drop down menu
@@ -381,26 +315,44 @@ def _upload(webdriver: WebDriver, file_path: Path, e_paper_title: str) -> None:
     upload_status_bar = webdriver.find_element(By.CLASS_NAME, "_sep8tp")
     WebDriverWait(webdriver, Delay.xlarge).until(EC.staleness_of(upload_status_bar))
     log.info("upload status bar disappeared.")
-    time.sleep(Delay.medium)
+    wait.wait_for(webdriver, "tolino upload processed", Delay.medium, wait.network_idle(), replaces_sleep=True)
 
     webdriver.refresh()
     log.info("waiting for book to be present...")
     WebDriverWait(webdriver, Delay.medium).until(
         EC.element_to_be_clickable((By.CSS_SELECTOR, 'span[data-test-id="library-myBooks-titles-list-0-title"]'))
     )
-    assert e_paper_title in webdriver.page_source, f"Title '{e_paper_title}' not found in page source!"
+    if not library.contains_title(webdriver, e_paper_title, refresh=True):
+        raise tolino_cloud.TolinoCloudError(f"Title '{e_paper_title}' not found in library after upload.")
     log.info(f"book title '{e_paper_title}' is present.")
-    
+
     # Take final screenshot after successful upload
-    screenshots_dir = Path(os.getenv('GITHUB_WORKSPACE', '.')) / "screenshots"
+    screenshots_dir = Path(os.getenv("GITHUB_WORKSPACE", ".")) / "screenshots"
     screenshot_path = screenshots_dir / "upload_success.png"
     webdriver.save_screenshot(str(screenshot_path))
     log.info(f"Saved post-upload screenshot to {screenshot_path}")
-    
+
     log.info("successfully uploaded ZEIT e-paper to tolino cloud.")
-    _log_storage(webdriver, "AFTER UPLOAD")
+    diagnostics.capture(webdriver, "AFTER UPLOAD")
+
+
+@tracing.traced("tolino.upload")
+def _upload(webdriver: WebDriver, file_path: Path, e_paper_title: str) -> None:
+    # wait until logged in
+    WebDriverWait(webdriver, Delay.large).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, 'span[data-test-id="library-drawer-labelLoggedIn"]'))
+    )
+
+    diagnostics.capture(webdriver, "START OF UPLOAD")
+
+    upload_mode = os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_UPLOAD_MODE, UPLOAD_MODE_API).lower()
+    if upload_mode == UPLOAD_MODE_API and _upload_via_api(webdriver, file_path, e_paper_title):
+        return
+    _upload_via_web_ui(webdriver, file_path, e_paper_title)
 
 
-def login_and_upload(webdriver: WebDriver, file_path: Path, e_paper_title: str) -> None:
-    _login(webdriver)
+def login_and_upload(
+    webdriver: WebDriver, file_path: Path, e_paper_title: str, account: Optional[TolinoAccount] = None
+) -> None:
+    _login(webdriver, account)
     _upload(webdriver, file_path, e_paper_title)
@@ -0,0 +1,134 @@
+import json
+import logging
+import mimetypes
+import urllib.error
+import urllib.request
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from selenium.webdriver.firefox.webdriver import WebDriver
+
+from zeit_on_tolino import session, tracing
+
+TOLINO_CLOUD_API_URL = "https://bosh.pageplace.de/bosh/rest"
+TIMEOUT = 120  # seconds, uploads of larger files take a while
+CLIENT_TYPE = "TOLINO_WEBREADER"
+CLIENT_VERSION = "4.4.1"
+
+ACCESS_TOKEN_KEYS = ("access_token", "accessToken", "t_auth_token")
+HARDWARE_ID_KEYS = ("hardware_id", "hardwareId", "deviceId")
+RESELLER_ID_KEYS = ("reseller_id", "resellerId", "partnerId", "partner_id")
+
+log = logging.getLogger(__name__)
+
+
+class TolinoCloudError(Exception):
+    pass
+
+
+@dataclass
+class CloudCredentials:
+    access_token: str
+    hardware_id: str
+    reseller_id: str
+
+
+@dataclass
+class CloudBook:
+    id: str
+    title: str
+
+
+def _find_value(data: Any, keys: Iterable[str]) -> Optional[str]:
+    """Depth-first search for the first non-empty value stored under one of `keys`, decoding JSON strings on the way."""
+    if isinstance(data, str) and data[:1] in ("{", "["):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return None
+    if isinstance(data, dict):
+        for key in keys:
+            if data.get(key) not in (None, ""):
+                return str(data[key])
+        children = data.values()
+    elif isinstance(data, list):
+        children = data
+    else:
+        return None
+    for child in children:
+        value = _find_value(child, keys)
+        if value is not None:
+            return value
+    return None
+
+
+def get_credentials(webdriver: WebDriver, indexed_db: Optional[str]) -> Optional[CloudCredentials]:
+    """Read the tokens of the logged-in webreader session out of its localStorage and IndexedDB."""
+    storage = session.read_storage(webdriver, indexed_db)
+    values = [_find_value(storage, keys) for keys in (ACCESS_TOKEN_KEYS, HARDWARE_ID_KEYS, RESELLER_ID_KEYS)]
+    if None in values:
+        log.info("could not find the tolino cloud tokens of the webreader session.")
+        return None
+    return CloudCredentials(*values)
+
+
+def _headers(credentials: CloudCredentials) -> Dict[str, str]:
+    return {
+        "t_auth_token": credentials.access_token,
+        "hardware_id": credentials.hardware_id,
+        "reseller_id": credentials.reseller_id,
+        "client_type": CLIENT_TYPE,
+        "client_version": CLIENT_VERSION,
+        "hardware_type": "HTML5",
+    }
+
+
+def _request(request: urllib.request.Request) -> Dict[str, Any]:
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            body = response.read()
+    except urllib.error.HTTPError as e:
+        raise TolinoCloudError(f"tolino cloud answered {request.full_url} with HTTP status {e.code}.") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise TolinoCloudError(f"could not reach tolino cloud at {request.full_url}: {e}") from e
+    try:
+        return json.loads(body) if body else {}
+    except ValueError as e:
+        raise TolinoCloudError(f"tolino cloud answered {request.full_url} with invalid JSON.") from e
+
+
+def _encode_multipart(field_name: str, file_path: Path) -> tuple:
+    boundary = uuid.uuid4().hex
+    content_type = mimetypes.guess_type(file_path.name)[0] or "application/epub+zip"
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field_name}"; filename="{file_path.name}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    return head + file_path.read_bytes() + tail, f"multipart/form-data; boundary={boundary}"
+
+
+@tracing.traced("tolino_cloud.list_books")
+def list_books(credentials: CloudCredentials, api_url: str = TOLINO_CLOUD_API_URL) -> List[CloudBook]:
+    request = urllib.request.Request(f"{api_url}/inventory/delta?paging=0,1000", headers=_headers(credentials))
+    inventory = _request(request).get("PublicationInventory", {})
+    books = []
+    for entry in inventory.get("edata", []) + inventory.get("ebook", []):
+        title = entry.get("epubMetaData", {}).get("title")
+        if title is not None:
+            books.append(CloudBook(id=str(entry.get("publicationId", "")), title=title))
+    return books
+
+
+@tracing.traced("tolino_cloud.upload")
+def upload(credentials: CloudCredentials, file_path: Path, api_url: str = TOLINO_CLOUD_API_URL) -> CloudBook:
+    body, content_type = _encode_multipart("file", Path(file_path))
+    headers = {**_headers(credentials), "Content-Type": content_type}
+    request = urllib.request.Request(f"{api_url}/upload", data=body, headers=headers, method="POST")
+    metadata = _request(request).get("metadata", {})
+    if "deliverableId" not in metadata:
+        raise TolinoCloudError(f"tolino cloud did not confirm the upload of {file_path}.")
+    return CloudBook(id=str(metadata["deliverableId"]), title=metadata.get("title", ""))
@@ -1,8 +1,27 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import urllib.parse
 from enum import Enum
+from pathlib import Path
+from typing import Dict, Optional
 
 from pydantic import BaseModel
 from selenium.webdriver.common.by import By
 
+from zeit_on_tolino.env_vars import get_state_dir
+
+DEFAULT_COUNTRY = "Deutschland"
+CACHE_FILE_NAME = "partner_shops.json"
+# parameters of a login URL which are only valid for a single login, e.g. of an OAuth authorization request
+ONE_TIME_QUERY_PARAMETERS = ("state", "nonce", "code_challenge", "code_challenge_method", "session_state")
+
+log = logging.getLogger(__name__)
+
+_cache_lock = threading.Lock()
+
 
 class SeleniumItem(BaseModel):
     by: str
@@ -14,6 +33,9 @@ class ShopDetails(BaseModel):
     password: SeleniumItem
     login_button: SeleniumItem
     shop_image_keyword: str
+    country: str = DEFAULT_COUNTRY  # as listed by the country selector of the tolino webreader
+    # the page of the shop's login form, learned from the first successful login, see `get_shop`
+    login_url: Optional[str] = None
 
 
 thalia = ShopDetails(
@@ -42,3 +64,53 @@ class PartnerDetails(Enum):
     thalia: ShopDetails = thalia
     hugendubel: ShopDetails = hugendubel
     buecher_de: ShopDetails = buecher_de
+
+
+def _load_login_urls(cache_path: Path) -> Dict[str, str]:
+    try:
+        return json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def get_shop(name: str, cache_path: Optional[Path] = None) -> ShopDetails:
+    """The details of the partner shop `name`, along with the URL of its login form if a previous login learned it."""
+    try:
+        details = PartnerDetails[name].value
+    except KeyError:
+        raise ValueError(f"Tolino partner shop '{name}' is not supported.")
+    login_url = _load_login_urls(cache_path or get_state_dir() / CACHE_FILE_NAME).get(name)
+    return details.copy(update={"login_url": login_url})
+
+
+def _strip_one_time_parameters(url: str) -> str:
+    parts = urllib.parse.urlsplit(url)
+    query = [
+        (k, v)
+        for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if k not in ONE_TIME_QUERY_PARAMETERS
+    ]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query), fragment=""))
+
+
+def remember_login_url(name: str, login_url: Optional[str], cache_path: Optional[Path] = None) -> None:
+    """Store the URL of the login form of the partner shop `name`, or forget it if `login_url` is None."""
+    cache_path = cache_path or get_state_dir() / CACHE_FILE_NAME
+    if login_url is not None:
+        login_url = _strip_one_time_parameters(login_url)
+    # the logins of several accounts run in parallel threads, none of them must lose the URL another one stored
+    with _cache_lock:
+        login_urls = _load_login_urls(cache_path)
+        if login_urls.get(name) == login_url:
+            return
+        if login_url is None:
+            log.info(f"forgetting the login URL of tolino partner shop '{name}'.")
+            login_urls.pop(name, None)
+        else:
+            login_urls[name] = login_url
+        # written atomically, a sync in another process must not read a partially written file
+        with tempfile.NamedTemporaryFile(
+            "w", dir=cache_path.parent, prefix=f".{cache_path.name}.", suffix=".tmp", delete=False
+        ) as temporary_file:
+            temporary_file.write(json.dumps(login_urls, indent=2))
+        os.replace(temporary_file.name, cache_path)
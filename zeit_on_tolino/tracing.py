@@ -0,0 +1,160 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+TRACE_DIR = Path(os.getenv("GITHUB_WORKSPACE", ".")) / "traces"
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float  # seconds since the start of the run
+    duration: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+    thread: str = field(default_factory=lambda: threading.current_thread().name)
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.now().astimezone()
+        self._start = time.perf_counter()
+        self._spans: List[Span] = []
+        self._spans_by_id: Dict[str, Span] = {}
+        self._lock = threading.Lock()
+        self._current: ContextVar[Optional[Span]] = ContextVar(f"current_span_{self.run_id}", default=None)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        parent = self._current.get()
+        span = Span(
+            name=name,
+            span_id=uuid.uuid4().hex[:8],
+            parent_id=parent.span_id if parent else None,
+            start=time.perf_counter() - self._start,
+            attributes=attributes,
+        )
+        with self._lock:
+            self._spans.append(span)
+            self._spans_by_id[span.span_id] = span
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - self._start - span.start
+            self._current.reset(token)
+
+    def current_span(self) -> Optional[Span]:
+        return self._current.get()
+
+    def current_path(self) -> Tuple[str, ...]:
+        """The names of the current span and all of its parents, the outermost first."""
+        names = []
+        span = self._current.get()
+        with self._lock:
+            while span is not None:
+                names.append(span.name)
+                span = self._spans_by_id.get(span.parent_id)
+        return tuple(reversed(names))
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(),
+            "duration": time.perf_counter() - self._start,
+            "spans": [asdict(span) for span in self.spans()],
+        }
+
+    def export_json(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2, default=str))
+        return path
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def reset() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def span(name: str, **attributes: Any):
+    return _tracer.span(name, **attributes)
+
+
+def current_path() -> Tuple[str, ...]:
+    return _tracer.current_path()
+
+
+def submit(executor: Executor, func: Callable, *args: Any, **kwargs: Any) -> Future:
+    """Like `executor.submit`, but `func` runs in a copy of the current context, nesting its spans in the current span.
+
+    The threads of an executor do not inherit the context of the thread submitting to them.
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def traced(name: str) -> Callable:
+    """Decorator wrapping every call of the decorated function into a span called `name`."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def export_timeline(trace_dir: Path = TRACE_DIR) -> Path:
+    file_name = f"trace_{_tracer.started_at.strftime('%Y%m%d_%H%M%S')}_{_tracer.run_id}.json"
+    path = _tracer.export_json(trace_dir / file_name)
+    log.info(f"wrote timeline of this run to {path}")
+    return path
+
+
+def log_summary() -> None:
+    spans = _tracer.spans()
+    parents = {s.span_id: s for s in spans}
+    for s in spans:
+        depth = 0
+        parent_id = s.parent_id
+        while parent_id is not None and parent_id in parents:
+            depth += 1
+            parent_id = parents[parent_id].parent_id
+        duration = f"{s.duration:.1f}s" if s.duration is not None else "unfinished"
+        log.info(f"{'  ' * depth}{s.name}: {duration} ({s.status})")
@@ -0,0 +1,113 @@
+import logging
+import posixpath
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import unquote, urlsplit
+
+from lxml import etree
+
+from zeit_on_tolino import epub, tracing
+
+EPUB_MIMETYPE = b"application/epub+zip"
+MAX_WORKERS = 4
+CHUNK_SIZE = 1024 * 1024
+
+# raised while reading a broken member, depending on where and how it is broken
+READ_ERRORS = (zipfile.BadZipFile, EOFError, OSError, NotImplementedError, zlib.error)
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ValidationResult:
+    path: Path
+    errors: List[str] = field(default_factory=list)
+    members_checked: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _check_crc(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo) -> Optional[str]:
+    """Read a member completely, the CRC is verified by `zipfile` once the end of the member is reached."""
+    try:
+        with zip_file.open(info) as member:
+            while member.read(CHUNK_SIZE):
+                pass
+    except READ_ERRORS as e:
+        return f"member '{info.filename}' is corrupt: {e}"
+    return None
+
+
+def _check_mimetype(zip_file: zipfile.ZipFile, members: List[zipfile.ZipInfo]) -> List[str]:
+    if not members or members[0].filename != "mimetype":
+        return ["'mimetype' is not the first member of the archive."]
+    errors = []
+    if members[0].compress_type != zipfile.ZIP_STORED:
+        errors.append("'mimetype' is compressed.")
+    try:
+        mimetype = zip_file.read(members[0])
+    except READ_ERRORS:
+        return errors  # reported by the CRC check of all members
+    if mimetype.strip() != EPUB_MIMETYPE:
+        errors.append(f"'mimetype' is not '{EPUB_MIMETYPE.decode()}'.")
+    return errors
+
+
+def _check_manifest(zip_file: zipfile.ZipFile, names: set) -> List[str]:
+    try:
+        with zip_file.open(epub.CONTAINER_PATH) as container:
+            opf_path = epub.read_rootfile_path(container)
+    except KeyError:
+        return [f"'{epub.CONTAINER_PATH}' is missing."]
+    except (epub.EpubError, etree.XMLSyntaxError, *READ_ERRORS) as e:
+        return [f"'{epub.CONTAINER_PATH}' is invalid: {e}"]
+    if opf_path not in names:
+        return [f"package document '{opf_path}' referenced by '{epub.CONTAINER_PATH}' is missing."]
+    try:
+        opf = etree.fromstring(zip_file.read(opf_path))
+    except (etree.XMLSyntaxError, *READ_ERRORS) as e:
+        return [f"package document '{opf_path}' is invalid: {e}"]
+
+    errors = []
+    for item in opf.iterfind(f"{{{epub.OPF_NAMESPACE}}}manifest/{{{epub.OPF_NAMESPACE}}}item"):
+        href = item.get("href", "")
+        if urlsplit(href).scheme:
+            continue  # remote resources are not part of the archive
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(opf_path), unquote(href.split("#")[0])))
+        if path not in names:
+            errors.append(f"manifest item '{item.get('id')}' is missing: '{path}'.")
+    return errors
+
+
+@tracing.traced("validate.validate_epub")
+def validate_epub(file_path: Path, max_workers: int = MAX_WORKERS) -> ValidationResult:
+    """Check the structure of an EPUB and the CRC of all of its members, the latter in parallel threads."""
+    result = ValidationResult(path=Path(file_path))
+    try:
+        zip_file = zipfile.ZipFile(file_path)
+    except (zipfile.BadZipFile, OSError) as e:
+        result.errors.append(f"not a valid zip archive: {e}")
+        return result
+
+    with zip_file:
+        members = zip_file.infolist()
+        names = {info.filename for info in members}
+        result.errors.extend(_check_mimetype(zip_file, members))
+        result.errors.extend(_check_manifest(zip_file, names))
+        # decompressing and checksumming releases the GIL, only reading the archive itself is serialized
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="validate") as pool:
+            crc_errors = pool.map(lambda info: _check_crc(zip_file, info), members)
+            result.errors.extend(error for error in crc_errors if error is not None)
+        result.members_checked = len(members)
+
+    if result.ok:
+        log.info(f"{result.path.name} is a valid EPUB, checked {result.members_checked} members.")
+    else:
+        log.warning(f"{result.path.name} is not a valid EPUB: {'; '.join(result.errors)}")
+    return result
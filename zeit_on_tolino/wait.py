@@ -0,0 +1,208 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from selenium.common.exceptions import (
+    JavascriptException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+from selenium.webdriver.firefox.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from zeit_on_tolino import query, tracing
+
+POLL_FREQUENCY = 0.1  # seconds between two checks of a readiness condition
+IGNORED_EXCEPTIONS = (NoSuchElementException, StaleElementReferenceException, JavascriptException)
+NETWORK_IDLE_TIME = 0.5  # seconds without any finished network request to consider the page idle
+
+Condition = Callable[[Any], Any]
+Locator = Tuple[str, str]
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class WaitRecord:
+    step: str
+    upper_bound: float
+    elapsed: float
+    satisfied: bool
+    replaces_sleep: bool = False
+
+    @property
+    def saved(self) -> float:
+        """The time saved compared to the fixed sleep this wait replaced, zero if it did not replace one."""
+        return max(self.upper_bound - self.elapsed, 0.0) if self.replaces_sleep else 0.0
+
+
+_records: List[WaitRecord] = []
+
+
+def document_ready(webdriver: WebDriver) -> bool:
+    return webdriver.execute_script("return document.readyState") == "complete"
+
+
+def network_idle(idle_time: float = NETWORK_IDLE_TIME) -> Condition:
+    """The page is loaded and no resource finished loading within the last `idle_time` seconds."""
+    script = """
+        if (document.readyState !== 'complete') { return false; }
+        const entries = performance.getEntriesByType('resource');
+        const lastResponseEnd = entries.reduce((latest, e) => Math.max(latest, e.responseEnd), 0);
+        return performance.now() - lastResponseEnd >= arguments[0];
+    """
+
+    def _condition(webdriver: WebDriver) -> bool:
+        return webdriver.execute_script(script, idle_time * 1000)
+
+    return _condition
+
+
+def element_present(locator: Locator) -> Condition:
+    return EC.presence_of_element_located(locator)
+
+
+def first_present(*selectors: str) -> Condition:
+    """Any of the CSS `selectors` is present, checked in a single round trip. Returns the `query.Match`."""
+
+    def _condition(webdriver: WebDriver) -> Optional[query.Match]:
+        return query.first_of(webdriver, *selectors)
+
+    return _condition
+
+
+def element_clickable(locator: Locator) -> Condition:
+    return EC.element_to_be_clickable(locator)
+
+
+def element_stale(element: WebElement) -> Condition:
+    return EC.staleness_of(element)
+
+
+def element_stable(locator: Locator) -> Condition:
+    """The element is displayed and did not move or resize since the previous check, i.e. animations are done."""
+    previous_rect = {}
+
+    def _condition(webdriver: WebDriver) -> Optional[WebElement]:
+        element = webdriver.find_element(*locator)
+        if not element.is_displayed():
+            return None
+        rect = element.rect
+        is_stable = rect == previous_rect.get("rect")
+        previous_rect["rect"] = rect
+        return element if is_stable else None
+
+    return _condition
+
+
+def text_present(text: str) -> Condition:
+    def _condition(webdriver: WebDriver) -> bool:
+        script = "return document.body !== null && document.body.innerText.includes(arguments[0])"
+        return webdriver.execute_script(script, text)
+
+    return _condition
+
+
+def url_changes(url: str) -> Condition:
+    return EC.url_changes(url)
+
+
+def any_of(*conditions: Condition) -> Condition:
+    return EC.any_of(*conditions)
+
+
+def wait_for(
+    webdriver: WebDriver,
+    step: str,
+    upper_bound: float,
+    *conditions: Condition,
+    raise_on_timeout: bool = False,
+    replaces_sleep: bool = False,
+) -> bool:
+    """Wait until all `conditions` hold, but at most `upper_bound` seconds (usually one of the `Delay` values).
+
+    By default running into the upper bound is not an error, the caller simply continues as it would have after a
+    fixed `time.sleep(upper_bound)`. If the wait replaces such a sleep, `replaces_sleep` records the time saved.
+    """
+    start = time.monotonic()
+    with tracing.span(f"wait: {step}", upper_bound=upper_bound) as span:
+        try:
+            WebDriverWait(
+                webdriver,
+                upper_bound,
+                poll_frequency=POLL_FREQUENCY,
+                ignored_exceptions=IGNORED_EXCEPTIONS,
+            ).until(EC.all_of(*conditions))
+            satisfied = True
+        except TimeoutException:
+            satisfied = False
+        span.attributes["satisfied"] = satisfied
+    _record(step, upper_bound, time.monotonic() - start, satisfied, replaces_sleep)
+
+    if not satisfied and raise_on_timeout:
+        raise TimeoutException(f"'{step}' was not ready within {upper_bound} seconds.")
+    return satisfied
+
+
+def _holds(condition: Condition, webdriver: WebDriver) -> Any:
+    try:
+        return condition(webdriver)
+    except IGNORED_EXCEPTIONS:
+        return False
+
+
+def wait_any(
+    webdriver: WebDriver,
+    step: str,
+    upper_bound: float,
+    conditions: Dict[str, Condition],
+    replaces_sleep: bool = False,
+) -> Optional[str]:
+    """Wait until one of the named `conditions` holds, but at most `upper_bound` seconds. Returns its name.
+
+    All conditions are checked on every poll, so e.g. a page which is either logged in or shows a login form is told
+    apart as soon as it is loaded, instead of waiting for the one to time out before looking for the other. None if
+    none of the conditions held within the upper bound.
+    """
+
+    def _first_holding(webdriver: WebDriver) -> Optional[str]:
+        return next((name for name, condition in conditions.items() if _holds(condition, webdriver)), None)
+
+    start = time.monotonic()
+    with tracing.span(f"wait: {step}", upper_bound=upper_bound) as span:
+        try:
+            matched = WebDriverWait(webdriver, upper_bound, poll_frequency=POLL_FREQUENCY).until(_first_holding)
+        except TimeoutException:
+            matched = None
+        span.attributes["matched"] = matched
+    _record(step, upper_bound, time.monotonic() - start, matched is not None, replaces_sleep)
+    return matched
+
+
+def _record(step: str, upper_bound: float, elapsed: float, satisfied: bool, replaces_sleep: bool) -> None:
+    record = WaitRecord(step, upper_bound, elapsed, satisfied, replaces_sleep)
+    _records.append(record)
+    if satisfied and replaces_sleep:
+        log.info(f"wait '{step}': ready after {elapsed:.1f}s (upper bound {upper_bound}s, saved {record.saved:.1f}s)")
+    elif satisfied:
+        log.info(f"wait '{step}': ready after {elapsed:.1f}s (upper bound {upper_bound}s)")
+    else:
+        log.info(f"wait '{step}': not ready within upper bound of {upper_bound}s")
+
+
+def get_records() -> List[WaitRecord]:
+    return list(_records)
+
+
+def reset_records() -> None:
+    _records.clear()
+
+
+def log_summary() -> None:
+    total_saved = sum(record.saved for record in _records)
+    total_waited = sum(record.elapsed for record in _records)
+    log.info(f"waited {total_waited:.1f}s in {len(_records)} steps, saved {total_saved:.1f}s compared to fixed sleeps")
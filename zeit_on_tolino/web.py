@@ -1,13 +1,17 @@
 import tempfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Union, Optional
+from typing import TYPE_CHECKING, Optional, Union
 
-from selenium.webdriver import Chrome, ChromeOptions
-from selenium.webdriver.firefox.webdriver import WebDriver
+if TYPE_CHECKING:
+    from selenium.webdriver.firefox.webdriver import WebDriver
 
 # Use a persistent directory within the temp directory
 DOWNLOAD_PATH = Path(tempfile.gettempdir()) / "selenium_downloads"
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/68.0.3440.84 Safari/537.36"
+)
+
 
 @dataclass
 class Delay:
@@ -16,21 +20,34 @@ class Delay:
     large: int = 30
     xlarge: int = 200
 
-def get_webdriver(download_path: Union[Path, str] = DOWNLOAD_PATH, headless: bool = True) -> WebDriver:
+
+def get_webdriver(
+    download_path: Union[Path, str] = DOWNLOAD_PATH, headless: bool = True, profile_dir: Optional[Path] = None
+) -> "WebDriver":
+    # imported here, importing `Delay` should not load the whole browser stack
+    from selenium.webdriver import Chrome, ChromeOptions
+
+    from zeit_on_tolino import blocking, downloads, instrumentation
+
     if isinstance(download_path, str):
         download_path = Path(download_path)
-    
+    download_path.mkdir(parents=True, exist_ok=True)
+
     options = ChromeOptions()
-    prefs = {"download.default_directory" : str(download_path)}
+    prefs = {"download.default_directory": str(download_path)}
     options.add_experimental_option("prefs", prefs)
     if headless:
         options.add_argument("--headless")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/68.0.3440.84 Safari/537.36")
+    if profile_dir is not None:
+        # an own profile per browser keeps cookies and storage of parallel browsers apart
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    options.set_capability("goog:loggingPrefs", downloads.PERFORMANCE_LOGGING_PREFS)
+    options.add_argument(f"user-agent={USER_AGENT}")
 
     webdriver = Chrome(options=options)
     setattr(webdriver, "download_dir_path", str(download_path))
-    
-    return webdriver
+    downloads.enable_download_tracking(webdriver, download_path)
+    blocking.enable_blocking(webdriver)
+    instrumentation.enable_instrumentation(webdriver)
 
-# Ensure the download path directory exists
-DOWNLOAD_PATH.mkdir(parents=True, exist_ok=True)
+    return webdriver
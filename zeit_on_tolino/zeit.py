@@ -1,27 +1,38 @@
 import logging
-import glob
 import os
-import time
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from zeit_on_tolino.env_vars import EnvVars, MissingEnvironmentVariable
+from zeit_on_tolino import diagnostics, downloads, http_client, query, session, tracing, wait
+from zeit_on_tolino.env_vars import EnvVars, MissingEnvironmentVariable, OptionalEnvVars
 from zeit_on_tolino.web import Delay
 
 ZEIT_LOGIN_URL = "https://epaper.zeit.de/abo/diezeit"
 ZEIT_DATE_FORMAT = "%d.%m.%Y"
+ZEIT_ARCHIVE_URL = ZEIT_LOGIN_URL  # the e-paper overview links the editions still available together with their date
+ZEIT_SESSION = session.Site(name="zeit", origin="https://epaper.zeit.de", cookie_domains=("zeit.de",))
 
 BUTTON_TEXT_TO_RECENT_EDITION = "ZUR AKTUELLEN AUSGABE"
 BUTTON_TEXT_DOWNLOAD_EPUB = "EPUB FÜR E-READER LADEN"
 BUTTON_TEXT_EPUB_DOWNLOAD_IS_PENDING = "EPUB FOLGT IN KÜRZE"
 
+DOWNLOAD_MODE_HTTP = "http"
+DOWNLOAD_MODE_BROWSER = "browser"
+EPUB_SUFFIX = ".epub"
+
 log = logging.getLogger(__name__)
 
+
+class EpubNotReady(RuntimeError):
+    pass
+
+
 def _get_credentials() -> Tuple[str, str]:
     try:
         username = os.environ[EnvVars.ZEIT_PREMIUM_USER]
@@ -35,138 +46,170 @@ def _get_credentials() -> Tuple[str, str]:
         )
 
 
+@tracing.traced("zeit.login")
 def _login(webdriver: WebDriver) -> None:
     try:
+        session_restored = session.restore(webdriver, ZEIT_SESSION)
         webdriver.get(ZEIT_LOGIN_URL)
-        time.sleep(Delay.medium)
-        
+        wait.wait_for(webdriver, "zeit e-paper page loaded", Delay.medium, wait.network_idle(), replaces_sleep=True)
+
         log.info(f"Current URL: {webdriver.current_url}")
-        
+
         # First check if we're already logged in by looking for the download button
         try:
-            if BUTTON_TEXT_TO_RECENT_EDITION in webdriver.page_source:
+            if query.by_text(webdriver, BUTTON_TEXT_TO_RECENT_EDITION) is not None:
                 log.info("Already logged into ZEIT")
-                # Dump cookies in detail for setting up GitHub Actions
-                cookies = webdriver.get_cookies()
-                log.info("Current cookies (full details):")
-                for cookie in cookies:
-                    log.info(f"""
-Cookie details:
-  Name: {cookie['name']}
-  Value: {cookie['value']}
-  Domain: {cookie.get('domain')}
-  Path: {cookie.get('path')}
-  Secure: {cookie.get('secure')}
-  HttpOnly: {cookie.get('httpOnly')}
-  Expiry: {cookie.get('expiry')}
-""")
+                diagnostics.capture(webdriver, "ZEIT ALREADY LOGGED IN")
+                session.finish_restore(webdriver, ZEIT_SESSION)
+                session.save(webdriver, ZEIT_SESSION)
                 return
         except Exception as e:
             log.info(f"Error checking login state: {e}")
-        
+
+        if session_restored:
+            session.discard(webdriver, ZEIT_SESSION)
+
         # If we get here, we need to log in
         username, password = _get_credentials()
         log.info(f"ZEIT_PREMIUM_USER is {'set' if username else 'not set'}")
         log.info(f"ZEIT_PREMIUM_PASSWORD is {'set' if password else 'not set'}")
-        
-        # Wait for page to be fully loaded
-        try:
-            WebDriverWait(webdriver, Delay.large).until(
-                lambda d: d.execute_script('return document.readyState') == 'complete'
-            )
-            log.info("Page fully loaded")
-        except Exception as e:
-            log.error(f"Page did not finish loading: {e}")
-            log.info(f"Current URL: {webdriver.current_url}")
-            raise
-            
-        # Look for login form or download button
+
+        # Look for login form
         try:
-            # First check if we're already on the e-paper page with download button
-            if BUTTON_TEXT_TO_RECENT_EDITION in webdriver.page_source:
-                log.info("Found download button - already logged in")
-                return
-                
-            # If not, look for login form
             username_field = WebDriverWait(webdriver, Delay.medium).until(
                 EC.presence_of_element_located((By.ID, "login_email"))
             )
             password_field = webdriver.find_element(By.ID, "login_pass")
-            
+
             # Fill in credentials
             username_field.send_keys(username)
             password_field.send_keys(password)
-            
+
             # Click login button
             btn = webdriver.find_element(By.CLASS_NAME, "submit-button.log")
+            login_url = webdriver.current_url
             btn.click()
-            time.sleep(Delay.medium)
-            
+            wait.wait_for(
+                webdriver,
+                "zeit login submitted",
+                Delay.medium,
+                wait.any_of(
+                    wait.url_changes(login_url),
+                    wait.element_present((By.CLASS_NAME, "page-section-header")),
+                ),
+                wait.document_ready,
+                replaces_sleep=True,
+            )
+
             # Check if we're still on login page
             if "anmelden" in webdriver.current_url:
                 log.error("Still on login page after submission")
                 log.info("Current URL: " + webdriver.current_url)
                 log.info("Page source: " + webdriver.page_source[:500])
                 raise RuntimeError("Failed to login, check your login credentials.")
-            
-            # Wait for successful login
-            WebDriverWait(webdriver, Delay.medium).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "page-section-header"))
-            )
-            
+
+            session.save(webdriver, ZEIT_SESSION)
+
         except Exception as e:
             log.error(f"Login failed: {e}")
             log.info("Page source: " + webdriver.page_source[:500])
             raise
-            
+
     except Exception as e:
         log.error(f"Login failed: {e}")
-        screenshots_dir = Path(os.getenv('GITHUB_WORKSPACE', '.')) / "screenshots"
+        screenshots_dir = Path(os.getenv("GITHUB_WORKSPACE", ".")) / "screenshots"
         screenshots_dir.mkdir(exist_ok=True)
         screenshot_path = screenshots_dir / "zeit_login_failure.png"
         webdriver.save_screenshot(str(screenshot_path))
         raise
 
 
-def _get_latest_downloaded_file_path(download_dir: str) -> Path:
-    download_dir_files = glob.glob(f"{download_dir}/*")
-    latest_file = max(download_dir_files, key=os.path.getctime)
-    return Path(latest_file)
-
+def _get_download_link(webdriver: WebDriver) -> Optional[WebElement]:
+    return query.by_text(webdriver, BUTTON_TEXT_DOWNLOAD_EPUB)
 
-def wait_for_downloads(path):
-    time.sleep(Delay.small)
-    start = time.time()
-    while any([filename.endswith(".crdownload") for filename in os.listdir(path)]):
-        now = time.time()
-        if now > start + Delay.large:
-            raise TimeoutError(f"Did not manage to download file within {Delay.large} seconds.")
-        else:
-            log.info(f"waiting for download to be finished...")
-            time.sleep(2)
 
+@tracing.traced("zeit.download_via_http")
+def _download_via_http(webdriver: WebDriver) -> Optional[Path]:
+    link = _get_download_link(webdriver)
+    url = link.get_attribute("href") if link is not None else None
+    if not url or not url.startswith("http"):
+        log.info("could not resolve the EPUB download URL, falling back to downloading via the browser.")
+        return None
 
-def download_e_paper(webdriver: WebDriver) -> str:
-    _login(webdriver)
-
-    time.sleep(Delay.small)
-    for link in webdriver.find_elements(By.TAG_NAME, "a"):
-        if link.text == BUTTON_TEXT_TO_RECENT_EDITION:
+    log.info(f"downloading EPUB from {url}...")
+    try:
+        result = http_client.stream_download(
+            url, Path(webdriver.download_dir_path), headers=http_client.get_browser_headers(webdriver, url)
+        )
+    except http_client.DownloadError as e:
+        log.warning(f"downloading via HTTP failed, falling back to downloading via the browser: {e}")
+        return None
+    log.info(f"downloaded {result.size} bytes with sha256 {result.sha256}")
+    return result.path
+
+
+@tracing.traced("zeit.download_via_browser")
+def _download_via_browser(webdriver: WebDriver) -> Path:
+    tracker = getattr(webdriver, "download_tracker", None)
+    if tracker is not None:
+        tracker.mark()
+    watcher = downloads.DirectoryWatcher(Path(webdriver.download_dir_path))
+    try:
+        link = _get_download_link(webdriver)
+        if link is not None:
+            log.info("clicking download button now...")
             link.click()
-            break
 
-    if BUTTON_TEXT_EPUB_DOWNLOAD_IS_PENDING in webdriver.page_source:
-        raise RuntimeError("New ZEIT release is available, however, EPUB version is not. Retry again later.")
+        if tracker is not None:
+            e_paper_path = tracker.wait_for_download(start_timeout=Delay.small, timeout=Delay.large)
+            if e_paper_path is not None:
+                return e_paper_path
+            log.info("no download events received, watching the download directory instead.")
+        log.info("waiting for download to be finished...")
+        e_paper_path = watcher.wait_for_file(timeout=Delay.large)
+    finally:
+        watcher.close()
+
+    if not e_paper_path.suffix:
+        # while tracking downloads, chrome names the file after the download's guid, see `enable_download_tracking`
+        e_paper_path = e_paper_path.replace(e_paper_path.with_suffix(EPUB_SUFFIX))
+    return e_paper_path
 
-    time.sleep(Delay.small)
-    for link in webdriver.find_elements(By.TAG_NAME, "a"):
-        if link.text == BUTTON_TEXT_DOWNLOAD_EPUB:
-            log.info("clicking download button now...")
-            link.click()
-            break
 
-    wait_for_downloads(webdriver.download_dir_path)
-    e_paper_path = _get_latest_downloaded_file_path(webdriver.download_dir_path)
+@tracing.traced("zeit.download_e_paper")
+def download_e_paper(webdriver: WebDriver) -> str:
+    _login(webdriver)
+
+    wait.wait_for(
+        webdriver,
+        "zeit recent edition link",
+        Delay.small,
+        wait.text_present(BUTTON_TEXT_TO_RECENT_EDITION),
+        replaces_sleep=True,
+    )
+    link = query.by_text(webdriver, BUTTON_TEXT_TO_RECENT_EDITION)
+    if link is not None:
+        link.click()
+
+    edition_state = wait.wait_any(
+        webdriver,
+        "zeit edition page loaded",
+        Delay.small,
+        {
+            BUTTON_TEXT_DOWNLOAD_EPUB: wait.text_present(BUTTON_TEXT_DOWNLOAD_EPUB),
+            BUTTON_TEXT_EPUB_DOWNLOAD_IS_PENDING: wait.text_present(BUTTON_TEXT_EPUB_DOWNLOAD_IS_PENDING),
+        },
+        replaces_sleep=True,
+    )
+    if edition_state == BUTTON_TEXT_EPUB_DOWNLOAD_IS_PENDING:
+        raise EpubNotReady("New ZEIT release is available, however, EPUB version is not. Retry again later.")
+
+    download_mode = os.environ.get(OptionalEnvVars.ZEIT_ON_TOLINO_DOWNLOAD_MODE, DOWNLOAD_MODE_HTTP).lower()
+    e_paper_path = None
+    if download_mode == DOWNLOAD_MODE_HTTP:
+        e_paper_path = _download_via_http(webdriver)
+    if e_paper_path is None:
+        e_paper_path = _download_via_browser(webdriver)
 
     if not e_paper_path.is_file():
         raise RuntimeError("Could not download e paper, check your login credentials.")